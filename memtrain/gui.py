@@ -1,16 +1,42 @@
-import _tkinter
+import argparse
 import platform
 import sys
 
-from memtrain.memtrain_gui.__main__ import main
+from memtrain import __version__
 
 __all__ = ["main"]
 
+# Tk and the session modules are imported only after arguments are parsed, so
+# that --help and --version work quickly and without a display.
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="A program for better memory training", prog="memtrain-gui"
+    )
+    parser.add_argument("--version", action="version", version="%(prog)s " + __version__)
+    parser.add_argument(
+        "--learner", help="Record progress for this learner (default: the shared default learner)"
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Write cProfile stats per phase to FILE, e.g. FILE.load.pstats",
+    )
+    parser.add_argument(
+        "--memprofile",
+        metavar="FILE",
+        help="Write the top tracemalloc allocation sites per phase to FILE, e.g. FILE.load.txt",
+    )
+    return parser
+
 
 def _is_unsupported_macos_tk():
     if sys.platform != "darwin":
         return False
 
+    import _tkinter
+
     # Apple's Command Line Tools Python links against the legacy system Tk 8.5,
     # which aborts on newer macOS releases before our app can handle the error.
     return sys.executable.startswith(
@@ -19,6 +45,8 @@ def _is_unsupported_macos_tk():
 
 
 def _print_gui_runtime_help():
+    import _tkinter
+
     current = platform.mac_ver()[0] or "unknown macOS version"
     print("memtrain GUI cannot run with the current Python/Tk runtime.")
     print("Detected:")
@@ -34,6 +62,14 @@ def _print_gui_runtime_help():
     print("  python3 -m memtrain animals.csv")
 
 
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from memtrain.memtrain_gui.__main__ import run
+
+    run(args)
+
+
 if __name__ == "__main__":
     if _is_unsupported_macos_tk():
         _print_gui_runtime_help()
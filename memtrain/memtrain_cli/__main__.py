@@ -1,19 +1,107 @@
 import argparse
+import importlib
 import os
-import textwrap
+import sys
 import time
-from datetime import timedelta
-from statistics import mean
 
-from memtrain.memtrain_common.engine import Engine
-from memtrain.memtrain_common.question import Question
+from memtrain import __version__
+from memtrain.memtrain_common.timings import TIMINGS_FORMATS
+
+# Modules that only a study session needs are imported where they are used,
+# so that --help, --version, and subcommand dispatch start quickly. See
+# tests/test_startup.py for the import budget.
+
+
+def build_parser():
+    """Build the argument parser for study sessions"""
+    # Create the top-level argument parser
+    parser = argparse.ArgumentParser(
+        description="A program for better memory training", prog="memtrain"
+    )
+    parser.add_argument("--version", action="version", version="%(prog)s " + __version__)
+
+    # Create arguments
+    parser.add_argument(
+        "-t",
+        "--tags",
+        help="Train items matching these tags, e.g. 'a,b' or 'a & (b | c) & !d'",
+    )
+    parser.add_argument("-x", "--not-tags", help="Do not train items matching these tags")
+    parser.add_argument(
+        "-q",
+        "--query",
+        help="Train items whose cue or response contains these words, best match first",
+    )
+    parser.add_argument("-l", "--level", help="Specify which level to study")
+    parser.add_argument(
+        "-n", "--nquestions", type=int, help="Set the number of questions for this session"
+    )
+    parser.add_argument(
+        "--learner", help="Record progress for this learner (default: the shared default learner)"
+    )
+    parser.add_argument(
+        "--answers",
+        metavar="FILE",
+        help="Read answers from FILE ('-' for stdin) and print JSON-lines results",
+    )
+    parser.add_argument(
+        "--fuzzy",
+        type=int,
+        metavar="N",
+        help="At levels 2 and 3, accept answers up to N typos away, one per 5 characters "
+        "(default: the study set's fuzzy setting, or 0)",
+    )
+    parser.add_argument(
+        "--distractors",
+        choices=("mtag", "similar"),
+        help="At level 1, fill in choices beyond a response's mtags with random responses "
+        "(mtag, the default) or the most similar responses (similar)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed the question order and choices so that a session can be repeated "
+        "(default: a random seed, reported with --timings)",
+    )
+    parser.add_argument(
+        "--deck-store",
+        choices=("memory", "disk", "columns"),
+        help="Keep the study-set database in SQLite in memory (default), in a read-only file "
+        "next to the CSV file, or in Python columns",
+    )
+    parser.add_argument(
+        "--timings",
+        choices=TIMINGS_FORMATS,
+        help="Print per-phase timings to stderr as a table or JSON when the session ends",
+    )
+    parser.add_argument(
+        "--sql-profile",
+        metavar="FILE",
+        help="Profile SQLite statements and write a report to FILE ('-' for stderr) at exit",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Write cProfile stats per phase to FILE, e.g. FILE.load.pstats",
+    )
+    parser.add_argument(
+        "--memprofile",
+        metavar="FILE",
+        help="Write the top tracemalloc allocation sites per phase to FILE, e.g. FILE.load.txt",
+    )
+    parser.add_argument("csvfile", help="The CSV file to load")
+
+    return parser
 
 
 class MemtrainCLI:
-    def __init__(self, argv=None):
+    def __init__(self, argv=None, deck=None):
         # Initalize core objects
         self.engine = None
 
+        # A deck that is already loaded for args.csvfile, if any
+        self.deck = deck
+
         self.settings = None
         self.database = None
         self.mtstatistics = None
@@ -33,6 +121,11 @@ class MemtrainCLI:
         self.mchoices = None
         self.current_item = None
 
+        # Scripted (non-interactive) sessions read answers from a stream and
+        # print JSON-lines records instead of rendering the interface.
+        self.answers = None
+        self.scripted = False
+
         # Inter-area margin
         # The character that's printed between CLI interface areas
         self.iam = " "
@@ -40,53 +133,133 @@ class MemtrainCLI:
         #######################################################################
         # Argument parsing with argparse
 
-        # Create the top-level argument parser
-        parser = argparse.ArgumentParser(
-            description="A program for better memory training", prog="memtrain"
-        )
+        parser = build_parser()
         parser.set_defaults(func=self.train)
 
-        # Create arguments
-        parser.add_argument("-t", "--tags", help="Train these tags only")
-        parser.add_argument("-x", "--not-tags", help="Do not train these tags")
-        parser.add_argument("-l", "--level", help="Specify which level to study")
-        parser.add_argument(
-            "-n", "--nquestions", type=int, help="Set the number of questions for this session"
-        )
-        parser.add_argument("csvfile", help="The CSV file to load")
-
         # Parse arguments
         self.args = parser.parse_args(argv)
         self.args.func(self.args)
 
     def train(self, args):
         """Main wrapper for the CLI"""
+        from memtrain.memtrain_common import sqlprofile
+        from memtrain.memtrain_common.engine import Engine
+        from memtrain.memtrain_common.profiling import SessionProfiler
+        from memtrain.memtrain_common.question import Question
+        from memtrain.memtrain_common.timings import emit_timings, get_timings_format
+
         # Initialize core objects
         self.csvfile = self.args.csvfile
         self.level = self.args.level
         self.nquestions = self.args.nquestions
         self.tags = self.args.tags
         self.not_tags = self.args.not_tags
+        self.query = self.args.query
+        self.learner = self.args.learner
+        self.timings_format = get_timings_format(self.args.timings)
+
+        if self.args.sql_profile:
+            sqlprofile.enable(self.args.sql_profile)
+
+        self.profiler = SessionProfiler(self.args.profile, self.args.memprofile)
+
+        with self.profiler.phase("load"):
+            self.engine = Engine(
+                self.csvfile,
+                self.level,
+                self.nquestions,
+                self.tags,
+                self.not_tags,
+                self.deck,
+                self.learner,
+                query=self.query,
+                deck_store=self.args.deck_store,
+                seed=self.args.seed,
+            )
 
-        self.engine = Engine(self.csvfile, self.level, self.nquestions, self.tags, self.not_tags)
+            self.settings = self.engine.settings
+            if self.args.fuzzy is not None:
+                self.settings.settings["fuzzy"] = self.args.fuzzy
+            if self.args.distractors:
+                self.settings.distractors = self.args.distractors
+            self.database = self.engine.database
+            self.mtstatistics = self.engine.mtstatistics
+            self.cr_id_pairs = self.engine.cr_id_pairs
+
+            self.question = Question(
+                self.settings,
+                self.database,
+                self.engine.deck.cue_templates,
+                self.engine.deck.distractors,
+                self.engine.rng,
+            )
+
+        if self.args.answers:
+            self.scripted = True
+            if self.args.answers == "-":
+                self.answers = sys.stdin
+            else:
+                self.answers = open(self.args.answers, encoding="utf-8")
+
+        try:
+            with self.profiler.phase("questions"):
+                while not self.mtstatistics.is_last_question():
+                    # Edits to the CSV file are picked up between questions.
+                    if self.engine.sync(self.mtstatistics.response_number - 1):
+                        self.database = self.engine.database
+                        self.question = Question(
+                            self.settings,
+                            self.database,
+                            self.engine.deck.cue_templates,
+                            self.engine.deck.distractors,
+                            self.engine.rng,
+                        )
+                        continue
+
+                    cr_id_pair = self.cr_id_pairs[self.mtstatistics.response_number - 1]
+                    self.mtstatistics.is_input_valid = False
+
+                    # Don't continue with the loop until a valid response has
+                    # been entered.
+                    while not self.mtstatistics.is_input_valid:
+                        self.render_question(cr_id_pair[0], cr_id_pair[1])
+        except EOFError:
+            # A scripted session ends early when the answer stream runs out.
+            if not self.scripted:
+                raise
+        finally:
+            if self.answers is not None and self.answers is not sys.stdin:
+                self.answers.close()
+            self.write_profiles()
 
-        self.settings = self.engine.settings
-        self.database = self.engine.database
-        self.mtstatistics = self.engine.mtstatistics
-        self.cr_id_pairs = self.engine.cr_id_pairs
+        self.mtstatistics.update_percentage()
 
-        self.question = Question(self.settings, self.database)
+        if self.scripted:
+            self.emit_record(
+                {
+                    "type": "summary",
+                    "answered": self.mtstatistics.response_number - 1,
+                    "total": self.mtstatistics.total,
+                    "correct": self.mtstatistics.number_correct,
+                    "incorrect": self.mtstatistics.number_incorrect,
+                    "seed": self.engine.seed,
+                }
+            )
+        else:
+            self.print_summary()
 
-        # For each cue and response ID pair:
-        for cr_id_pair in self.cr_id_pairs:
-            self.mtstatistics.is_input_valid = False
+        if self.timings_format:
+            emit_timings(self.engine.timings, self.timings_format)
 
-            # Don't continue with the loop until a valid response has been
-            # entered.
-            while not self.mtstatistics.is_input_valid:
-                self.render_question(cr_id_pair[0], cr_id_pair[1])
+    def write_profiles(self):
+        """Write per-phase CPU and memory profiles, if requested"""
+        for path in self.profiler.write():
+            print("Wrote profile: " + path, file=sys.stderr)
 
-        self.mtstatistics.update_percentage()
+    def print_summary(self):
+        """Print the end-of-session summary"""
+        from datetime import timedelta
+        from statistics import mean
 
         self.header_text()
         print()
@@ -101,7 +274,9 @@ class MemtrainCLI:
             + str(round(self.mtstatistics.percentage, 1))
             + "%)"
         )
-        print("Average response time: " + str(timedelta(seconds=mean(self.mtstatistics.times))))
+        print(
+            "Average response time: " + str(timedelta(seconds=mean(self.mtstatistics.times or [0])))
+        )
         print()
         if self.mtstatistics.number_incorrect > 0:
             print("Responses for which answers were incorrect:")
@@ -155,6 +330,53 @@ class MemtrainCLI:
 
     def render_question(self, cue_id, response_id):
         """Render the question"""
+        import textwrap
+
+        with self.engine.timings.span("render"):
+            self.load_question(cue_id, response_id)
+
+            if not self.scripted:
+                self.print_question()
+
+        # Start time
+        start = time.time()
+
+        # Prompt for user input
+        self.prompt_for_response()
+
+        # End time
+        end = time.time()
+        elasped_time = end - start
+
+        self.question.validate_input()
+
+        if self.scripted:
+            self.scripted_grade(elasped_time)
+            return
+
+        # Clear screen.
+        os.system("cls" if os.name == "nt" else "clear")
+
+        # If the input is valid, grade input and finalize
+        if self.mtstatistics.is_input_valid:
+            self.grade_and_persist(elasped_time)
+            self.question.finalize()
+            f_correctness_str = textwrap.fill(self.question.correctness_str, width=80)
+            print(f_correctness_str)
+
+            if self.question.synonyms:
+                f_other_answers_str = textwrap.fill(self.question.other_answers_str, width=80)
+                print(f_other_answers_str)
+
+            print()
+        # Otherwise, keep looping until a valid response is entered.
+        # See line 82.
+        else:
+            print("Please enter a valid response.")
+            print()
+
+    def load_question(self, cue_id, response_id):
+        """Load the data for the current question"""
         this_question_id = self.mtstatistics.response_number - 1
         self.current_item = self.engine.current_item(this_question_id)
         self.settings.level = self.current_item.level
@@ -181,6 +403,22 @@ class MemtrainCLI:
             if self.settings.level == "1":
                 self.question.mchoices = self.question.generate_mchoices()
 
+    def grade_and_persist(self, elapsed_time):
+        """Grade valid input and save the result to learner progress"""
+        with self.engine.timings.span("grade"):
+            self.question.grade_input()
+
+        self.mtstatistics.times.append(elapsed_time)
+
+        with self.engine.timings.span("persist"):
+            self.engine.record_result(
+                self.current_item, self.mtstatistics.is_input_correct, elapsed_time
+            )
+
+    def print_question(self):
+        """Print the header, cue, and level-specific prompt area"""
+        import textwrap
+
         self.header_text()
 
         self.f_cue = self.question.format_cue()
@@ -201,44 +439,38 @@ class MemtrainCLI:
             self.print_hints()
             print()
 
-        # Start time
-        start = time.time()
-
-        # Prompt for user input
-        self.prompt_for_response()
-
-        # End time
-        end = time.time()
-        elasped_time = end - start
-
-        self.question.validate_input()
-
-        # Clear screen.
-        os.system("cls" if os.name == "nt" else "clear")
-
-        # If the input is valid, grade input and finalize
-        if self.mtstatistics.is_input_valid:
-            self.question.grade_input()
-            self.mtstatistics.times.append(elasped_time)
-            self.engine.record_result(
-                self.current_item, self.mtstatistics.is_input_correct, elasped_time
-            )
-            self.question.finalize()
-            f_correctness_str = textwrap.fill(self.question.correctness_str, width=80)
-            print(f_correctness_str)
+    def scripted_grade(self, elapsed_time):
+        """Grade a scripted answer and emit its JSON-lines record"""
+        # Invalid answers are skipped, just like an interactive re-prompt.
+        if not self.mtstatistics.is_input_valid:
+            return
+
+        response_number = self.mtstatistics.response_number
+
+        self.grade_and_persist(elapsed_time)
+        self.question.finalize()
+
+        self.emit_record(
+            {
+                "type": "question",
+                "response_number": response_number,
+                "item_id": self.current_item.item_id,
+                "level": self.settings.level,
+                "correct": self.mtstatistics.is_input_correct,
+                "match": self.question.match,
+                "grading_latency": self.engine.timings.last("grade"),
+            }
+        )
 
-            if self.question.synonyms:
-                f_other_answers_str = textwrap.fill(self.question.other_answers_str, width=80)
-                print(f_other_answers_str)
+    def emit_record(self, record):
+        """Print one JSON-lines record for scripted sessions"""
+        import json
 
-            print()
-        # Otherwise, keep looping until a valid response is entered.
-        # See line 82.
-        else:
-            print("Please enter a valid response.")
-            print()
+        print(json.dumps(record), flush=True)
 
     def print_hints(self):
+        import textwrap
+
         for hint in self.hints:
             if hint:
                 # Format hint to match cue.
@@ -247,6 +479,8 @@ class MemtrainCLI:
 
     def print_mchoices(self):
         """Print the multiple choices for Level 1"""
+        import textwrap
+
         for letter, choice in self.question.mchoices.items():
             this_line = textwrap.fill(
                 choice, initial_indent=letter + ")" + (" " * 4), subsequent_indent=" " * 6, width=80
@@ -255,6 +489,13 @@ class MemtrainCLI:
 
     def prompt_for_response(self):
         """Prompt for a response and return user input"""
+        if self.scripted:
+            line = self.answers.readline()
+            if not line:
+                raise EOFError
+            self.question.user_input = line.rstrip("\r\n").lower()
+            return
+
         if self.settings.level == "1":
             self.question.user_input = input("Enter response choice: ")
         else:
@@ -263,7 +504,44 @@ class MemtrainCLI:
         self.question.user_input = self.question.user_input.lower()
 
 
+# Subcommands are dispatched on the first argument before the session parser
+# runs, so that `memtrain animals.csv` keeps working unchanged.
+COMMANDS = {
+    "bench": "memtrain.memtrain_cli.bench",
+    "check": "memtrain.memtrain_cli.check",
+    "compile": "memtrain.memtrain_cli.compile",
+    "daemon": "memtrain.memtrain_cli.daemon",
+    "exam": "memtrain.memtrain_cli.exam",
+    "grade": "memtrain.memtrain_cli.grade",
+    "loadgen": "memtrain.memtrain_cli.loadgen",
+    "mix": "memtrain.memtrain_cli.mix",
+    "perf": "memtrain.memtrain_cli.perf",
+    "plan": "memtrain.memtrain_cli.plan",
+    "progress": "memtrain.memtrain_cli.progress",
+    "serve": "memtrain.memtrain_cli.serve",
+}
+
+
 def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    if argv and argv[0] in COMMANDS:
+        command = importlib.import_module(COMMANDS[argv[0]])
+        command.main(argv[1:])
+        return
+
+    # With MEMTRAIN_DAEMON set, sessions run in a running daemon, which keeps
+    # study sets loaded. Without a reachable daemon they run here as usual.
+    if os.environ.get("MEMTRAIN_DAEMON"):
+        from memtrain.memtrain_cli import client
+
+        socket_path = client.get_socket_path()
+        if socket_path:
+            status = client.run(argv, socket_path)
+            if status is not None:
+                sys.exit(status)
+
     MemtrainCLI(argv)
 
 
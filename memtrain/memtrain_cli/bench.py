@@ -0,0 +1,101 @@
+import argparse
+import json
+import tempfile
+
+from memtrain.memtrain_common.bench import (
+    LearnerConfig,
+    SyntheticDeckConfig,
+    format_report,
+    run_benchmark,
+)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark full study sessions with simulated learners",
+        prog="memtrain bench",
+    )
+
+    deck = parser.add_argument_group("synthetic study set")
+    deck.add_argument("--items", type=int, default=200, help="Number of items in the deck")
+    deck.add_argument("--tags", type=int, default=10, help="Number of distinct tags")
+    deck.add_argument("--tag-density", type=float, default=0.5, help="Fraction of items with a tag")
+    deck.add_argument("--mtags", type=int, default=10, help="Number of distinct mtags")
+    deck.add_argument(
+        "--mtag-density", type=float, default=0.5, help="Fraction of items with an mtag"
+    )
+    deck.add_argument("--synonyms", type=int, default=1, help="Synonyms per response")
+
+    learner = parser.add_argument_group("simulated learners")
+    learner.add_argument("--learners", type=int, default=1, help="Number of simulated learners")
+    learner.add_argument("--sessions", type=int, default=10, help="Sessions per learner")
+    learner.add_argument("--accuracy", type=float, default=0.8, help="Level 1 answer accuracy")
+    learner.add_argument(
+        "--level-penalty",
+        type=float,
+        default=0.1,
+        help="Accuracy lost for each level above Level 1",
+    )
+    learner.add_argument(
+        "--response-time", type=float, default=4.0, help="Median response time in seconds"
+    )
+    learner.add_argument(
+        "--response-time-sigma",
+        type=float,
+        default=0.5,
+        help="Log-normal spread of response times",
+    )
+
+    session = parser.add_argument_group("sessions")
+    session.add_argument("-l", "--level", help="Run fixed-level sessions at this level")
+    session.add_argument("-n", "--nquestions", type=int, help="Questions per session")
+    session.add_argument("--seed", type=int, default=0, help="Seed for decks and learners")
+    session.add_argument("--json", action="store_true", help="Print the report as JSON")
+    session.add_argument("--workdir", help="Keep generated decks and progress in this directory")
+
+    args = parser.parse_args(argv)
+
+    if args.items < 4:
+        parser.error("--items must be at least 4 so Level 1 has enough choices")
+
+    deck_config = SyntheticDeckConfig(
+        items=args.items,
+        tags=args.tags,
+        tag_density=args.tag_density,
+        mtags=args.mtags,
+        mtag_density=args.mtag_density,
+        synonyms=args.synonyms,
+        seed=args.seed,
+    )
+    learner_config = LearnerConfig(
+        accuracy=args.accuracy,
+        level_penalty=args.level_penalty,
+        response_time=args.response_time,
+        response_time_sigma=args.response_time_sigma,
+    )
+
+    def run(workdir):
+        return run_benchmark(
+            workdir,
+            deck_config,
+            learner_config,
+            learners=args.learners,
+            sessions=args.sessions,
+            level=args.level,
+            nquestions=args.nquestions,
+        )
+
+    if args.workdir:
+        result = run(args.workdir)
+    else:
+        with tempfile.TemporaryDirectory() as workdir:
+            result = run(workdir)
+
+    if args.json:
+        print(json.dumps(result.to_mapping(), indent=2))
+    else:
+        print(format_report(result))
+
+
+if __name__ == "__main__":
+    main()
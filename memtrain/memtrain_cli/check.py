@@ -0,0 +1,48 @@
+import argparse
+import json
+import sys
+
+from memtrain.memtrain_common.check import check_study_sets
+from memtrain.memtrain_common.deck import find_study_sets
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check study sets for problems without loading them",
+        prog="memtrain check",
+    )
+    parser.add_argument(
+        "paths", nargs="+", metavar="path", help="Study sets, or directories of study sets"
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes (default: the number of CPUs)"
+    )
+    parser.add_argument("--json", action="store_true", help="Print problems as JSON lines")
+    parser.add_argument(
+        "--strict", action="store_true", help="Exit with an error status on warnings too"
+    )
+    args = parser.parse_args(argv)
+
+    checked = errors = warnings = 0
+    for csvfile, problems in check_study_sets(find_study_sets(args.paths), args.workers):
+        checked += 1
+        for problem in problems:
+            if problem.severity == "error":
+                errors += 1
+            else:
+                warnings += 1
+
+            if args.json:
+                print(json.dumps(problem.to_mapping()))
+            else:
+                print(problem)
+
+    print(
+        "Checked {} study sets: {} errors, {} warnings".format(checked, errors, warnings),
+        file=sys.stderr,
+    )
+    sys.exit(1 if errors or (args.strict and warnings) else 0)
+
+
+if __name__ == "__main__":
+    main()
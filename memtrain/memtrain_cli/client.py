@@ -0,0 +1,91 @@
+import json
+import os
+import socket
+import stat
+
+# Standard streams handed to the daemon, which runs the session on them.
+STREAM_FDS = [0, 1, 2]
+
+
+def default_socket_path():
+    """Return the per-user daemon socket path."""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "memtrain", "daemon.sock")
+
+    return os.path.join("/tmp", "memtrain-{}".format(os.getuid()), "daemon.sock")
+
+
+def is_private_dir(path):
+    """
+    Return whether path is a directory, not a symlink, owned by this user and
+    accessible to no one else.
+    """
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and stat.S_IMODE(info.st_mode) == 0o700
+    )
+
+
+def get_socket_path():
+    """
+    Return the daemon socket named by MEMTRAIN_DAEMON, which is either a path
+    or 1 for the default path, or None when the daemon is not in use.
+    """
+    value = os.environ.get("MEMTRAIN_DAEMON")
+
+    if not value or value == "0":
+        return None
+    if value.lower() in ("1", "true", "yes"):
+        return default_socket_path()
+
+    return value
+
+
+def run(argv, socket_path, fds=None):
+    """
+    Run a study session in the daemon on this process's standard streams.
+
+    Return the session's exit status, or None if the daemon is not reachable
+    or its socket is not in a private directory.
+    """
+    fds = STREAM_FDS if fds is None else fds
+
+    # Anyone who can write to the directory could put their own socket there.
+    if not is_private_dir(os.path.dirname(os.path.abspath(socket_path))):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    header = {"argv": list(argv), "cwd": os.getcwd(), "env": dict(os.environ)}
+
+    with sock:
+        socket.send_fds(sock, [json.dumps(header).encode("utf-8") + b"\n"], fds)
+
+        # The daemon replies with one status line when the session ends.
+        reply = b""
+        try:
+            while not reply.endswith(b"\n"):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                reply += chunk
+        except KeyboardInterrupt:
+            # Closing the socket ends the session in the daemon.
+            return 130
+
+    if not reply:
+        return 1
+
+    return json.loads(reply)["status"]
@@ -0,0 +1,33 @@
+import argparse
+import sys
+
+from memtrain.memtrain_common.binarydeck import compile_deck
+from memtrain.memtrain_common.deck import CSVError, Deck, find_study_sets
+from memtrain.memtrain_common.settings import SettingError
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compile study sets to memory-mapped deck files that open without parsing",
+        prog="memtrain compile",
+    )
+    parser.add_argument(
+        "paths", nargs="+", metavar="path", help="Study sets, or directories of study sets"
+    )
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for csvfile in find_study_sets(args.paths):
+        try:
+            path = compile_deck(Deck(csvfile))
+        except (CSVError, SettingError, IndexError, ValueError, OSError) as exc:
+            failed += 1
+            print("memtrain compile: {}: {}".format(csvfile, exc), file=sys.stderr)
+        else:
+            print(path)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
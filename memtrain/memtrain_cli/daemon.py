@@ -0,0 +1,214 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import traceback
+
+from memtrain.memtrain_cli.__main__ import MemtrainCLI, build_parser
+from memtrain.memtrain_cli.client import STREAM_FDS, default_socket_path, is_private_dir
+from memtrain.memtrain_common import sqlprofile
+from memtrain.memtrain_common.deck import DeckCache, get_deck_store
+from memtrain.memtrain_common.settings import SettingError
+
+# Largest request header accepted from a client, in bytes.
+MAX_HEADER_SIZE = 1 << 20
+
+# Seconds a client has to send its request header.
+HEADER_TIMEOUT = 5.0
+
+
+def read_header(request):
+    """Receive a client's JSON request header and its standard stream fds."""
+    request.settimeout(HEADER_TIMEOUT)
+    data, fds, _, _ = socket.recv_fds(request, MAX_HEADER_SIZE, len(STREAM_FDS))
+
+    while not data.endswith(b"\n"):
+        chunk = request.recv(MAX_HEADER_SIZE)
+        if not chunk:
+            break
+        data += chunk
+
+    request.settimeout(None)
+    return json.loads(data), fds
+
+
+def get_deck_request(header):
+    """
+    Return the absolute path of the study set a request names and the deck
+    store the client asked for, or None.
+    """
+    try:
+        # Usage errors are reported by the session, not the daemon.
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            args = build_parser().parse_args(header["argv"])
+        store = get_deck_store(
+            args.deck_store or header["env"].get("MEMTRAIN_DECK_STORE") or "memory"
+        )
+    except (SystemExit, SettingError):
+        return None
+
+    return os.path.join(header["cwd"], args.csvfile), store
+
+
+def get_peer_uid(request):
+    """Return the user id of the process on the other end of a Unix socket."""
+    creds = request.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    _, uid, _ = struct.unpack("3i", creds)
+    return uid
+
+
+class SessionHandler(socketserver.BaseRequestHandler):
+    """Run one study session in a forked child on the client's streams."""
+
+    def handle(self):
+        header, fds, deck = self.server.pending
+
+        # Closing the connection, e.g. on Ctrl-C, ends the session.
+        threading.Thread(target=self.watch_client, daemon=True).start()
+
+        for fd, target in zip(fds, STREAM_FDS):
+            if fd != target:
+                os.dup2(fd, target)
+                os.close(fd)
+        sys.stdin = open(0, encoding="utf-8", closefd=False)
+        sys.stdout = open(1, "w", encoding="utf-8", buffering=1, closefd=False)
+        sys.stderr = open(2, "w", encoding="utf-8", buffering=1, closefd=False)
+
+        os.environ.clear()
+        os.environ.update(header["env"])
+        os.chdir(header["cwd"])
+
+        status = 0
+        try:
+            MemtrainCLI(header["argv"], deck)
+        except SystemExit as exc:
+            status = exc.code if isinstance(exc.code, int) else int(exc.code is not None)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+
+        # Children exit without running atexit handlers.
+        profiler = sqlprofile.get_profiler()
+        if profiler is not None:
+            profiler.write_report()
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.request.sendall(json.dumps({"status": status}).encode("utf-8") + b"\n")
+
+    def watch_client(self):
+        try:
+            self.request.recv(1)
+        except OSError:
+            pass
+        os._exit(130)
+
+
+class DaemonServer(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+    """
+    Serve study sessions from forked children that share decks loaded once in
+    the daemon.
+
+    The request header is read and its deck loaded before forking, so that
+    the deck cache lives in the long-running parent. Decks are cached per
+    deck store. In-memory and columnar decks hold no file handles, so children
+    can use their copies; a disk-store deck keeps an open SQLite connection to
+    its database file, which must not cross a fork, so its sessions open the
+    deck themselves. Each child opens its own progress store connection.
+    Requests from other users are refused.
+    """
+
+    def __init__(self, socket_path, cache):
+        self.cache = cache
+        self.pending = None
+        super().__init__(socket_path, SessionHandler)
+
+    def process_request(self, request, client_address):
+        try:
+            if get_peer_uid(request) != os.getuid():
+                raise PermissionError("daemon request from another user")
+            header, fds = read_header(request)
+        except (OSError, ValueError):
+            self.shutdown_request(request)
+            return
+
+        deck_request = get_deck_request(header)
+        deck = None
+
+        if deck_request and deck_request[1] != "disk":
+            try:
+                deck = self.cache.get(*deck_request)
+            except Exception:
+                # The session reports load errors to the client when it
+                # loads the deck itself.
+                pass
+
+        self.pending = (header, fds, deck)
+        try:
+            super().process_request(request, client_address)
+        finally:
+            self.pending = None
+            for fd in fds:
+                os.close(fd)
+
+    def service_actions(self):
+        super().service_actions()
+        self.cache.evict_idle()
+
+
+def serve(socket_path, cache, preload=()):
+    for csvfile in preload:
+        cache.get(csvfile)
+
+    socket_dir = os.path.dirname(socket_path)
+    os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+    # Anyone who can write to the directory could replace the socket.
+    if not is_private_dir(socket_dir):
+        raise SystemExit(
+            "memtrain daemon: {} must be a directory owned by you with mode 0700".format(socket_dir)
+        )
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+
+    with DaemonServer(socket_path, cache) as server:
+        os.chmod(socket_path, 0o600)
+        try:
+            server.serve_forever(poll_interval=1.0)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(socket_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Keep study sets loaded and serve sessions over a Unix socket",
+        prog="memtrain daemon",
+    )
+    parser.add_argument(
+        "--socket",
+        default=default_socket_path(),
+        help="Socket path (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-decks", type=int, default=8, help="Number of decks to keep loaded (default: 8)"
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        default=1800.0,
+        help="Unload decks unused for this many seconds (default: 1800)",
+    )
+    parser.add_argument("preload", nargs="*", metavar="csvfile", help="Study sets to load now")
+    args = parser.parse_args(argv)
+
+    print("memtrain daemon listening on " + args.socket, file=sys.stderr)
+    try:
+        serve(args.socket, DeckCache(args.max_decks, args.idle_timeout), args.preload)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,92 @@
+import argparse
+import os
+import random
+
+from memtrain.memtrain_common.deck import CSVError
+from memtrain.memtrain_common.engine import NoResponsesError
+from memtrain.memtrain_common.exams import ExamGenerator, write_keys
+from memtrain.memtrain_common.settings import SettingError
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate randomized printable exams with answer keys",
+        prog="memtrain exam",
+    )
+    parser.add_argument(
+        "--variants", type=int, default=1, help="The number of exam variants (default: 1)"
+    )
+    parser.add_argument(
+        "-n",
+        "--nquestions",
+        type=int,
+        help="Questions per exam (default: the study set's nquestions, or 50)",
+    )
+    parser.add_argument(
+        "-l", "--level", default="1", help="The level of every question (default: 1)"
+    )
+    parser.add_argument("-t", "--tags", help="Ask items matching these tags, e.g. 'a & !b'")
+    parser.add_argument("-x", "--not-tags", help="Do not ask items matching these tags")
+    parser.add_argument(
+        "-q", "--query", help="Ask items whose cue or response contains these words"
+    )
+    parser.add_argument(
+        "--format",
+        choices=("markdown", "html", "text"),
+        default="markdown",
+        help="The exam file format (default: markdown)",
+    )
+    parser.add_argument(
+        "--distractors",
+        choices=("mtag", "similar"),
+        default="mtag",
+        help="Fill in choices beyond a response's mtags with random or the most similar responses",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed the variants so that a run can be repeated (default: a random seed)",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes (default: the number of CPUs)"
+    )
+    parser.add_argument(
+        "-o", "--output", default="exams", help="The directory to write exams to (default: exams)"
+    )
+    parser.add_argument("csvfile", help="The study set to draw questions from")
+    args = parser.parse_args(argv)
+
+    if args.variants < 1:
+        parser.error("--variants must be at least 1")
+
+    seed = random.SystemRandom().randrange(2**32) if args.seed is None else args.seed
+
+    try:
+        generator = ExamGenerator(
+            args.csvfile,
+            args.level,
+            args.nquestions,
+            args.tags,
+            args.not_tags,
+            args.format,
+            args.distractors,
+            args.workers,
+            args.query,
+        )
+    except (CSVError, NoResponsesError, SettingError, OSError) as exc:
+        parser.exit(1, "memtrain exam: {}\n".format(exc))
+
+    try:
+        os.makedirs(args.output, exist_ok=True)
+        with open(os.path.join(args.output, "keys.jsonl"), "w", encoding="utf-8") as out:
+            count = write_keys(generator.generate(args.variants, seed, args.output), out)
+    except (NoResponsesError, OSError) as exc:
+        parser.exit(1, "memtrain exam: {}\n".format(exc))
+    finally:
+        generator.close()
+
+    print("Wrote {} exams to {} with seed {}".format(count, args.output, seed))
+
+
+if __name__ == "__main__":
+    main()
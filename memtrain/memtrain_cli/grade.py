@@ -0,0 +1,98 @@
+import argparse
+import json
+import sys
+
+from memtrain.memtrain_common.batchgrade import AnswerFormatError, BatchGrader, read_answers
+from memtrain.memtrain_common.deck import CSVError
+from memtrain.memtrain_common.settings import SettingError
+
+# Results written to the output at a time
+WRITE_SIZE = 256
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Grade a stream of answers to a study set's items",
+        prog="memtrain grade",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("jsonl", "csv"),
+        help="The answer format (default: csv for .csv files, otherwise jsonl)",
+    )
+    parser.add_argument(
+        "--fuzzy",
+        type=int,
+        metavar="N",
+        help="Accept answers up to N typos away, one per 5 characters "
+        "(default: the study set's fuzzy setting, or 0)",
+    )
+    parser.add_argument(
+        "--learner", help="The learner for answers that do not name one (default: default)"
+    )
+    parser.add_argument(
+        "--apply",
+        action="store_true",
+        help="Record the graded answers as reviews in learner progress, in one transaction",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes (default: the number of CPUs)"
+    )
+    parser.add_argument("-o", "--output", help="Write results to this file instead of stdout")
+    parser.add_argument("csvfile", help="The study set the answers are for")
+    parser.add_argument(
+        "answers",
+        help="A JSON-lines or CSV file of item_id and answer fields ('-' for stdin)",
+    )
+    args = parser.parse_args(argv)
+
+    answer_format = args.format or ("csv" if args.answers.lower().endswith(".csv") else "jsonl")
+
+    try:
+        grader = BatchGrader(args.csvfile, args.fuzzy, args.workers, args.learner)
+    except (CSVError, SettingError, OSError) as exc:
+        parser.exit(1, "memtrain grade: {}\n".format(exc))
+
+    answers = sys.stdin if args.answers == "-" else None
+    out = sys.stdout if args.output in (None, "-") else None
+    try:
+        if answers is None:
+            answers = open(args.answers, encoding="utf-8", newline="")
+        if out is None:
+            out = open(args.output, "w", encoding="utf-8")
+
+        summary = {"type": "summary", "answers": 0, "correct": 0, "near": 0, "errors": 0}
+        graded = []
+        lines = []
+        for result in grader.grade(read_answers(answers, answer_format)):
+            summary["answers"] += 1
+            if "error" in result:
+                summary["errors"] += 1
+            else:
+                summary["correct"] += result["correct"]
+                summary["near"] += result["match"] == "near"
+                if args.apply:
+                    graded.append(result)
+
+            lines.append(json.dumps(result))
+            if len(lines) >= WRITE_SIZE:
+                out.write("\n".join(lines) + "\n")
+                lines = []
+
+        if args.apply:
+            summary["applied"] = grader.apply(graded)
+
+        lines.append(json.dumps(summary))
+        out.write("\n".join(lines) + "\n")
+    except (AnswerFormatError, OSError) as exc:
+        parser.exit(1, "memtrain grade: {}\n".format(exc))
+    finally:
+        grader.close()
+        if answers not in (None, sys.stdin):
+            answers.close()
+        if out not in (None, sys.stdout):
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import asyncio
+import json
+
+from memtrain.memtrain_common.loadgen import format_report, run_load
+from memtrain.memtrain_common.server import ServerThread, SessionServer, study_set_name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure session server throughput with concurrent virtual learners",
+        prog="memtrain loadgen",
+    )
+
+    target = parser.add_argument_group("server")
+    target.add_argument("--host", default="127.0.0.1", help="Server address")
+    target.add_argument("--port", type=int, default=8765, help="Server port")
+    target.add_argument("--deck", help="Study set name on the server")
+    target.add_argument(
+        "--serve",
+        metavar="CSVFILE",
+        help="Start a server for CSVFILE in this process instead of connecting to one",
+    )
+    target.add_argument(
+        "--workers", type=int, default=4, help="Thread pool size for --serve (default: 4)"
+    )
+
+    load = parser.add_argument_group("load")
+    load.add_argument("--learners", type=int, default=10, help="Concurrent virtual learners")
+    load.add_argument("--sessions", type=int, default=10, help="Sessions per learner")
+    load.add_argument("-l", "--level", help="Level to study; adaptive when omitted")
+    load.add_argument("-n", "--nquestions", type=int, help="Questions per session")
+    load.add_argument("--seed", type=int, default=0, help="Random seed for answers")
+
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.serve and not args.deck:
+        parser.error("either --deck or --serve is required")
+
+    options = {"level": args.level, "nquestions": args.nquestions}
+    server_thread = None
+    host, port, deck = args.host, args.port, args.deck
+
+    if args.serve:
+        server_thread = ServerThread(SessionServer([args.serve], workers=args.workers))
+        host, port, deck = "127.0.0.1", server_thread.start(), study_set_name(args.serve)
+
+    try:
+        result = asyncio.run(
+            run_load(host, port, deck, args.learners, args.sessions, options, args.seed)
+        )
+    finally:
+        if server_thread is not None:
+            server_thread.stop()
+
+    if args.json:
+        print(json.dumps(result.to_mapping(), indent=2))
+    else:
+        print(format_report(result))
@@ -0,0 +1,202 @@
+import argparse
+import json
+import sys
+import textwrap
+
+from memtrain.memtrain_common.deck import CSVError, find_study_sets
+from memtrain.memtrain_common.engine import NoResponsesError
+from memtrain.memtrain_common.multideck import MultiDeckEngine, MultiDeckSession
+from memtrain.memtrain_common.settings import SettingError
+
+
+def print_question(question):
+    title = "{} [{}]".format(question["title"], question["stage"])
+    print(
+        title.ljust(59)
+        + " "
+        + "Response {}/{}".format(question["response_number"], question["total"]).rjust(20)
+    )
+    print()
+    print(textwrap.fill(question["cue"], initial_indent=" " * 6, subsequent_indent=" " * 6))
+    print()
+
+    for letter, choice in question.get("choices", {}).items():
+        print(
+            textwrap.fill(choice, initial_indent=letter + ")" + " " * 4, subsequent_indent=" " * 6)
+        )
+    for hint in question.get("hints", []):
+        print(textwrap.fill("Hint: " + hint, subsequent_indent=" " * 6))
+    print()
+
+
+def print_summary(summary):
+    print("Training session complete.")
+    print()
+    print(
+        "Correct: {}/{} ({}%)".format(summary["correct"], summary["total"], summary["percentage"])
+    )
+    if summary["incorrect_responses"]:
+        print()
+        print("Responses for which answers were incorrect:")
+        print()
+        for response in summary["incorrect_responses"]:
+            print(response)
+
+
+def run_interactive(session):
+    question = session.current()
+
+    while not question["complete"]:
+        print_question(question)
+        prompt = "Enter response choice: " if "choices" in question else "Enter response: "
+        result = session.answer(input(prompt))
+        print()
+
+        if not result["valid"]:
+            print("Please enter a valid response.")
+        else:
+            print(textwrap.fill(result["feedback"]))
+            if "other_answers" in result:
+                print(textwrap.fill(result["other_answers"]))
+        print()
+        question = result["next"]
+
+    print_summary(question["summary"])
+
+
+def run_scripted(session, answers):
+    question = session.current()
+
+    while not question["complete"]:
+        line = answers.readline()
+        if not line:
+            break
+
+        # The session moves on to the next item once an answer is graded.
+        item_id = session.current_item.item_id
+        study_set = session.engine.current_engine.csvfile
+
+        result = session.answer(line.rstrip("\r\n"))
+        if result["valid"]:
+            record = {
+                "type": "question",
+                "response_number": question["response_number"],
+                "study_set": study_set,
+                "item_id": item_id,
+                "level": question["level"],
+                "correct": result["correct"],
+                "match": result["match"],
+            }
+            print(json.dumps(record), flush=True)
+        question = result["next"]
+
+    summary = session.summary()
+    print(
+        json.dumps(
+            {
+                "type": "summary",
+                "answered": session.mtstatistics.response_number - 1,
+                "total": summary["total"],
+                "correct": summary["correct"],
+                "incorrect": summary["incorrect"],
+                "seed": session.engine.seed,
+            }
+        )
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Study one session drawn from several study sets",
+        prog="memtrain mix",
+    )
+    parser.add_argument(
+        "paths", nargs="+", metavar="path", help="Study sets, or directories of study sets"
+    )
+    parser.add_argument(
+        "-t",
+        "--tags",
+        help="Train items matching these tags, e.g. 'a,b' or 'a & (b | c) & !d'",
+    )
+    parser.add_argument("-x", "--not-tags", help="Do not train items matching these tags")
+    parser.add_argument(
+        "-q",
+        "--query",
+        help="Train items whose cue or response contains these words, best match first",
+    )
+    parser.add_argument("-l", "--level", help="Specify which level to study")
+    parser.add_argument(
+        "-n", "--nquestions", type=int, help="Set the number of questions for this session"
+    )
+    parser.add_argument(
+        "--learner", help="Record progress for this learner (default: the shared default learner)"
+    )
+    parser.add_argument(
+        "--answers",
+        metavar="FILE",
+        help="Read answers from FILE ('-' for stdin) and print JSON-lines results",
+    )
+    parser.add_argument(
+        "--fuzzy",
+        type=int,
+        metavar="N",
+        help="At levels 2 and 3, accept answers up to N typos away, one per 5 characters "
+        "(default: the study set's fuzzy setting, or 0)",
+    )
+    parser.add_argument(
+        "--distractors",
+        choices=("mtag", "similar"),
+        help="At level 1, fill in choices beyond a response's mtags with random responses "
+        "(mtag, the default) or the most similar responses (similar)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Worker processes that parse study sets (default: the number of CPUs)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed the question order and choices so that a session can be repeated "
+        "(default: a random seed)",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        engine = MultiDeckEngine(
+            find_study_sets(args.paths),
+            args.level,
+            args.nquestions,
+            args.tags,
+            args.not_tags,
+            args.learner,
+            args.query,
+            args.seed,
+            args.workers,
+        )
+    except (CSVError, NoResponsesError, SettingError, OSError) as exc:
+        parser.exit(1, "memtrain mix: {}\n".format(exc))
+
+    for study_set in engine.engines:
+        if args.fuzzy is not None:
+            study_set.settings.settings["fuzzy"] = args.fuzzy
+        if args.distractors:
+            study_set.settings.distractors = args.distractors
+
+    session = MultiDeckSession(engine)
+    try:
+        if args.answers == "-":
+            run_scripted(session, sys.stdin)
+        elif args.answers:
+            with open(args.answers, encoding="utf-8") as answers:
+                run_scripted(session, answers)
+        else:
+            run_interactive(session)
+    except (EOFError, KeyboardInterrupt):
+        print()
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import json
+import sys
+
+from memtrain.memtrain_common.perfsuite import (
+    BENCHMARKS,
+    DEFAULT_REPEAT,
+    DEFAULT_SIZES,
+    check_scaling,
+    compare,
+    compare_stores,
+    format_store_comparison,
+    format_suite,
+    load_suite,
+    run_suite,
+    save_suite,
+)
+
+
+def parse_sizes(value):
+    try:
+        return [int(size) for size in value.split(",") if size.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError("sizes must be comma-separated integers")
+
+
+def report_problems(problems, label):
+    if not problems:
+        print("No {} found.".format(label))
+        return 0
+
+    print("{} found:".format(label.capitalize()))
+    for problem in problems:
+        print("  " + problem)
+    return 1
+
+
+def run(args):
+    suite = run_suite(args.sizes, args.repeat, args.benchmark, args.seed)
+    print(format_suite(suite))
+    print()
+
+    if args.output:
+        save_suite(suite, args.output)
+        print("Saved results to {}".format(args.output))
+
+    if args.baseline:
+        baseline = load_suite(args.baseline)
+        if baseline.get("seed", 0) != suite["seed"]:
+            print(
+                "Note: the baseline was run with seed {}; times may differ with the data.".format(
+                    baseline.get("seed", 0)
+                )
+            )
+        problems = compare(baseline, suite, args.threshold)
+    else:
+        problems = check_scaling(suite)
+
+    return report_problems(problems, "regressions")
+
+
+def stores_command(args):
+    comparison = compare_stores(args.sizes, args.repeat)
+    if args.json:
+        print(json.dumps(comparison, indent=2, sort_keys=True))
+    else:
+        print(format_store_comparison(comparison))
+    return 0
+
+
+def compare_command(args):
+    problems = compare(load_suite(args.baseline), load_suite(args.current), args.threshold)
+    return report_problems(problems, "regressions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the performance regression suite", prog="memtrain perf"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark suite")
+    run_parser.set_defaults(func=run)
+    run_parser.add_argument(
+        "--sizes",
+        type=parse_sizes,
+        default=DEFAULT_SIZES,
+        help="Comma-separated deck sizes (default: {})".format(
+            ",".join(str(size) for size in DEFAULT_SIZES)
+        ),
+    )
+    run_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Runs per measurement, of which the median is kept (default: %(default)s)",
+    )
+    run_parser.add_argument(
+        "--seed", type=int, default=0, help="Seed for the decks and session planning (default: 0)"
+    )
+    run_parser.add_argument(
+        "-b",
+        "--benchmark",
+        action="append",
+        choices=list(BENCHMARKS),
+        help="Only run this benchmark (repeatable)",
+    )
+    run_parser.add_argument("-o", "--output", help="Save results as a JSON baseline")
+    run_parser.add_argument("--baseline", help="Compare results against this JSON baseline")
+    run_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against the baseline (default: 0.25 = 25%%)",
+    )
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two saved results")
+    compare_parser.set_defaults(func=compare_command)
+    compare_parser.add_argument("baseline", help="The baseline JSON results")
+    compare_parser.add_argument("current", help="The JSON results to check")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.25,
+        help="Allowed slowdown against the baseline (default: 0.25 = 25%%)",
+    )
+
+    stores_parser = subparsers.add_parser("stores", help="Compare the study-set database backends")
+    stores_parser.set_defaults(func=stores_command)
+    stores_parser.add_argument(
+        "--sizes",
+        type=parse_sizes,
+        default=DEFAULT_SIZES,
+        help="Comma-separated deck sizes (default: {})".format(
+            ",".join(str(size) for size in DEFAULT_SIZES)
+        ),
+    )
+    stores_parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help="Runs per measurement, of which the median is kept (default: %(default)s)",
+    )
+    stores_parser.add_argument("--json", action="store_true", help="Print results as JSON")
+
+    args = parser.parse_args(argv)
+    sys.exit(args.func(args))
+
+
+if __name__ == "__main__":
+    main()
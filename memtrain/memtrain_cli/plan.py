@@ -0,0 +1,79 @@
+import argparse
+import sys
+
+from memtrain.memtrain_common.cohort import CohortPlanner, write_plans
+from memtrain.memtrain_common.deck import CSVError
+from memtrain.memtrain_common.engine import NoResponsesError
+from memtrain.memtrain_common.settings import SettingError
+
+
+def read_learners(path):
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        return [line.strip() for line in stream if line.strip()]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Plan the next session for every learner in a cohort",
+        prog="memtrain plan",
+    )
+    parser.add_argument("--learner", action="append", help="Plan for this learner (repeatable)")
+    parser.add_argument(
+        "--learners-file",
+        metavar="FILE",
+        help="Plan for the learners listed in FILE, one per line ('-' for stdin)",
+    )
+    parser.add_argument("-t", "--tags", help="Plan items matching these tags, e.g. 'a & !b'")
+    parser.add_argument("-x", "--not-tags", help="Do not plan these tags")
+    parser.add_argument("-l", "--level", help="Plan fixed-level sessions at this level")
+    parser.add_argument("-n", "--nquestions", type=int, help="Questions per session")
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed the plans so that a run can be repeated (default: a random seed, "
+        "recorded in each plan)",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="Worker processes (default: the number of CPUs)"
+    )
+    parser.add_argument("-o", "--output", help="Write plans to this file instead of stdout")
+    parser.add_argument("csvfile", help="The CSV file to plan from")
+    args = parser.parse_args(argv)
+
+    try:
+        planner = CohortPlanner(
+            args.csvfile,
+            args.level,
+            args.nquestions,
+            args.tags,
+            args.not_tags,
+            workers=args.workers,
+            seed=args.seed,
+        )
+    except (CSVError, NoResponsesError, SettingError) as exc:
+        parser.exit(1, "memtrain plan: {}\n".format(exc))
+
+    try:
+        learner_ids = list(args.learner or [])
+        if args.learners_file:
+            learner_ids += read_learners(args.learners_file)
+        if not learner_ids:
+            # Without a roster, plan for everyone with recorded progress.
+            learner_ids = planner.learner_ids()
+
+        if args.output in (None, "-"):
+            write_plans(planner.plan(learner_ids), sys.stdout)
+        else:
+            with open(args.output, "w", encoding="utf-8") as out:
+                count = write_plans(planner.plan(learner_ids), out)
+            print("Wrote {} plans to {} with seed {}".format(count, args.output, planner.seed))
+    finally:
+        planner.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import sys
+
+from memtrain.memtrain_common.progress_store import ProgressStore
+
+
+def learners(store, args):
+    for learner_id in store.get_learner_ids():
+        print(learner_id)
+    return 0
+
+
+def export(store, args):
+    out = sys.stdout if args.output in (None, "-") else open(args.output, "w", encoding="utf-8")
+
+    count = 0
+    try:
+        for row in store.export_learner(args.learner):
+            out.write(json.dumps(row) + "\n")
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if out is not sys.stdout:
+        print("Exported {} items for {} to {}".format(count, args.learner, args.output))
+    return 0
+
+
+def delete(store, args):
+    count = store.delete_learner(args.learner)
+    print("Deleted {} items for {}".format(count, args.learner))
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="List, export, and delete learner progress", prog="memtrain progress"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    learners_parser = subparsers.add_parser("learners", help="List learners with progress")
+    learners_parser.set_defaults(func=learners)
+
+    export_parser = subparsers.add_parser("export", help="Write a learner's progress as JSON lines")
+    export_parser.set_defaults(func=export)
+    export_parser.add_argument("--learner", required=True, help="The learner to export")
+    export_parser.add_argument("-o", "--output", help="Write to this file instead of stdout")
+
+    delete_parser = subparsers.add_parser("delete", help="Delete all of a learner's progress")
+    delete_parser.set_defaults(func=delete)
+    delete_parser.add_argument("--learner", required=True, help="The learner to delete")
+
+    for subparser in (learners_parser, export_parser, delete_parser):
+        subparser.add_argument(
+            "csvfile", help="A study set whose progress file to use (or MEMTRAIN_PROGRESS_DB)"
+        )
+
+    args = parser.parse_args(argv)
+    store = ProgressStore(args.csvfile)
+    try:
+        status = args.func(store, args)
+    finally:
+        store.close()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
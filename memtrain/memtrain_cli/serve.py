@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+import sys
+
+from memtrain.memtrain_common.server import SessionServer, study_set_name
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Serve study sessions to many learners over a local JSON API",
+        prog="memtrain serve",
+    )
+    parser.add_argument("csvfiles", nargs="+", metavar="csvfile", help="Study sets to serve")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Threads for engine and SQLite work (default: 4)"
+    )
+    parser.add_argument(
+        "--max-sessions", type=int, default=1000, help="Open sessions allowed (default: 1000)"
+    )
+    parser.add_argument(
+        "--session-timeout",
+        type=float,
+        default=1800.0,
+        help="Close sessions idle for this many seconds (default: 1800)",
+    )
+    args = parser.parse_args(argv)
+
+    server = SessionServer(
+        args.csvfiles,
+        workers=args.workers,
+        max_sessions=args.max_sessions,
+        session_timeout=args.session_timeout,
+    )
+
+    def started(port):
+        names = ", ".join(study_set_name(path) for path in args.csvfiles)
+        print(
+            "Serving {} on http://{}:{}".format(names, args.host, port),
+            file=sys.stderr,
+        )
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, started))
+    except KeyboardInterrupt:
+        pass
@@ -1,19 +1,38 @@
-from memtrain.memtrain_common.database import Database
-from memtrain.memtrain_common.engine import CSVError, Engine, NoResponsesError
-from memtrain.memtrain_common.progress_store import ProgressStore
-from memtrain.memtrain_common.question import Question
-from memtrain.memtrain_common.settings import SettingError, Settings
-from memtrain.memtrain_common.stats import MtStatistics, SessionStatistics
+import importlib
 
-__all__ = [
-    "CSVError",
-    "Database",
-    "Engine",
-    "MtStatistics",
-    "NoResponsesError",
-    "ProgressStore",
-    "Question",
-    "SessionStatistics",
-    "SettingError",
-    "Settings",
-]
+# Public names and the modules that define them. They are imported on first
+# access so that importing a submodule, such as timings, does not load the
+# engine and its SQLite dependencies.
+_EXPORTS = {
+    "CSVError": "memtrain.memtrain_common.deck",
+    "ColumnarDatabase": "memtrain.memtrain_common.columnar",
+    "Database": "memtrain.memtrain_common.database",
+    "MappedDeck": "memtrain.memtrain_common.binarydeck",
+    "Deck": "memtrain.memtrain_common.deck",
+    "DeckCache": "memtrain.memtrain_common.deck",
+    "DiskDeck": "memtrain.memtrain_common.diskdeck",
+    "Engine": "memtrain.memtrain_common.engine",
+    "open_deck": "memtrain.memtrain_common.deck",
+    "MtStatistics": "memtrain.memtrain_common.stats",
+    "NoResponsesError": "memtrain.memtrain_common.engine",
+    "ProgressStore": "memtrain.memtrain_common.progress_store",
+    "Question": "memtrain.memtrain_common.question",
+    "SessionStatistics": "memtrain.memtrain_common.stats",
+    "SettingError": "memtrain.memtrain_common.settings",
+    "Settings": "memtrain.memtrain_common.settings",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
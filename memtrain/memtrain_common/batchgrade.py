@@ -0,0 +1,262 @@
+import csv
+import itertools
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from memtrain.memtrain_common.cohort import get_context
+from memtrain.memtrain_common.deck import open_deck
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.grading import AnswerKey
+from memtrain.memtrain_common.models import ProgressRecord
+from memtrain.memtrain_common.progress_store import ProgressStore
+
+# Answers sent to a worker at a time, and batches kept in flight per worker
+CHUNK_SIZE = 256
+BATCHES_PER_WORKER = 2
+
+# The fields of an answer record. Only item_id and answer are required.
+ANSWER_FIELDS = ("item_id", "answer", "learner", "elapsed")
+
+# The deck a worker grades from. Forked workers inherit the parent's copy, so
+# the deck is parsed once for the whole answer stream.
+_shared_deck = None
+
+# The worker's answer index, built once by init_worker.
+_worker_index = None
+
+
+class AnswerFormatError(ValueError):
+    """Raised when an answer record cannot be read."""
+
+
+class AnswerIndex:
+    """
+    The answer keys of a deck's items by item ID, for grading answers
+    without a Question. Keys are built the first time an item is graded and
+    shared by the items with the same response.
+    """
+
+    def __init__(self, deck, max_edits=None):
+        self.deck = deck
+        self.max_edits = deck.settings.settings["fuzzy"] if max_edits is None else max_edits
+        self.items = {item.item_id: item for item in deck.all_items}
+        self.keys = {}
+
+    def get_key(self, item):
+        key = self.keys.get(item.response_id)
+        if key is None:
+            synonyms = self.deck.database.get_response_values("synonym", item.response_id)
+            key = self.keys[item.response_id] = AnswerKey(item.response, synonyms, self.max_edits)
+        return key
+
+    def grade(self, item_id, answer):
+        """
+        Grade an answer to an item as levels 2 and 3 do. Return a mapping of
+        correct, match, and the item's response, or None for an unknown item.
+        """
+        item = self.items.get(item_id)
+        if item is None:
+            return None
+
+        grade = self.get_key(item).grade(answer)
+        return {"correct": grade.match is not None, "match": grade.match, "response": item.response}
+
+    def grade_batch(self, answers):
+        return [self.grade(item_id, answer) for item_id, answer in answers]
+
+
+def init_worker(csvfile, max_edits):
+    global _worker_index
+
+    deck = _shared_deck
+    if deck is None or deck.csvfile != csvfile:
+        # Spawned workers do not inherit the deck and load their own.
+        deck = open_deck(csvfile)
+
+    _worker_index = AnswerIndex(deck, max_edits)
+
+
+def grade_in_worker(answers):
+    return _worker_index.grade_batch(answers)
+
+
+def normalize_record(record):
+    """
+    Return a copy of an answer record whose item_id, answer, and learner are
+    strings, so that JSON numbers grade and are recorded under the same keys
+    as their CSV text. A missing item_id or learner is empty; a missing
+    answer is None, and is reported rather than graded.
+    """
+    out = dict(record)
+    for field in ANSWER_FIELDS[:3]:
+        value = record.get(field)
+        if value is not None:
+            out[field] = str(value)
+        else:
+            out[field] = None if field == "answer" else ""
+    return out
+
+
+def read_answers(stream, answer_format):
+    """
+    Yield (line, record) for each answer in a JSON-lines or CSV stream. CSV
+    streams have a header row naming the fields.
+    """
+    if answer_format == "csv":
+        reader = csv.DictReader(stream)
+        missing = [field for field in ANSWER_FIELDS[:2] if field not in (reader.fieldnames or [])]
+        if missing:
+            raise AnswerFormatError("The CSV header has no {} column.".format(missing[0]))
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line, text in enumerate(stream, 1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as exc:
+            raise AnswerFormatError("Line {}: {}".format(line, exc)) from exc
+        if not isinstance(record, dict):
+            raise AnswerFormatError("Line {}: expected a JSON object.".format(line))
+        yield line, record
+
+
+class BatchGrader:
+    """
+    Grade a stream of (item_id, answer) records against one study set.
+
+    The deck is loaded once. Answers are graded in chunks in a process pool
+    whose workers each build one AnswerIndex from the shared deck. Results
+    are yielded in input order as their chunks finish, with a bounded number
+    of chunks in flight, so streams of any length are graded in constant
+    memory. Graded results can then be applied to learner progress in one
+    transaction.
+    """
+
+    def __init__(self, csvfile, max_edits=None, workers=None, learner=None, deck=None):
+        self.csvfile = os.path.abspath(csvfile)
+        self.workers = workers or os.cpu_count() or 1
+        self.deck = deck or open_deck(self.csvfile)
+        self.index = AnswerIndex(self.deck, max_edits)
+        self.max_edits = self.index.max_edits
+
+        # The engine is only used for its progress store and study-set ID.
+        self.engine = Engine(self.csvfile, None, None, None, None, self.deck, learner, plan=False)
+        self.learner_id = self.engine.learner_id
+
+    def grade(self, records):
+        """Yield a result mapping for each (line, record), in order."""
+        records = ((line, normalize_record(record)) for line, record in records)
+        chunks = iter(lambda: list(itertools.islice(records, CHUNK_SIZE)), [])
+        first = next(chunks, [])
+        second = next(chunks, [])
+
+        if self.workers == 1 or not second:
+            for chunk in itertools.chain([first, second], chunks):
+                yield from self.grade_chunk(chunk, self.index.grade_batch)
+            return
+
+        global _shared_deck
+        _shared_deck = self.deck
+        # SQLite connections must not be used across a fork. The progress
+        # store is only needed by apply, so it is reopened afterwards.
+        self.engine.progress_store.close()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context(),
+                initializer=init_worker,
+                initargs=(self.csvfile, self.max_edits),
+            ) as executor:
+                pending = deque()
+                for chunk in itertools.chain([first, second], chunks):
+                    answers = [self.answer_of(record) for _, record in chunk]
+                    pending.append((chunk, executor.submit(grade_in_worker, answers)))
+                    if len(pending) >= self.workers * BATCHES_PER_WORKER:
+                        chunk, future = pending.popleft()
+                        yield from self.results(chunk, future.result())
+
+                while pending:
+                    chunk, future = pending.popleft()
+                    yield from self.results(chunk, future.result())
+        finally:
+            _shared_deck = None
+            self.engine.progress_store = ProgressStore(self.csvfile)
+
+    def grade_chunk(self, chunk, grade_batch):
+        return self.results(chunk, grade_batch([self.answer_of(record) for _, record in chunk]))
+
+    def answer_of(self, record):
+        return record["item_id"], record["answer"] or ""
+
+    def results(self, chunk, grades):
+        for (line, record), grade in zip(chunk, grades):
+            result = {
+                "type": "answer",
+                "line": line,
+                "item_id": record["item_id"],
+                "learner": record["learner"] or self.learner_id,
+            }
+            if record["answer"] is None:
+                result["error"] = "Missing answer"
+                yield result
+                continue
+            if grade is None:
+                result["error"] = "Unknown item"
+                yield result
+                continue
+
+            # Answer sheets may record how long each answer took.
+            if record.get("elapsed") not in (None, ""):
+                try:
+                    result["elapsed"] = float(record["elapsed"])
+                except (TypeError, ValueError):
+                    result["error"] = "Invalid elapsed time"
+                    yield result
+                    continue
+
+            result.update(grade)
+            yield result
+
+    def apply(self, results):
+        """
+        Record graded results as reviews in learner progress, in one
+        transaction. Results for unknown items are skipped. Return the number
+        of reviews recorded.
+        """
+        reviews = {}
+        for result in results:
+            if "error" not in result:
+                reviews.setdefault(result["learner"], []).append(result)
+
+        store = self.engine.progress_store
+        study_set_id = self.engine.study_set_id
+        updates = []
+        for learner_id, learner_results in reviews.items():
+            progress_map = store.get_progress_map(
+                study_set_id, list({result["item_id"] for result in learner_results}), learner_id
+            )
+            # Answers to the same item are applied one after another.
+            for result in learner_results:
+                item_id = result["item_id"]
+                progress_map[item_id] = self.engine.next_progress(
+                    progress_map.get(item_id) or ProgressRecord(),
+                    result["correct"],
+                    result.get("elapsed"),
+                )
+                updates.append((learner_id, item_id, progress_map[item_id]))
+
+        # Each (learner, item) is written once, with its final progress.
+        final = {(learner_id, item_id): progress for learner_id, item_id, progress in updates}
+        store.update_progress_many(
+            study_set_id,
+            [(learner_id, item_id, progress) for (learner_id, item_id), progress in final.items()],
+        )
+        return len(updates)
+
+    def close(self):
+        self.engine.close()
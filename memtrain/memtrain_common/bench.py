@@ -0,0 +1,295 @@
+import csv
+import math
+import os
+import random
+import time
+from dataclasses import dataclass, field
+
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.question import Question
+from memtrain.memtrain_common.timings import percentile
+
+PHASES = ["engine", "main_data_loop", "generate_mchoices", "grade_input", "record_result"]
+
+SYLLABLES = [
+    "ka",
+    "lo",
+    "mi",
+    "ne",
+    "ru",
+    "sa",
+    "ti",
+    "vo",
+    "ze",
+    "pa",
+    "qui",
+    "dor",
+    "fen",
+    "gal",
+    "hex",
+    "jun",
+]
+
+
+@dataclass
+class SyntheticDeckConfig:
+    """Shape of a generated study set."""
+
+    items: int = 200
+    tags: int = 10
+    tag_density: float = 0.5
+    mtags: int = 10
+    mtag_density: float = 0.5
+    synonyms: int = 1
+    seed: int = 0
+
+
+@dataclass
+class LearnerConfig:
+    """Accuracy and response-time model for a simulated learner."""
+
+    accuracy: float = 0.8
+    level_penalty: float = 0.1
+    response_time: float = 4.0
+    response_time_sigma: float = 0.5
+
+
+@dataclass
+class BenchmarkResult:
+    """Latencies collected while running simulated sessions."""
+
+    seed: int = 0
+    sessions: int = 0
+    questions: int = 0
+    correct: int = 0
+    wall_time: float = 0.0
+    latencies: dict[str, list[float]] = field(default_factory=lambda: {p: [] for p in PHASES})
+
+    def record(self, phase, seconds):
+        self.latencies[phase].append(seconds)
+
+    def summary(self):
+        """Return per-phase ops/sec and p50/p95/p99 latencies in seconds."""
+        out = {}
+
+        for phase in PHASES:
+            values = sorted(self.latencies[phase])
+            total = sum(values)
+            out[phase] = {
+                "count": len(values),
+                "total": total,
+                "ops_per_sec": len(values) / total if total else 0.0,
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+
+        return out
+
+    def to_mapping(self):
+        return {
+            "seed": self.seed,
+            "sessions": self.sessions,
+            "questions": self.questions,
+            "correct": self.correct,
+            "wall_time": self.wall_time,
+            "questions_per_sec": self.questions / self.wall_time if self.wall_time else 0.0,
+            "phases": self.summary(),
+        }
+
+
+def make_word(rng, index):
+    """Build a pronounceable, unique nonsense word."""
+    word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3)))
+    # A numeric suffix keeps words unique; a trailing "s" on some of them
+    # exercises the plural distractor pools.
+    word += str(index)
+    if rng.random() < 0.3:
+        word += "s"
+    return word
+
+
+def generate_study_set(path, config):
+    """Write a synthetic study-set CSV to path."""
+    rng = random.Random(config.seed)
+    tag_names = ["tag{}".format(i) for i in range(config.tags)]
+    mtag_names = ["mtag{}".format(i) for i in range(config.mtags)]
+
+    header = ["Cue", "Response", "Hint"]
+    header += ["Synonym"] * config.synonyms
+    header += ["Tag", "MTag", "Id"]
+
+    with open(path, "w", encoding="utf-8", newline="") as cf:
+        writer = csv.writer(cf)
+        writer.writerow(["Synthetic study set ({} items)".format(config.items)])
+        writer.writerow(header)
+
+        for index in range(config.items):
+            response = make_word(rng, index)
+            row = [
+                "The {} of {} is {{{{}}}}.".format(make_word(rng, index), make_word(rng, index)),
+                response,
+                "Starts with " + response[:2],
+            ]
+            row += ["{}-alt{}".format(response, n) for n in range(config.synonyms)]
+            row.append(
+                rng.choice(tag_names) if tag_names and rng.random() < config.tag_density else ""
+            )
+            row.append(
+                rng.choice(mtag_names) if mtag_names and rng.random() < config.mtag_density else ""
+            )
+            row.append("item-{}".format(index))
+            writer.writerow(row)
+
+    return path
+
+
+class SimulatedLearner:
+    """Answer questions with a tunable accuracy and response-time model."""
+
+    def __init__(self, config, rng):
+        self.config = config
+        self.rng = rng
+
+    def is_correct(self, level):
+        accuracy = self.config.accuracy - self.config.level_penalty * (int(level) - 1)
+        return self.rng.random() < max(0.0, min(1.0, accuracy))
+
+    def response_time(self):
+        """Sample a log-normal response time with the configured median."""
+        mu = math.log(self.config.response_time)
+        return self.rng.lognormvariate(mu, self.config.response_time_sigma)
+
+    def answer(self, question, level):
+        correct = self.is_correct(level)
+
+        if level == "1":
+            letters = [
+                letter
+                for letter in question.mchoices
+                if (letter == question.answer_letter) == correct
+            ]
+            return self.rng.choice(letters)
+
+        if not correct:
+            return "wrong answer"
+
+        return self.rng.choice([question.response] + list(question.synonyms)).lower()
+
+
+def run_session(csvfile, learner, result, level=None, nquestions=None, seed=None):
+    """Drive one session through the same calls the CLI makes."""
+    start = time.perf_counter()
+    engine = Engine(csvfile, level, nquestions, None, None, seed=seed)
+    result.record("engine", time.perf_counter() - start)
+
+    try:
+        question = Question(
+            engine.settings,
+            engine.database,
+            engine.deck.cue_templates,
+            engine.deck.distractors,
+            engine.rng,
+        )
+        mtstatistics = engine.mtstatistics
+
+        for question_index, (cue_id, response_id) in enumerate(engine.cr_id_pairs):
+            item = engine.current_item(question_index)
+            engine.settings.level = item.level
+            engine.settings.current_stage_label = item.stage_label
+
+            start = time.perf_counter()
+            question.main_data_loop(cue_id, response_id, mtstatistics)
+            result.record("main_data_loop", time.perf_counter() - start)
+
+            if engine.settings.level == "1":
+                start = time.perf_counter()
+                question.mchoices = question.generate_mchoices()
+                result.record("generate_mchoices", time.perf_counter() - start)
+
+            question.user_input = learner.answer(question, engine.settings.level)
+            elapsed_time = learner.response_time()
+            question.validate_input()
+
+            start = time.perf_counter()
+            question.grade_input()
+            result.record("grade_input", time.perf_counter() - start)
+
+            mtstatistics.times.append(elapsed_time)
+
+            start = time.perf_counter()
+            engine.record_result(item, mtstatistics.is_input_correct, elapsed_time)
+            result.record("record_result", time.perf_counter() - start)
+
+            question.finalize()
+    finally:
+        engine.close()
+
+    result.sessions += 1
+    result.questions += mtstatistics.total
+    result.correct += mtstatistics.number_correct
+
+
+def run_benchmark(
+    workdir,
+    deck_config,
+    learner_config,
+    learners=1,
+    sessions=10,
+    level=None,
+    nquestions=None,
+):
+    """Run simulated learners through many sessions on a synthetic deck."""
+    result = BenchmarkResult(seed=deck_config.seed)
+    rng = random.Random(deck_config.seed)
+
+    # Each learner studies their own copy of the deck so that progress is
+    # stored in a separate file next to it.
+    csvfiles = []
+    for learner_number in range(learners):
+        learner_dir = os.path.join(workdir, "learner-{}".format(learner_number))
+        os.makedirs(learner_dir, exist_ok=True)
+        csvfiles.append(generate_study_set(os.path.join(learner_dir, "deck.csv"), deck_config))
+
+    simulated = [SimulatedLearner(learner_config, random.Random(rng.random())) for _ in csvfiles]
+
+    start = time.perf_counter()
+    for _ in range(sessions):
+        for csvfile, learner in zip(csvfiles, simulated):
+            # Sessions are planned from the run's seed too, so that runs
+            # with the same seed ask the same questions.
+            run_session(csvfile, learner, result, level, nquestions, rng.randrange(2**32))
+    result.wall_time = time.perf_counter() - start
+
+    return result
+
+
+def format_report(result):
+    """Format a benchmark result as a plain-text table."""
+    mapping = result.to_mapping()
+    lines = [
+        "Seed: {}  Sessions: {}  Questions: {}  Correct: {}".format(
+            mapping["seed"], mapping["sessions"], mapping["questions"], mapping["correct"]
+        ),
+        "Wall time: {:.3f}s  Questions/sec: {:.1f}".format(
+            mapping["wall_time"], mapping["questions_per_sec"]
+        ),
+        "",
+        "{:<20}{:>8}{:>12}{:>10}{:>10}{:>10}".format(
+            "Phase", "Count", "Ops/sec", "p50 ms", "p95 ms", "p99 ms"
+        ),
+    ]
+
+    for phase, stats in mapping["phases"].items():
+        lines.append(
+            "{:<20}{:>8}{:>12.1f}{:>10.3f}{:>10.3f}{:>10.3f}".format(
+                phase,
+                stats["count"],
+                stats["ops_per_sec"],
+                stats["p50"] * 1000,
+                stats["p95"] * 1000,
+                stats["p99"] * 1000,
+            )
+        )
+
+    return "\n".join(lines)
@@ -0,0 +1,454 @@
+import array
+import functools
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from collections.abc import Mapping, Sequence
+
+from memtrain.memtrain_common.database import RESPONSE_VALUES, search_terms
+from memtrain.memtrain_common.deck import CSVError, Deck
+from memtrain.memtrain_common.models import SessionItem
+from memtrain.memtrain_common.settings import SettingError, Settings
+from memtrain.memtrain_common.tags import TagIndex
+
+# Identifies a compiled deck file and its format version.
+MAGIC = b"MTDECK01"
+
+# Compiled decks are written next to their CSV file with this extension.
+EXTENSION = ".mtdeck"
+
+# The magic number is followed by the length of the JSON header.
+HEADER_LENGTH = struct.Struct("<I")
+
+# An item: item ID string, cue ID, response ID, and placement.
+ITEM_RECORD = struct.Struct("<IIII")
+
+# A cue-response pair, sorted by cue and response ID, with its placement.
+PAIR_RECORD = struct.Struct("<III")
+
+# Sections start on this boundary so that arrays can be viewed in place.
+ALIGNMENT = 8
+
+# Marks IDs with no cue or response in ID-indexed tables.
+MISSING = 0xFFFFFFFF
+
+
+class CompiledDeckError(CSVError):
+    """Raised when a compiled deck file cannot be read."""
+
+
+def compiled_path(csvfile):
+    """Return where the compiled deck for a CSV file is written."""
+    return os.path.splitext(csvfile)[0] + EXTENSION
+
+
+class DeckWriter:
+    """Lay out the sections of a compiled deck and write them to a file."""
+
+    def __init__(self):
+        self.string_ids = {}
+        self.strings = []
+        self.sections = {}
+
+    def string(self, value):
+        """Return the string table index of value, adding it if needed."""
+        index = self.string_ids.get(value)
+        if index is None:
+            index = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def add(self, name, data):
+        self.sections[name] = bytes(data)
+
+    def add_array(self, name, values):
+        self.add(name, array.array("I", values).tobytes())
+
+    def add_postings(self, name, size, postings):
+        """Add a list of values for each ID below size, as offsets and values."""
+        starts = [0]
+        values = []
+        for key in range(size):
+            values += postings.get(key, [])
+            starts.append(len(values))
+
+        self.add_array(name + "_starts", starts)
+        self.add_array(name + "_values", values)
+
+    def write(self, path, header):
+        blobs = [value.encode("utf-8") for value in self.strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        self.add_array("string_offsets", offsets)
+        self.add("strings", b"".join(blobs))
+
+        # Section offsets are recorded in the header, which comes before
+        # them, so the header is laid out with room for its own length.
+        header = dict(
+            header, sections={name: [0, len(data)] for name, data in self.sections.items()}
+        )
+        header_size = len(json.dumps(header)) + 32 * len(self.sections) + 64
+        position = self.align(len(MAGIC) + HEADER_LENGTH.size + header_size)
+        for name, data in self.sections.items():
+            header["sections"][name] = [position, len(data)]
+            position = self.align(position + len(data))
+
+        header_bytes = json.dumps(header).encode("utf-8")
+        if len(header_bytes) > header_size:
+            raise CompiledDeckError("The compiled deck header does not fit.")
+
+        # Writing to a new file and renaming it leaves processes that have the
+        # old file mapped reading a consistent copy.
+        # Concurrent compiles each write their own temporary file.
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary, "wb") as out:
+            out.write(MAGIC + HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+            for name, data in self.sections.items():
+                out.seek(header["sections"][name][0])
+                out.write(data)
+        os.replace(temporary, path)
+
+    def align(self, position):
+        return -(-position // ALIGNMENT) * ALIGNMENT
+
+
+def compile_deck(deck, path=None):
+    """Write a loaded deck to a compiled deck file and return its path."""
+    path = path or compiled_path(deck.csvfile)
+    database = deck.database
+    cur = database.conn.cursor()
+    writer = DeckWriter()
+
+    items = deck.all_items
+    writer.add(
+        "items",
+        b"".join(
+            ITEM_RECORD.pack(
+                writer.string(item.item_id), item.cue_id, item.response_id, item.placement
+            )
+            for item in items
+        ),
+    )
+
+    for value in ("cue", "response"):
+        rows = cur.execute("SELECT {0}_id, {0} FROM {0}s".format(value)).fetchall()
+        table = [MISSING] * (max((row[0] for row in rows), default=0) + 1)
+        for value_id, text in rows:
+            table[value_id] = writer.string(text)
+        writer.add_array(value + "s", table)
+    response_count = len(writer.sections["responses"]) // 4
+
+    rows = cur.execute(
+        "SELECT cue_id, response_id, placement FROM cues_to_responses ORDER BY cue_id, response_id"
+    )
+    writer.add("pairs", b"".join(PAIR_RECORD.pack(*row) for row in rows))
+
+    # Synonyms, hints, tags, and mtags of each response, in the order the
+    # study-set database returns them.
+    for value in RESPONSE_VALUES:
+        postings = {}
+        rows = cur.execute(
+            """SELECT response_id, {0} FROM responses_to_{0}s JOIN {0}s USING ({0}_id)
+               ORDER BY response_id, {0}_id""".format(
+                value
+            )
+        )
+        for response_id, text in rows:
+            postings.setdefault(response_id, []).append(writer.string(text))
+        writer.add_postings(value, response_count, postings)
+
+    # The responses with each mtag, for multiple-choice distractors.
+    mtags = {}
+    rows = cur.execute(
+        """SELECT mtag, response_id FROM responses_to_mtags JOIN mtags USING (mtag_id)
+           ORDER BY responses_to_mtags.rowid"""
+    )
+    for mtag, response_id in rows:
+        mtags.setdefault(mtag, []).append(response_id)
+    writer.add_array("mtag_names", [writer.string(mtag) for mtag in mtags])
+    writer.add_postings("mtag_responses", len(mtags), dict(enumerate(mtags.values())))
+
+    # One bitset over the items per tag, as the tag index uses them.
+    tag_index = deck.tag_index
+    width = (len(items) + 7) // 8
+    writer.add_array("tag_names", [writer.string(tag) for tag in tag_index.bitsets])
+    writer.add(
+        "tag_bitsets",
+        b"".join(bitset.to_bytes(width, "little") for bitset in tag_index.bitsets.values()),
+    )
+
+    writer.write(
+        path,
+        {
+            "source": os.path.abspath(deck.csvfile),
+            "signature": list(deck.signature),
+            "settings": deck.settings.settings,
+            "header_row": deck.csv_column_header_row_number,
+            "indices": deck.indices,
+            "items": len(items),
+        },
+    )
+    return path
+
+
+class StringTable(Sequence):
+    """Strings decoded from the mapped file as they are read."""
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return str(self.data[self.offsets[index] : self.offsets[index + 1]], "utf-8")
+
+
+class MappedDatabase:
+    """
+    The lookups Question and Deck make of a study-set database, answered from
+    a mapped compiled deck instead of SQLite.
+    """
+
+    search_mode = "scan"
+
+    def __init__(self, mapping, header):
+        self.view = memoryview(mapping)
+        self.sections = header["sections"]
+        self.strings = StringTable(self.array("string_offsets"), self.section("strings"))
+        self.tables = {"cue": self.array("cues"), "response": self.array("responses")}
+        self.pairs = self.section("pairs")
+        self.postings = {
+            value: (self.array(value + "_starts"), self.array(value + "_values"))
+            for value in RESPONSE_VALUES + ("mtag_responses",)
+        }
+
+    def section(self, name):
+        offset, length = self.sections[name]
+        return self.view[offset : offset + length]
+
+    def array(self, name):
+        return self.section(name).cast("I")
+
+    def get_value(self, value, value_id):
+        return self.strings[self.tables[value][value_id]]
+
+    def get_response_values(self, value, response_id):
+        starts, values = self.postings[value]
+        if response_id + 1 >= len(starts):
+            return []
+        return [
+            self.strings[index] for index in values[starts[response_id] : starts[response_id + 1]]
+        ]
+
+    def get_placement(self, cue_id, response_id):
+        # Binary search over the sorted pair records.
+        low, high = 0, len(self.pairs) // PAIR_RECORD.size
+        while low < high:
+            middle = (low + high) // 2
+            record = PAIR_RECORD.unpack_from(self.pairs, middle * PAIR_RECORD.size)
+            if record[:2] < (cue_id, response_id):
+                low = middle + 1
+            else:
+                high = middle
+
+        if low * PAIR_RECORD.size < len(self.pairs):
+            record = PAIR_RECORD.unpack_from(self.pairs, low * PAIR_RECORD.size)
+            if record[:2] == (cue_id, response_id):
+                return record[2]
+
+        raise KeyError((cue_id, response_id))
+
+    @functools.cached_property
+    def mtag_positions(self):
+        return {
+            self.strings[index]: position for position, index in enumerate(self.array("mtag_names"))
+        }
+
+    def get_responses_by_mtag(self, mtag):
+        position = self.mtag_positions.get(mtag)
+        if position is None:
+            return []
+
+        starts, values = self.postings["mtag_responses"]
+        return [
+            self.get_value("response", response_id)
+            for response_id in values[starts[position] : starts[position + 1]]
+        ]
+
+    def get_all_responses(self):
+        return [self.strings[index] for index in self.tables["response"] if index != MISSING]
+
+    def search(self, query, limit=None):
+        """
+        Return the (cue_id, response_id) pairs whose cue or response contains
+        every word of query. Compiled decks have no full-text index, so words
+        match as substrings and results are unranked.
+        """
+        words = [word.casefold() for word, _ in search_terms(query)]
+        if not words:
+            return []
+
+        out = []
+        for position in range(len(self.pairs) // PAIR_RECORD.size):
+            cue_id, response_id, _ = PAIR_RECORD.unpack_from(
+                self.pairs, position * PAIR_RECORD.size
+            )
+            text = "{} {}".format(
+                self.get_value("cue", cue_id), self.get_value("response", response_id)
+            ).casefold()
+            if all(word in text for word in words):
+                out.append((cue_id, response_id))
+                if limit is not None and len(out) >= limit:
+                    break
+
+        return out
+
+
+class MappedItems(Sequence):
+    """A compiled deck's items, built from their records when accessed."""
+
+    def __init__(self, database, count):
+        self.database = database
+        self.records = database.section("items")
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("item index out of range")
+
+        item_id, cue_id, response_id, placement = ITEM_RECORD.unpack_from(
+            self.records, index * ITEM_RECORD.size
+        )
+        database = self.database
+        return SessionItem(
+            item_id=database.strings[item_id],
+            cue=database.get_value("cue", cue_id),
+            response=database.get_value("response", response_id),
+            cue_id=cue_id,
+            response_id=response_id,
+            placement=placement,
+        )
+
+
+class MappedBitsets(Mapping):
+    """Tag bitsets read from the mapped file the first time each tag is queried."""
+
+    def __init__(self, database, width):
+        self.database = database
+        self.width = width
+        self.positions = {
+            database.strings[index]: position
+            for position, index in enumerate(database.array("tag_names"))
+        }
+        self.data = database.section("tag_bitsets")
+        self.cache = {}
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __getitem__(self, tag):
+        bitset = self.cache.get(tag)
+        if bitset is None:
+            start = self.positions[tag] * self.width
+            bitset = self.cache[tag] = int.from_bytes(
+                self.data[start : start + self.width], "little"
+            )
+        return bitset
+
+
+class MappedDeck(Deck):
+    """
+    A deck opened from a compiled deck file with mmap.
+
+    Nothing is parsed or copied at open: item records, strings, and tag
+    bitsets are read from the mapping when they are used, and processes that
+    open the same file share its pages in the page cache. When the CSV file
+    changes, reload() compiles it again.
+    """
+
+    def __init__(self, path, csvfile=None):
+        # Deck.__init__ parses the CSV file, which is what opening avoids.
+        self.path = path
+        self.open(csvfile)
+        self.version = 0
+
+    def open(self, csvfile=None):
+        with open(self.path, "rb") as compiled:
+            mapping = mmap.mmap(compiled.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Arrays are viewed in native byte order, and files are written
+        # little-endian, so big-endian hosts load the CSV file instead.
+        if sys.byteorder != "little" or mapping[: len(MAGIC)] != MAGIC:
+            raise CompiledDeckError("{} is not a compiled deck.".format(self.path))
+        try:
+            (header_length,) = HEADER_LENGTH.unpack_from(mapping, len(MAGIC))
+            start = len(MAGIC) + HEADER_LENGTH.size
+            header = json.loads(mapping[start : start + header_length])
+        except (struct.error, ValueError) as exc:
+            raise CompiledDeckError("{} is damaged: {}".format(self.path, exc)) from exc
+
+        self.csvfile = csvfile or header["source"]
+        self.signature = tuple(header["signature"])
+        self.settings = Settings()
+        self.settings.settings.update(header["settings"])
+        self.indices = header["indices"]
+        self.csv_column_header_row_number = header["header_row"]
+        self.database = MappedDatabase(mapping, header)
+        self.all_items = MappedItems(self.database, header["items"])
+
+        for name in ("tag_index", "items_by_pair", "positions_by_id", "distractors"):
+            self.__dict__.pop(name, None)
+
+    @functools.cached_property
+    def tag_index(self):
+        return TagIndex.from_bitsets(
+            len(self.all_items), MappedBitsets(self.database, (len(self.all_items) + 7) // 8)
+        )
+
+    def reload(self):
+        """Compile the CSV file again if it changed, and return whether it did."""
+        signature = self.get_signature()
+        if signature == self.signature:
+            return False
+
+        self.signature = signature
+        try:
+            deck = Deck(self.csvfile)
+        except (IndexError, ValueError, SettingError, sqlite3.IntegrityError) as exc:
+            raise CSVError(str(exc) or "The study set could not be parsed.") from exc
+
+        compile_deck(deck, self.path)
+        self.open(self.csvfile)
+        self.version += 1
+        return True
+
+
+def open_compiled_deck(csvfile, path=None):
+    """
+    Return the compiled deck at path, by default the one next to csvfile, or
+    None if it is missing, unreadable, or older than the CSV file.
+    """
+    try:
+        deck = MappedDeck(path or compiled_path(csvfile), csvfile)
+    except (OSError, ValueError, CompiledDeckError):
+        return None
+
+    if deck.is_stale():
+        return None
+    return deck
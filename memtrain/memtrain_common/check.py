@@ -0,0 +1,187 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from memtrain.memtrain_common.deck import Deck, iter_rows
+from memtrain.memtrain_common.settings import SettingError, Settings
+
+# Study sets sent to a worker at a time.
+CHUNK_SIZE = 16
+
+
+@dataclass
+class Problem:
+    """A problem found in a study set. Errors stop it from loading; warnings do not."""
+
+    path: str
+    line: int
+    severity: str
+    code: str
+    message: str
+
+    def to_mapping(self):
+        return {
+            "path": self.path,
+            "line": self.line,
+            "severity": self.severity,
+            "code": self.code,
+            "message": self.message,
+        }
+
+    def __str__(self):
+        return "{}:{}: {}: {} [{}]".format(
+            self.path, self.line, self.severity, self.message, self.code
+        )
+
+
+class StudySetChecker(Deck):
+    """
+    Validate a study set without loading it.
+
+    Rows are checked as they are streamed from the file, with the same header
+    and settings parsing as Deck, but nothing is written to a database.
+    """
+
+    def __init__(self, csvfile):
+        # Deck.__init__ loads the study set, which is what checking avoids.
+        self.csvfile = csvfile
+        self.problems: list[Problem] = []
+
+    def report(self, line, severity, code, message):
+        self.problems.append(Problem(self.csvfile, line, severity, code, message))
+
+    def check(self):
+        """Return the problems found in the study set."""
+        try:
+            self.check_rows(iter_rows(self.csvfile))
+        except (OSError, UnicodeDecodeError) as exc:
+            self.report(0, "error", "unreadable", str(exc))
+
+        return self.problems
+
+    def check_rows(self, rows):
+        settings = Settings()
+        indices = None
+        width = 0
+        in_preamble = True
+        partial_header = None
+
+        cue_lines = {}
+        item_id_lines = {}
+
+        for line, row in rows:
+            if indices is None:
+                non_empty = [value for value in row if value]
+                if in_preamble and len(non_empty) == 1:
+                    try:
+                        self.set_csv_settings(settings, [row])
+                    except SettingError as exc:
+                        self.report(
+                            line, "error", "invalid-setting", str(exc) or "Invalid setting."
+                        )
+                    continue
+                if len(non_empty) > 1:
+                    in_preamble = False
+
+                normalized = self.normalize_row(row)
+                if self.is_header_row(normalized):
+                    indices = self.get_header_indices(normalized)
+                    width = 1 + max(
+                        index for key in indices for index in self.flatten(indices[key])
+                    )
+                elif partial_header is None and ("cue" in normalized or "response" in normalized):
+                    partial_header = (line, normalized)
+                continue
+
+            if len(row) < width:
+                self.report(
+                    line,
+                    "error",
+                    "short-row",
+                    "Row has {} columns; the header has {}.".format(len(row), width),
+                )
+                continue
+
+            cue = row[indices["cue"][0]]
+            responses = [row[index] for index in indices["response"]]
+
+            if not cue.strip():
+                self.report(line, "error", "empty-cue", "Row has no cue.")
+            if not any(responses):
+                self.report(line, "warning", "no-response", "Row has no responses.")
+
+            if cue in cue_lines:
+                self.report(
+                    line,
+                    "warning",
+                    "duplicate-cue",
+                    "Cue repeats line {}: {}".format(cue_lines[cue], cue),
+                )
+            else:
+                cue_lines[cue] = line
+
+            for placement, response in enumerate(responses):
+                if not response:
+                    continue
+
+                explicit_item_id = ""
+                if placement < len(indices["item_id"]) and indices["item_id"][placement]:
+                    explicit_item_id = row[indices["item_id"][placement][0]]
+                item_id = explicit_item_id or self.build_item_id(cue, response)
+
+                if item_id in item_id_lines:
+                    if explicit_item_id:
+                        message = "Id {} is already used on line {}.".format(
+                            item_id, item_id_lines[item_id]
+                        )
+                        self.report(line, "error", "duplicate-id", message)
+                    else:
+                        message = "Cue and response repeat line {}.".format(item_id_lines[item_id])
+                        self.report(line, "error", "duplicate-item", message)
+                else:
+                    item_id_lines[item_id] = line
+
+        if indices is None:
+            if partial_header is not None:
+                line, normalized = partial_header
+                missing = "response" if "cue" in normalized else "cue"
+                self.report(
+                    line,
+                    "error",
+                    "missing-column",
+                    "The mandatory column {} is missing.".format(missing),
+                )
+            else:
+                self.report(0, "error", "no-header", "No header row with Cue and Response.")
+        elif not item_id_lines:
+            self.report(0, "error", "no-items", "The study set has no items.")
+
+    def get_header_indices(self, normalized):
+        indices = {}
+        self.get_csv_column_indices(indices, [normalized])
+        return indices
+
+    def flatten(self, value):
+        for entry in value:
+            if isinstance(entry, list):
+                yield from self.flatten(entry)
+            else:
+                yield entry
+
+
+def check_study_set(csvfile):
+    return StudySetChecker(csvfile).check()
+
+
+def check_study_sets(csvfiles, workers=None):
+    """Yield (csvfile, problems) for each study set, in order."""
+    csvfiles = list(csvfiles)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(csvfiles) <= CHUNK_SIZE:
+        for csvfile in csvfiles:
+            yield csvfile, check_study_set(csvfile)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from zip(csvfiles, executor.map(check_study_set, csvfiles, chunksize=CHUNK_SIZE))
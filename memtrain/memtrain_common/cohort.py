@@ -0,0 +1,159 @@
+import json
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from memtrain.memtrain_common.deck import open_deck
+from memtrain.memtrain_common.engine import Engine, NoResponsesError, new_seed
+from memtrain.memtrain_common.progress_store import ProgressStore
+
+# Learners sent to a worker at a time.
+CHUNK_SIZE = 32
+
+# The deck a worker plans from. Forked workers inherit the parent's copy, so
+# the deck is parsed once for the whole cohort.
+_shared_deck = None
+
+# The worker's engine, built once by init_worker.
+_worker_engine = None
+
+# The seed of the run a worker plans for, set by init_worker.
+_worker_seed = None
+
+
+def get_context():
+    """Fork where available so that workers share the parent's loaded deck."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+
+    return multiprocessing.get_context()
+
+
+def learner_random(seed, learner_id):
+    """Return the random generator for one learner's plan in a seeded run."""
+    # String seeds are hashed the same way in every process and Python run.
+    return random.Random("{}:{}".format(seed, learner_id))
+
+
+def session_plan(engine, learner_id, seed):
+    """Plan a learner's next session and return it as a JSON-serializable mapping."""
+    engine.rng = learner_random(seed, learner_id)
+    items = engine.build_session_items(engine.filtered_items, learner_id)
+
+    return {
+        "learner": learner_id,
+        "seed": seed,
+        "items": [
+            {
+                "item_id": item.item_id,
+                "response": item.response,
+                "level": item.level,
+                "stage": item.stage_label,
+                "due": item.is_due,
+            }
+            for item in items
+        ],
+    }
+
+
+def init_worker(csvfile, options, seed):
+    global _worker_engine, _worker_seed
+
+    deck = _shared_deck
+    if deck is None or deck.csvfile != csvfile:
+        # Spawned workers do not inherit the deck and load their own.
+        deck = open_deck(csvfile)
+
+    # The engine opens its own progress store connection in this process.
+    _worker_engine = Engine(csvfile, *options, deck=deck, plan=False)
+    _worker_seed = seed
+
+
+def plan_in_worker(learner_id):
+    return session_plan(_worker_engine, learner_id, _worker_seed)
+
+
+class CohortPlanner:
+    """
+    Plan the next session for every learner in a cohort.
+
+    The deck is loaded and filtered once. Learners are planned in a process
+    pool; each worker builds one engine from the shared deck, opens its own
+    progress store connection, and plans many learners with it. Each learner
+    is planned with a generator seeded from the run's seed and the learner
+    ID, so a plan is the same however the cohort is split between workers.
+    """
+
+    def __init__(
+        self,
+        csvfile,
+        level=None,
+        nquestions=None,
+        tags=None,
+        not_tags=None,
+        workers=None,
+        deck=None,
+        seed=None,
+    ):
+        self.csvfile = os.path.abspath(csvfile)
+        self.seed = new_seed() if seed is None else seed
+        self.options = (level, nquestions, tags, not_tags)
+        self.workers = workers or os.cpu_count() or 1
+        self.deck = deck or open_deck(self.csvfile)
+
+        # Settings and empty selections are reported here, before any worker starts.
+        self.engine = Engine(self.csvfile, *self.options, deck=self.deck, plan=False)
+        if not self.engine.filtered_items:
+            raise NoResponsesError("There are no responses available that match the criteria.")
+
+    def learner_ids(self):
+        """Return the learners that have progress in this study set's progress file."""
+        return self.engine.progress_store.get_learner_ids()
+
+    def plan(self, learner_ids):
+        """Yield session plans in learner order."""
+        learner_ids = list(learner_ids)
+
+        if self.workers == 1 or len(learner_ids) <= CHUNK_SIZE:
+            for learner_id in learner_ids:
+                yield session_plan(self.engine, learner_id, self.seed)
+            return
+
+        global _shared_deck
+        _shared_deck = self.deck
+        # SQLite connections must not be used across a fork. Workers open
+        # their own progress store, and the parent reopens its store after.
+        self.engine.progress_store.close()
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context(),
+                initializer=init_worker,
+                initargs=(self.csvfile, self.options, self.seed),
+            ) as executor:
+                yield from executor.map(plan_in_worker, learner_ids, chunksize=CHUNK_SIZE)
+        finally:
+            _shared_deck = None
+            self.engine.progress_store = ProgressStore(self.csvfile)
+
+    def close(self):
+        self.engine.close()
+
+
+def write_plans(plans, out):
+    """Write plans to a text stream as JSON lines and return how many were written."""
+    count = 0
+    lines = []
+
+    for plan in plans:
+        lines.append(json.dumps(plan))
+        count += 1
+        if len(lines) >= CHUNK_SIZE:
+            out.write("\n".join(lines) + "\n")
+            lines = []
+
+    if lines:
+        out.write("\n".join(lines) + "\n")
+
+    return count
@@ -0,0 +1,276 @@
+import array
+import bisect
+import sqlite3
+
+from memtrain.memtrain_common.database import RESPONSE_VALUES, search_terms
+from memtrain.memtrain_common.deck import Deck
+
+
+class ColumnarDatabase:
+    """
+    A study-set database kept in Python columns and dict indexes instead of
+    SQLite, with the same methods as Database.
+
+    Text is held in lists indexed by ID, cue-response pairs in parallel
+    array columns indexed by (cue_id, response_id), and each response's
+    synonyms, hints, tags, and mtags in sorted arrays of value IDs. Lookups
+    are list and dict accesses with no statements to prepare. IDs are
+    numbered from 1 in order of first appearance, as in Database.
+    """
+
+    # There is no full-text index. Words match as substrings and results
+    # are unranked, as in Database without FTS5.
+    search_mode = "scan"
+
+    def __init__(self):
+        # Cue and response text by ID. Index 0 is unused, and the IDs of
+        # deleted cues and responses hold None.
+        self.cues = [None]
+        self.responses = [None]
+
+        # The cue-response pair columns, one row per pair, and the row of
+        # each pair still in the deck. Rows of deleted pairs are left behind.
+        self.pair_cue_ids = array.array("I")
+        self.pair_response_ids = array.array("I")
+        self.pair_placements = array.array("I")
+        self.pair_rows = {}
+
+        # Value text by ID, and each response's value IDs in ascending order.
+        self.values = {value: [None] for value in RESPONSE_VALUES}
+        self.links = {value: {} for value in RESPONSE_VALUES}
+
+        # The responses with each mtag ID, in the order they were linked.
+        self.mtag_responses = {}
+
+        # Value-to-ID lookups, as in Database
+        self.cue_ids = {}
+        self.response_ids = {}
+        self.value_ids = {value: {} for value in RESPONSE_VALUES}
+
+    def populate(self, indices, data_list):
+        """Populate the database with data"""
+        for data_row in data_list:
+            self.add_value("cue", data_row[indices["cue"][0]])
+
+        for data_row in data_list:
+            for index in indices["response"]:
+                if data_row[index]:
+                    self.add_value("response", data_row[index])
+
+        cue_counts = {}
+        for data_row in data_list:
+            cue_id = self.cue_ids[data_row[indices["cue"][0]]]
+            for index in indices["response"]:
+                response = data_row[index]
+                if response:
+                    cue_counts[cue_id] = cue_counts.get(cue_id, 0) + 1
+                    self.insert_pair(cue_id, self.response_ids[response], cue_counts[cue_id])
+
+        # Tags and mtags apply to every response on the row.
+        every_placement = len(indices["response"])
+        self.populate_response_values(data_list, indices["response"], indices["synonym"], "synonym")
+        self.populate_response_values(data_list, indices["response"], indices["hint"], "hint")
+        self.populate_response_values(
+            data_list, indices["response"], [indices["tag"]] * every_placement, "tag"
+        )
+        self.populate_response_values(
+            data_list, indices["response"], [indices["mtag"]] * every_placement, "mtag"
+        )
+
+    def populate_response_values(self, data_list, response_indices, value_indices, value):
+        """
+        Link responses to their synonyms, hints, tags, or mtags. value_indices
+        holds the column indices for each response placement.
+        """
+        # Values are numbered in order of first appearance.
+        for data_row in data_list:
+            for indices_for_placement in value_indices:
+                for index in indices_for_placement:
+                    if data_row[index]:
+                        self.add_value(value, data_row[index])
+
+        for data_row in data_list:
+            for placement, index in enumerate(response_indices):
+                response = data_row[index]
+                if not response:
+                    continue
+
+                response_id = self.response_ids[response]
+                for index in value_indices[placement]:
+                    if data_row[index]:
+                        self.link(value, response_id, self.value_ids[value][data_row[index]])
+
+    def add_value(self, value, text):
+        """Return the ID of a cue, response, or response value, adding it if it is new."""
+        if value == "cue":
+            ids, column = self.cue_ids, self.cues
+        elif value == "response":
+            ids, column = self.response_ids, self.responses
+        else:
+            ids, column = self.value_ids[value], self.values[value]
+
+        value_id = ids.get(text)
+        if value_id is None:
+            value_id = ids[text] = len(column)
+            column.append(text)
+        return value_id
+
+    def insert_pair(self, cue_id, response_id, placement):
+        if (cue_id, response_id) in self.pair_rows:
+            # The same constraint as the cues_to_responses primary key.
+            raise sqlite3.IntegrityError(
+                "UNIQUE constraint failed: cues_to_responses.cue_id, cues_to_responses.response_id"
+            )
+
+        self.pair_rows[(cue_id, response_id)] = len(self.pair_cue_ids)
+        self.pair_cue_ids.append(cue_id)
+        self.pair_response_ids.append(response_id)
+        self.pair_placements.append(placement)
+
+    def link(self, value, response_id, value_id):
+        value_ids = self.links[value].setdefault(response_id, array.array("I"))
+        position = bisect.bisect_left(value_ids, value_id)
+        if position < len(value_ids) and value_ids[position] == value_id:
+            return
+
+        value_ids.insert(position, value_id)
+        if value == "mtag":
+            self.mtag_responses.setdefault(value_id, []).append(response_id)
+
+    # Incremental updates #####################################################
+    def update_items(self, removed, added, values_by_response, cues, responses):
+        """Apply changed items without rebuilding the database; see Database.update_items()."""
+        added_pairs = {(content.cue, content.response): content for content in added}
+
+        for content in removed:
+            if (content.cue, content.response) not in added_pairs:
+                self.remove_pair(self.cue_ids[content.cue], self.response_ids[content.response])
+
+        removed_pairs = {(content.cue, content.response): content for content in removed}
+
+        for pair, content in added_pairs.items():
+            previous = removed_pairs.get(pair)
+            if previous is None:
+                self.add_pair(content)
+            elif previous.cue_placement != content.cue_placement:
+                row = self.pair_rows[(self.cue_ids[content.cue], self.response_ids[pair[1]])]
+                self.pair_placements[row] = content.cue_placement
+
+        for response, values in values_by_response.items():
+            if response in responses:
+                self.set_response_values(self.response_ids[response], values)
+
+        # Cues and responses left without items are dropped, so that they are
+        # not offered as multiple-choice distractors.
+        for content in removed:
+            if content.cue not in cues and content.cue in self.cue_ids:
+                self.cues[self.cue_ids.pop(content.cue)] = None
+            if content.response not in responses and content.response in self.response_ids:
+                response_id = self.response_ids.pop(content.response)
+                self.responses[response_id] = None
+                self.set_response_values(response_id, {})
+
+    def add_pair(self, content):
+        cue_id = self.add_value("cue", content.cue)
+        response_id = self.add_value("response", content.response)
+        self.insert_pair(cue_id, response_id, content.cue_placement)
+
+    def remove_pair(self, cue_id, response_id):
+        self.pair_rows.pop((cue_id, response_id), None)
+
+    def set_response_values(self, response_id, values):
+        """Replace a response's synonyms, hints, tags, and mtags."""
+        for mtag_id in self.links["mtag"].get(response_id, ()):
+            self.mtag_responses[mtag_id].remove(response_id)
+
+        for value in RESPONSE_VALUES:
+            self.links[value].pop(response_id, None)
+            for this_value in values.get(value, ()):
+                self.link(value, response_id, self.add_value(value, this_value))
+
+    # Full-text search ########################################################
+    def build_search_index(self):
+        """Searches scan the pairs, so there is no index to build."""
+
+    def search(self, query, limit=None):
+        """
+        Return the (cue_id, response_id) pairs whose cue or response contains
+        every word of query, in deck order.
+        """
+        words = [word.casefold() for word, _ in search_terms(query)]
+        if not words:
+            return []
+
+        out = []
+        for cue_id, response_id in self.pair_rows:
+            text = "{} {}".format(self.cues[cue_id], self.responses[response_id]).casefold()
+            if all(word in text for word in words):
+                out.append((cue_id, response_id))
+                if limit is not None and len(out) >= limit:
+                    break
+
+        return out
+
+    # Lookups #################################################################
+    def get_all_responses(self):
+        return [response for response in self.responses[1:] if response is not None]
+
+    def get_all_response_ids(self):
+        return [
+            response_id
+            for response_id, response in enumerate(self.responses)
+            if response is not None
+        ]
+
+    def get_cue_id(self, cue):
+        return self.cue_ids[cue]
+
+    def get_response_id(self, response):
+        return self.response_ids[response]
+
+    def get_all_response_ids_by_tag(self, tag):
+        tag_id = self.value_ids["tag"].get(tag)
+        return [
+            response_id
+            for response_id, tag_ids in self.links["tag"].items()
+            if tag_id is not None and tag_id in tag_ids
+        ]
+
+    def get_value(self, value, value_id):
+        """Return a cue, response, synonym, hint, tag, or mtag by its ID."""
+        if value == "cue":
+            return self.cues[value_id]
+        if value == "response":
+            return self.responses[value_id]
+        return self.values[value][value_id]
+
+    def get_response_values(self, value, response_id):
+        """Return a response's synonyms, hints, tags, or mtags."""
+        texts = self.values[value]
+        return [texts[value_id] for value_id in self.links[value].get(response_id, ())]
+
+    def get_placement(self, cue_id, response_id):
+        return self.pair_placements[self.pair_rows[(cue_id, response_id)]]
+
+    def get_responses_by_mtag(self, mtag):
+        """Return the responses with an mtag, in the order they were linked."""
+        mtag_id = self.value_ids["mtag"].get(mtag)
+        return [self.responses[response_id] for response_id in self.mtag_responses.get(mtag_id, [])]
+
+    def get_response_tags(self):
+        """Return (response_id, tag) pairs for every tagged response."""
+        tags = self.values["tag"]
+        return [
+            (response_id, tags[tag_id])
+            for response_id, tag_ids in self.links["tag"].items()
+            for tag_id in tag_ids
+        ]
+
+    def get_all_cue_response_id_pairs(self):
+        return list(self.pair_rows)
+
+
+class ColumnarDeck(Deck):
+    """A deck whose study-set database is a ColumnarDatabase."""
+
+    database_class = ColumnarDatabase
@@ -1,4 +1,33 @@
+import os
+import re
 import sqlite3
+import urllib.parse
+
+from memtrain.memtrain_common import sqlprofile
+
+# Tables of values linked to responses, each with a responses_to_ table.
+RESPONSE_VALUES = ("synonym", "hint", "tag", "mtag")
+
+# Words of a search query. A trailing * makes a word match as a prefix.
+SEARCH_TERM_PATTERN = re.compile(r"[^\s\"*]+\*?")
+
+
+def search_terms(query):
+    """Split a search query into (word, is_prefix) pairs."""
+    return [
+        (term.rstrip("*"), term.endswith("*")) for term in SEARCH_TERM_PATTERN.findall(query or "")
+    ]
+
+
+# Pragmas for study-set database files opened read-only. Pages are read
+# through a memory map, so processes that open the same file share them in
+# the page cache, and each connection's own page cache is capped.
+READ_ONLY_PRAGMAS = {
+    "query_only": "ON",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -4 * 1024,
+    "temp_store": "MEMORY",
+}
 
 
 class Database:
@@ -6,8 +35,9 @@ class Database:
 
     def __init__(self):
         """Create the database"""
-        # Initialize SQLite
-        self.conn = sqlite3.connect(":memory:")
+        # Initialize SQLite. A loaded deck can be shared by sessions running
+        # in different threads, which serialize their reads.
+        self.conn = sqlprofile.connect(":memory:", "deck", check_same_thread=False)
 
         # Create tables ###########################################################
         self.conn.execute(
@@ -86,54 +116,87 @@ class Database:
         self.conn.commit()
         self.cur = self.conn.cursor()
 
+        # Value-to-ID lookups for cues, responses, and the values linked to
+        # responses, filled in by populate()
+        self.cue_ids = {}
+        self.response_ids = {}
+        self.value_ids = {value: {} for value in RESPONSE_VALUES}
+
+        # How the search index was built: None until the first search, then
+        # "fts5", or "like" where SQLite was built without FTS5.
+        self.search_mode = None
+
+    @classmethod
+    def open(cls, path):
+        """Open a study-set database file read-only."""
+        database = cls.__new__(cls)
+        database.conn = sqlprofile.connect(
+            "file:{}?mode=ro".format(urllib.parse.quote(os.path.abspath(path))),
+            "deck",
+            uri=True,
+            check_same_thread=False,
+        )
+        for pragma, value in READ_ONLY_PRAGMAS.items():
+            database.conn.execute("PRAGMA {} = {}".format(pragma, value))
+        database.cur = database.conn.cursor()
+
+        # The file cannot be changed, so there is nothing to look IDs up for.
+        database.cue_ids = {}
+        database.response_ids = {}
+        database.value_ids = {value: {} for value in RESPONSE_VALUES}
+
+        database.cur.execute("SELECT 1 FROM sqlite_master WHERE name = 'search'")
+        database.search_mode = "fts5" if database.cur.fetchone() else "like"
+        return database
+
     def populate(self, indices, data_list):
         """Populate the database with data"""
-        # cues table
-        cue_list = []
+        # Each value table is built alongside a dict from value to its ID, and
+        # each link table alongside a set of pairs, so that loading stays
+        # linear in the number of rows.
 
+        # cues table
         for data_row in data_list:
             cue = data_row[indices["cue"][0]]
-            if cue not in cue_list:
+            if cue not in self.cue_ids:
                 self.conn.execute(
                     """INSERT INTO cues(cue)
                             VALUES (?)""",
                     (cue,),
                 )
-                cue_list.append(cue)
+                self.cue_ids[cue] = len(self.cue_ids) + 1
 
         # responses table
-        response_list = []
-
         for data_row in data_list:
             for placement, index in enumerate(indices["response"]):
                 response = data_row[index]
                 # Add response only if it's not empty and hasn't been added before.
-                if response and response not in response_list:
+                if response and response not in self.response_ids:
                     self.conn.execute(
                         """INSERT INTO responses(response)
                                 VALUES (?)""",
                         (response,),
                     )
-                    response_list.append(response)
+                    self.response_ids[response] = len(self.response_ids) + 1
 
         # cues_to_response table
-        all_cues = []
+        cue_counts = {}
 
         for data_row in data_list:
             # Get the cue_id
             cue = data_row[indices["cue"][0]]
-            cue_id = cue_list.index(cue) + 1
+            cue_id = self.cue_ids[cue]
 
             # Get the response_id
             for placement, index in enumerate(indices["response"]):
                 response = data_row[index]
 
                 if response:
-                    response_id = response_list.index(response) + 1
+                    response_id = self.response_ids[response]
 
                     # To determine placement, see if this cue has come up before.
-                    all_cues.append(cue_id)
-                    placement = len([i for i in all_cues if i == cue_id])
+                    cue_counts[cue_id] = cue_counts.get(cue_id, 0) + 1
+                    placement = cue_counts[cue_id]
 
                     self.conn.execute(
                         """INSERT INTO cues_to_responses(cue_id, response_id, placement)
@@ -141,180 +204,252 @@ class Database:
                         (cue_id, response_id, placement),
                     )
 
-        # synonyms table
-        synonym_list = []
-
-        for number, data_row in enumerate(data_list):
-            for placement, indices_for_placement in enumerate(indices["synonym"]):
-                for index in indices_for_placement:
-                    synonym = data_row[index]
-                    # Add row only if it's not empty
-                    if synonym and synonym not in synonym_list:
-                        self.conn.execute(
-                            """INSERT INTO synonyms(synonym)
-                                    VALUES (?)""",
-                            (synonym,),
-                        )
-                        synonym_list.append(synonym)
-
-        # responses_to_synonyms table
-        responses_to_synonyms_list = []
-
-        for data_row in data_list:
-            # Get the response_id
-            for placement, index in enumerate(indices["response"]):
-                response = data_row[index]
+        # synonyms and responses_to_synonyms tables
+        self.populate_response_values(data_list, indices["response"], indices["synonym"], "synonym")
 
-                if response:
-                    response_id = response_list.index(response) + 1
+        # hints and responses_to_hints tables
+        self.populate_response_values(data_list, indices["response"], indices["hint"], "hint")
 
-                    # Get the synonym_id
-                    for index in indices["synonym"][placement]:
-                        synonym = data_row[index]
+        # tags and responses_to_tags tables
+        # Only one tag placement per cue
+        tag_indices = [indices["tag"]] * len(indices["response"])
+        self.populate_response_values(data_list, indices["response"], tag_indices, "tag")
 
-                        if synonym:
-                            synonym_id = synonym_list.index(synonym) + 1
-                            pair = (response_id, synonym_id)
+        # mtags and responses_to_mtags tables
+        # Only one mtag placement per cue
+        mtag_indices = [indices["mtag"]] * len(indices["response"])
+        self.populate_response_values(data_list, indices["response"], mtag_indices, "mtag")
 
-                            if pair not in responses_to_synonyms_list:
-                                self.conn.execute(
-                                    """INSERT INTO responses_to_synonyms(response_id, synonym_id)
-                                                VALUES (?,?)""",
-                                    pair,
-                                )
-                                responses_to_synonyms_list.append(pair)
+        # Save changes
+        self.conn.commit()
 
-        # hints table
-        hint_list = []
+    def populate_response_values(self, data_list, response_indices, value_indices, value):
+        """
+        Populate a value table (synonyms, hints, tags, mtags) and the table that
+        links it to responses. value_indices holds the column indices for each
+        response placement.
+        """
+        value_ids = self.value_ids[value]
+        pairs = set()
 
-        for number, data_row in enumerate(data_list):
-            for placement, indices_for_placement in enumerate(indices["hint"]):
+        # Values are numbered in order of first appearance.
+        for data_row in data_list:
+            for indices_for_placement in value_indices:
                 for index in indices_for_placement:
-                    hint = data_row[index]
+                    this_value = data_row[index]
                     # Add row only if it's not empty
-                    if hint and hint not in hint_list:
+                    if this_value and this_value not in value_ids:
                         self.conn.execute(
-                            """INSERT INTO hints(hint)
-                                    VALUES (?)""",
-                            (hint,),
+                            """INSERT INTO {}s({})
+                                    VALUES (?)""".format(
+                                value, value
+                            ),
+                            (this_value,),
                         )
-                        hint_list.append(hint)
-
-        # responses_to_hints table
-        responses_to_hints_list = []
+                        value_ids[this_value] = len(value_ids) + 1
 
         for data_row in data_list:
             # Get the response_id
-            for placement, index in enumerate(indices["response"]):
+            for placement, index in enumerate(response_indices):
                 response = data_row[index]
 
-                if response:
-                    response_id = response_list.index(response) + 1
-
-                    # Get the hint_id
-                    for index in indices["hint"][placement]:
-                        hint = data_row[index]
-
-                        if hint:
-                            hint_id = hint_list.index(hint) + 1
-                            pair = (response_id, hint_id)
-
-                            if pair not in responses_to_hints_list:
-                                self.conn.execute(
-                                    """INSERT INTO responses_to_hints(response_id, hint_id)
-                                            VALUES (?,?)""",
-                                    pair,
-                                )
-                                responses_to_hints_list.append(pair)
-
-        # tags table
-        tag_list = []
-
-        for number, data_row in enumerate(data_list):
-            for index in indices["tag"]:
-                tag = data_row[index]
-                # Add row only if it's not empty
-                if tag and tag not in tag_list:
-                    self.conn.execute(
-                        """INSERT INTO tags(tag)
-                                VALUES (?)""",
-                        (tag,),
-                    )
-                    tag_list.append(tag)
-
-        # responses_to_tags table
-        responses_to_tag_list = []
-
-        for data_row in data_list:
-            # Get the response_id
-            for placement, index in enumerate(indices["response"]):
-                response = data_row[index]
+                if not response:
+                    continue
+
+                response_id = self.response_ids[response]
+
+                # Get the value_id
+                for index in value_indices[placement]:
+                    this_value = data_row[index]
+
+                    if this_value:
+                        pair = (response_id, value_ids[this_value])
+
+                        if pair not in pairs:
+                            self.conn.execute(
+                                """INSERT INTO responses_to_{}s(response_id, {}_id)
+                                        VALUES (?,?)""".format(
+                                    value, value
+                                ),
+                                pair,
+                            )
+                            pairs.add(pair)
+
+    # Incremental updates #####################################################
+    def update_items(self, removed, added, values_by_response, cues, responses):
+        """
+        Apply changed items without rebuilding the database. removed and added
+        are the ItemContents of deleted and inserted items; an updated item is
+        in both. values_by_response maps each response whose items changed to
+        its values, and cues and responses are every cue and response still in
+        use.
+        """
+        added_pairs = {(content.cue, content.response): content for content in added}
+
+        for content in removed:
+            pair = (content.cue, content.response)
+            if pair not in added_pairs:
+                self.remove_pair(self.cue_ids[content.cue], self.response_ids[content.response])
+
+        removed_pairs = {(content.cue, content.response): content for content in removed}
+
+        for pair, content in added_pairs.items():
+            previous = removed_pairs.get(pair)
+            if previous is None:
+                self.add_pair(content)
+            elif previous.cue_placement != content.cue_placement:
+                self.conn.execute(
+                    """UPDATE cues_to_responses SET placement = ?
+                            WHERE cue_id = ? AND response_id = ?""",
+                    (content.cue_placement, self.cue_ids[content.cue], self.response_ids[pair[1]]),
+                )
 
-                if response:
-                    response_id = response_list.index(response) + 1
-
-                    # Get the tag_id
-                    # Only one tag placement per cue
-                    for tag_index in indices["tag"]:
-                        tag = data_row[tag_index]
-
-                        if tag:
-                            tag_id = tag_list.index(tag) + 1
-                            pair = (response_id, tag_id)
-
-                            if pair not in responses_to_tag_list:
-                                self.conn.execute(
-                                    """INSERT INTO responses_to_tags(response_id, tag_id)
-                                            VALUES (?,?)""",
-                                    pair,
-                                )
-                                responses_to_tag_list.append(pair)
-
-        # mtags table
-        mtag_list = []
-
-        for number, data_row in enumerate(data_list):
-            for index in indices["mtag"]:
-                mtag = data_row[index]
-                # Add row only if it's not empty
-                if mtag and mtag not in mtag_list:
-                    self.conn.execute(
-                        """INSERT INTO mtags(mtag)
-                                VALUES (?)""",
-                        (mtag,),
-                    )
-                    mtag_list.append(mtag)
+        for response, values in values_by_response.items():
+            if response in responses:
+                self.set_response_values(self.response_ids[response], values)
 
-        # responses_to_mtags table
-        responses_to_mtag_list = []
+        # Cues and responses left without items are dropped, so that they are
+        # not offered as multiple-choice distractors.
+        for content in removed:
+            if content.cue not in cues and content.cue in self.cue_ids:
+                self.conn.execute(
+                    "DELETE FROM cues WHERE cue_id = ?", (self.cue_ids.pop(content.cue),)
+                )
+            if content.response not in responses and content.response in self.response_ids:
+                response_id = self.response_ids.pop(content.response)
+                self.conn.execute("DELETE FROM responses WHERE response_id = ?", (response_id,))
+                self.set_response_values(response_id, {})
 
-        for data_row in data_list:
-            # Get the response_id
-            for placement, index in enumerate(indices["response"]):
-                response = data_row[index]
+        self.conn.commit()
 
-                if response:
-                    response_id = response_list.index(response) + 1
+    def add_pair(self, content):
+        if content.cue not in self.cue_ids:
+            cursor = self.conn.execute("INSERT INTO cues(cue) VALUES (?)", (content.cue,))
+            self.cue_ids[content.cue] = cursor.lastrowid
+        if content.response not in self.response_ids:
+            cursor = self.conn.execute(
+                "INSERT INTO responses(response) VALUES (?)", (content.response,)
+            )
+            self.response_ids[content.response] = cursor.lastrowid
+
+        cue_id = self.cue_ids[content.cue]
+        response_id = self.response_ids[content.response]
+        cursor = self.conn.execute(
+            """INSERT INTO cues_to_responses(cue_id, response_id, placement)
+                    VALUES (?,?,?)""",
+            (cue_id, response_id, content.cue_placement),
+        )
 
-                    # Get the mtag_id
-                    # Only one mtag placement per cue
-                    for mtag_index in indices["mtag"]:
-                        mtag = data_row[mtag_index]
+        if self.search_mode == "fts5":
+            self.conn.execute(
+                """INSERT INTO search(rowid, cue, response, cue_id, response_id)
+                        VALUES (?,?,?,?,?)""",
+                (cursor.lastrowid, content.cue, content.response, cue_id, response_id),
+            )
+
+    def remove_pair(self, cue_id, response_id):
+        if self.search_mode == "fts5":
+            self.conn.execute(
+                """DELETE FROM search WHERE rowid =
+                        (SELECT rowid FROM cues_to_responses
+                         WHERE cue_id = ? AND response_id = ?)""",
+                (cue_id, response_id),
+            )
+        self.conn.execute(
+            "DELETE FROM cues_to_responses WHERE cue_id = ? AND response_id = ?",
+            (cue_id, response_id),
+        )
 
-                        if mtag:
-                            mtag_id = mtag_list.index(mtag) + 1
-                            pair = (response_id, mtag_id)
+    def set_response_values(self, response_id, values):
+        """Replace a response's synonyms, hints, tags, and mtags."""
+        for value in RESPONSE_VALUES:
+            self.conn.execute(
+                "DELETE FROM responses_to_{}s WHERE response_id = ?".format(value),
+                (response_id,),
+            )
+
+            value_ids = self.value_ids[value]
+            for this_value in values.get(value, ()):
+                if this_value not in value_ids:
+                    cursor = self.conn.execute(
+                        "INSERT INTO {}s({}) VALUES (?)".format(value, value), (this_value,)
+                    )
+                    value_ids[this_value] = cursor.lastrowid
 
-                            if pair not in responses_to_mtag_list:
-                                self.conn.execute(
-                                    """INSERT INTO responses_to_mtags(response_id, mtag_id)
-                                            VALUES (?,?)""",
-                                    pair,
-                                )
-                                responses_to_mtag_list.append(pair)
+                self.conn.execute(
+                    """INSERT OR IGNORE INTO responses_to_{}s(response_id, {}_id)
+                            VALUES (?,?)""".format(
+                        value, value
+                    ),
+                    (response_id, value_ids[this_value]),
+                )
 
-        # Save changes
+    # Full-text search ########################################################
+    def build_search_index(self):
+        """Index the cue and response text of every cue-response pair."""
+        if self.search_mode is not None:
+            return
+
+        try:
+            self.conn.execute(
+                """CREATE VIRTUAL TABLE search USING fts5
+                              (cue, response,
+                              cue_id UNINDEXED, response_id UNINDEXED,
+                              tokenize='unicode61 remove_diacritics 2')"""
+            )
+        except sqlite3.OperationalError:
+            self.search_mode = "like"
+            return
+
+        # Rows share their rowid with cues_to_responses, so that
+        # update_items() can replace them one pair at a time.
+        self.conn.execute(
+            """INSERT INTO search(rowid, cue, response, cue_id, response_id)
+                    SELECT cues_to_responses.rowid, cue, response, cue_id, response_id
+                    FROM cues_to_responses
+                    JOIN cues USING (cue_id)
+                    JOIN responses USING (response_id)"""
+        )
         self.conn.commit()
+        self.search_mode = "fts5"
+
+    def search(self, query, limit=None):
+        """
+        Return the (cue_id, response_id) pairs whose cue or response contains
+        every word of query, best match first.
+        """
+        terms = search_terms(query)
+        if not terms:
+            return []
+
+        self.build_search_index()
+
+        if self.search_mode == "fts5":
+            # Words are quoted so that punctuation is never read as FTS5 syntax.
+            match = " ".join(
+                '"{}"{}'.format(word.replace('"', '""'), "*" if is_prefix else "")
+                for word, is_prefix in terms
+            )
+            sql = """SELECT cue_id, response_id FROM search
+                     WHERE search MATCH ? ORDER BY rank"""
+            params = [match]
+        else:
+            # Without FTS5, words match as substrings and results are unranked.
+            sql = """SELECT cue_id, response_id
+                     FROM cues_to_responses
+                     JOIN cues USING (cue_id)
+                     JOIN responses USING (response_id)
+                     WHERE {}""".format(
+                " AND ".join(["(cue || ' ' || response) LIKE ? ESCAPE '\\'"] * len(terms))
+            )
+            params = ["%{}%".format(re.sub(r"([%_\\])", r"\\\1", word)) for word, _ in terms]
+
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        self.cur.execute(sql, params)
+        return self.cur.fetchall()
 
     # Helper methods ##########################################################
     def query(self, columns, tables):
@@ -334,14 +469,10 @@ class Database:
         return self.query("response_id", "responses")
 
     def get_cue_id(self, cue):
-        self.cur.execute("""SELECT cue_id FROM cues WHERE cue = (?)""", (cue,))
-        rows = self.cur.fetchall()
-        return rows[0][0]
+        return self.cue_ids[cue]
 
     def get_response_id(self, response):
-        self.cur.execute("""SELECT response_id FROM responses WHERE response = (?)""", (response,))
-        rows = self.cur.fetchall()
-        return rows[0][0]
+        return self.response_ids[response]
 
     def get_all_response_ids_by_tag(self, tag):
         self.cur.execute(
@@ -363,5 +494,51 @@ class Database:
 
         return rows
 
+    def get_value(self, value, value_id):
+        """Return a cue, response, synonym, hint, tag, or mtag by its ID."""
+        self.cur.execute(
+            """SELECT {0} FROM {0}s WHERE {0}_id = ?""".format(value),
+            (value_id,),
+        )
+        return self.cur.fetchone()[0]
+
+    def get_response_values(self, value, response_id):
+        """Return a response's synonyms, hints, tags, or mtags."""
+        self.cur.execute(
+            """SELECT {0} FROM responses_to_{0}s JOIN {0}s USING ({0}_id)
+                         WHERE response_id = ? ORDER BY {0}_id""".format(
+                value
+            ),
+            (response_id,),
+        )
+        return [row[0] for row in self.cur.fetchall()]
+
+    def get_placement(self, cue_id, response_id):
+        self.cur.execute(
+            """SELECT placement FROM cues_to_responses
+                         WHERE cue_id = ? AND response_id = ?""",
+            (cue_id, response_id),
+        )
+        return self.cur.fetchone()[0]
+
+    def get_responses_by_mtag(self, mtag):
+        """Return the responses with an mtag, in the order they were linked."""
+        self.cur.execute(
+            """SELECT response FROM mtags
+                         JOIN responses_to_mtags USING (mtag_id)
+                         JOIN responses USING (response_id)
+                         WHERE mtag = ? ORDER BY responses_to_mtags.rowid""",
+            (mtag,),
+        )
+        return [row[0] for row in self.cur.fetchall()]
+
+    def get_response_tags(self):
+        """Return (response_id, tag) pairs for every tagged response."""
+        self.cur.execute(
+            """SELECT responses_to_tags.response_id, tags.tag
+               FROM responses_to_tags JOIN tags USING (tag_id)"""
+        )
+        return self.cur.fetchall()
+
     def get_all_cue_response_id_pairs(self):
         return self.query("cue_id, response_id", "cues_to_responses")
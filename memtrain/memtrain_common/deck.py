@@ -0,0 +1,513 @@
+import csv
+import functools
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple
+
+from memtrain.memtrain_common.database import RESPONSE_VALUES, Database
+from memtrain.memtrain_common.distractors import DistractorIndex
+from memtrain.memtrain_common.models import SessionItem
+from memtrain.memtrain_common.settings import SettingError, Settings
+from memtrain.memtrain_common.tags import TagIndex
+from memtrain.memtrain_common.templates import CueTemplates
+from memtrain.memtrain_common.timings import Timings
+
+# Where a deck's study-set database is kept; see get_deck_store().
+DECK_STORES = ("memory", "disk", "columns")
+
+
+class CSVError(Exception):
+    """Raised when the study-set CSV is missing required structure."""
+
+
+def iter_rows(csvfile):
+    """Yield (line number, row) for each row of a CSV file as it is read."""
+    with open(csvfile, encoding="utf-8") as cf:
+        csvreader = csv.reader(cf)
+        for row in csvreader:
+            # line_num is the last line of the row; quoted fields can span lines.
+            yield csvreader.line_num, row
+
+
+def find_study_sets(paths):
+    """Expand directories to the CSV files they contain, sorted by path."""
+    csvfiles = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                csvfiles += [
+                    os.path.join(root, name) for name in sorted(files) if name.endswith(".csv")
+                ]
+        else:
+            csvfiles.append(path)
+
+    return csvfiles
+
+
+class ItemContent(NamedTuple):
+    """
+    What a study set's row says about one item, for telling when it changes.
+    A tuple, so that building and comparing one per item stays cheap.
+    """
+
+    cue: str
+    response: str
+    # The response column, as in SessionItem.
+    placement: int
+    # The cue's occurrence number, as in cues_to_responses.
+    cue_placement: int
+    row: tuple[str, ...]
+
+    def values(self, indices, value):
+        """Return the item's synonyms, hints, tags, or mtags."""
+        value_indices = indices[value]
+        # Tags and mtags apply to every response on the row.
+        if value in ("synonym", "hint"):
+            value_indices = value_indices[self.placement - 1]
+
+        return [self.row[index] for index in value_indices if self.row[index]]
+
+
+class Deck:
+    """
+    A parsed study set: its settings, study-set database, and item records.
+
+    A deck holds nothing that is specific to one session, so a long-running
+    process can load it once and share it between engines.
+    """
+
+    # The class of the study-set database that items are loaded into.
+    database_class = Database
+
+    def __init__(self, csvfile, timings=None):
+        self.csvfile = csvfile
+        self.signature = self.get_signature()
+        timings = timings or Timings()
+
+        with timings.span("load"):
+            csv_list = self.load(self.csvfile)
+        self.database = self.database_class()
+
+        with timings.span("parse"):
+            self.settings, self.indices, self.csv_column_header_row_number, data_list = self.parse(
+                csv_list
+            )
+
+        with timings.span("populate"):
+            self.database.populate(self.indices, data_list)
+        with timings.span("build_item_records"):
+            # (item ID, content) for each item, compared by reload().
+            self.item_contents = self.build_item_contents(self.indices, data_list)
+            self.all_items = self.build_records(self.item_contents)
+
+        # Incremented by each reload() that changes the deck, so that engines
+        # sharing it can tell when to catch up.
+        self.version = 0
+
+    def parse(self, csv_list):
+        """Return the settings, column indices, header row number, and data rows."""
+        settings = Settings()
+        indices: dict[str, list[Any]] = {
+            "cue": [],
+            "response": [],
+            "synonym": [],
+            "hint": [],
+            "tag": [],
+            "mtag": [],
+            "item_id": [],
+        }
+
+        self.set_csv_settings(settings, csv_list)
+        self.get_csv_column_indices(indices, csv_list)
+        header_row_number = self.get_csv_column_header_row_number(csv_list)
+
+        return settings, indices, header_row_number, csv_list[header_row_number + 1 :]
+
+    def reload(self):
+        """
+        Bring the deck up to date with its CSV file and return whether it
+        changed. Rows are matched to loaded items by item ID, and only items
+        that were inserted, updated, or deleted are written to the database.
+        A change to the settings or header row rebuilds the deck.
+        """
+        signature = self.get_signature()
+        if signature == self.signature:
+            return False
+
+        # A file that fails to parse, such as one saved mid-edit, is not
+        # retried until it changes again, and the loaded deck stays in use.
+        self.signature = signature
+
+        try:
+            settings, indices, header_row_number, data_list = self.parse(self.load(self.csvfile))
+            contents = self.build_item_contents(indices, data_list)
+        except (IndexError, SettingError) as exc:
+            raise CSVError(str(exc) or "The study set could not be parsed.") from exc
+
+        if (
+            indices != self.indices
+            or settings.settings != self.settings.settings
+            or len(dict(contents)) != len(contents)
+            or len({(content.cue, content.response) for _, content in contents}) != len(contents)
+        ):
+            database = self.database_class()
+            try:
+                database.populate(indices, data_list)
+            except sqlite3.IntegrityError as exc:
+                raise CSVError("Duplicate cue and response: {}".format(exc)) from exc
+
+            self.database = database
+            self.settings = settings
+            self.indices = indices
+            self.csv_column_header_row_number = header_row_number
+            previous = {}
+        else:
+            previous = dict(self.item_contents)
+            self.update_database(previous, contents)
+
+        # Items whose rows did not change are kept as they are.
+        items_by_id = {item.item_id: item for item in self.all_items}
+        self.all_items = [
+            (
+                items_by_id[item_id]
+                if previous.get(item_id) == content
+                else self.build_records([(item_id, content)])[0]
+            )
+            for item_id, content in contents
+        ]
+        self.item_contents = contents
+
+        # Indexes over the items are rebuilt the next time they are used.
+        for name in ("tag_index", "items_by_pair", "positions_by_id", "distractors"):
+            self.__dict__.pop(name, None)
+
+        self.version += 1
+        return True
+
+    def update_database(self, previous, contents):
+        """Write the items that differ between two sets of item contents."""
+        current = dict(contents)
+        removed = [
+            content for item_id, content in previous.items() if current.get(item_id) != content
+        ]
+        added = [content for item_id, content in contents if previous.get(item_id) != content]
+        if not removed and not added:
+            return
+
+        # A response's values are the union of those on all of its rows.
+        changed = {content.response for content in removed + added}
+        values_by_response = {}
+        for _, content in contents:
+            if content.response in changed:
+                values = values_by_response.setdefault(
+                    content.response, {value: {} for value in RESPONSE_VALUES}
+                )
+                for value in RESPONSE_VALUES:
+                    values[value].update(dict.fromkeys(content.values(self.indices, value)))
+
+        self.database.update_items(
+            removed,
+            added,
+            values_by_response,
+            {content.cue for _, content in contents},
+            {content.response for _, content in contents},
+        )
+
+    @functools.cached_property
+    def tag_index(self):
+        """Bitsets of the items with each tag, built the first time tags are queried."""
+        return TagIndex(self.all_items, self.database.get_response_tags())
+
+    @functools.cached_property
+    def cue_templates(self):
+        """Compiled cue templates by cue text, kept with the deck across reloads."""
+        return CueTemplates()
+
+    @functools.cached_property
+    def distractors(self):
+        """The response trigram index for similar distractors, built the first time it is used."""
+        return DistractorIndex(self.database)
+
+    @functools.cached_property
+    def items_by_pair(self):
+        """The items for each (cue_id, response_id) pair, in deck order."""
+        items = {}
+        for item in self.all_items:
+            items.setdefault((item.cue_id, item.response_id), []).append(item)
+        return items
+
+    @functools.cached_property
+    def positions_by_id(self):
+        """The position of each item ID's first item, built the first time one is looked up."""
+        positions = {}
+        for position, item in enumerate(self.all_items):
+            positions.setdefault(item.item_id, position)
+        return positions
+
+    def position_of(self, item_id):
+        """Return the position of the item with item_id, or None if there is none."""
+        return self.positions_by_id.get(item_id)
+
+    def search(self, query, items=None, limit=None):
+        """
+        Return the items whose cue or response contains every word of query,
+        best match first. The search index is built on the first search and
+        kept with the deck. items, if given, restricts the result to those
+        items.
+        """
+        # Filtering happens after ranking, so the limit cannot be pushed
+        # down into the index.
+        item_ids = None if items is None else {item.item_id for item in items}
+        pairs = self.database.search(query, limit if item_ids is None else None)
+
+        out = []
+        for pair in pairs:
+            for item in self.items_by_pair.get(pair, []):
+                if item_ids is None or item.item_id in item_ids:
+                    out.append(item)
+        return out if limit is None else out[:limit]
+
+    def get_signature(self):
+        """Return the CSV file's modification time and size."""
+        stat = os.stat(self.csvfile)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def is_stale(self):
+        """Determine whether the CSV file has changed since it was loaded"""
+        try:
+            return self.get_signature() != self.signature
+        except OSError:
+            return True
+
+    def build_item_id(self, cue: str, response: str) -> str:
+        normalized = "{}::{}".format(cue.strip(), response.strip())
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    def build_item_records(self, indices, data_list) -> list[SessionItem]:
+        return self.build_records(self.build_item_contents(indices, data_list))
+
+    def build_item_contents(self, indices, data_list) -> list[tuple[str, ItemContent]]:
+        """Return (item ID, content) for each item, in study set order."""
+        out: list[tuple[str, ItemContent]] = []
+        cue_counts: dict[str, int] = {}
+
+        for data_row in data_list:
+            cue = data_row[indices["cue"][0]]
+            row = tuple(data_row)
+
+            for placement, response_index in enumerate(indices["response"]):
+                response = data_row[response_index]
+
+                if not response:
+                    continue
+
+                cue_counts[cue] = cue_counts.get(cue, 0) + 1
+
+                explicit_item_id = ""
+                if placement < len(indices["item_id"]) and indices["item_id"][placement]:
+                    explicit_item_id = data_row[indices["item_id"][placement][0]]
+
+                content = ItemContent(cue, response, placement + 1, cue_counts[cue], row)
+                out.append((explicit_item_id or self.build_item_id(cue, response), content))
+
+        return out
+
+    def build_records(self, contents) -> list[SessionItem]:
+        return [
+            SessionItem(
+                item_id=item_id,
+                cue=content.cue,
+                response=content.response,
+                cue_id=self.database.get_cue_id(content.cue),
+                response_id=self.database.get_response_id(content.response),
+                placement=content.placement,
+            )
+            for item_id, content in contents
+        ]
+
+    def normalize_row(self, row):
+        """Make every string in a row lowercase and remove all whitespace"""
+        return ["".join(value.lower().split()) for value in row]
+
+    def load(self, csvfile):
+        """Load the CSV file"""
+        return [row for _, row in iter_rows(csvfile)]
+
+    def get_indices(self, row, target_str):
+        """Get all indices for target_str in a row"""
+        return [index for index, element in enumerate(row) if element == target_str]
+
+    def get_index(self, row, target_str):
+        """Get the first index for target_str in a row."""
+        return self.get_indices(row, target_str)[:1]
+
+    def get_index_mandatory(self, row, target_str):
+        """
+        Get a mandatory index for target_str in a row. It is an error if it doesn't
+        exist.
+        """
+        index = self.get_index(row, target_str)
+
+        if len(index) < 1:
+            raise CSVError(f"The mandatory column {target_str} is missing.")
+
+        return index
+
+    def is_header_row(self, row):
+        """Determine whether the curent row is the header row"""
+        return "cue" in row and "response" in row
+
+    def set_csv_settings(self, settings, csv_list):
+        """Set CSV settings"""
+        for row in csv_list:
+            non_empty = [item for item in row if len(item) > 0]
+
+            if len(non_empty) == 1:
+                settings_str = self.normalize_row(row)[0]
+                if settings_str.startswith("settings:"):
+                    settings.load_settings(settings_str)
+                else:
+                    settings.set_title(row)
+
+            elif len(non_empty) > 1:
+                break
+
+    def get_csv_column_indices(self, indices, csv_list):
+        """Get column indices for database processing"""
+        for row in csv_list:
+            this_row = self.normalize_row(row)
+            if self.is_header_row(this_row):
+                indices["cue"] = self.get_index_mandatory(this_row, "cue")
+
+                indices["response"] = self.get_index_mandatory(this_row, "response")
+                indices["response"] += self.get_index(this_row, "response2")
+                indices["response"] += self.get_index(this_row, "response3")
+
+                indices["synonym"] = [self.get_indices(this_row, "synonym")]
+                indices["synonym"].append(self.get_indices(this_row, "synonym2"))
+                indices["synonym"].append(self.get_indices(this_row, "synonym3"))
+
+                indices["hint"] = [self.get_indices(this_row, "hint")]
+                indices["hint"].append(self.get_indices(this_row, "hint2"))
+                indices["hint"].append(self.get_indices(this_row, "hint3"))
+
+                indices["tag"] = self.get_indices(this_row, "tag")
+                indices["mtag"] = self.get_indices(this_row, "mtag")
+                indices["item_id"] = [self.get_indices(this_row, "id")]
+                indices["item_id"].append(self.get_indices(this_row, "id2"))
+                indices["item_id"].append(self.get_indices(this_row, "id3"))
+
+                break
+
+    def get_csv_column_header_row_number(self, csv_list):
+        """Get the CSV column header row number"""
+        for row_number, row in enumerate(csv_list):
+            this_row = self.normalize_row(row)
+            if self.is_header_row(this_row):
+                return row_number
+
+        raise CSVError("No header row")
+
+
+def get_deck_store(requested=None):
+    """
+    Return where decks keep their study-set database: "memory" for SQLite in
+    memory, "disk" for a read-only database file next to the CSV file, or
+    "columns" for Python columns. An explicit request wins over the
+    MEMTRAIN_DECK_STORE environment variable.
+    """
+    store = (requested or os.environ.get("MEMTRAIN_DECK_STORE") or "memory").lower()
+    if store not in DECK_STORES:
+        raise SettingError(
+            "'{}': Invalid deck store. Use one of: {}.".format(store, ", ".join(DECK_STORES))
+        )
+    return store
+
+
+def open_deck(csvfile, timings=None, store=None):
+    """
+    Return the deck for csvfile in the requested deck store. In memory, a
+    compiled deck file is opened when one is up to date, and the CSV file is
+    loaded otherwise.
+    """
+    store = get_deck_store(store)
+    if store == "disk":
+        from memtrain.memtrain_common.diskdeck import open_disk_deck
+
+        return open_disk_deck(csvfile, timings)
+    if store == "columns":
+        from memtrain.memtrain_common.columnar import ColumnarDeck
+
+        return ColumnarDeck(csvfile, timings)
+
+    from memtrain.memtrain_common.binarydeck import open_compiled_deck
+
+    return open_compiled_deck(csvfile) or Deck(csvfile, timings)
+
+
+class DeckCache:
+    """
+    Keep recently used decks loaded, keyed by absolute CSV path and deck
+    store.
+
+    Decks are reloaded in place when their CSV file changes on disk, so that
+    sessions sharing them pick up the changes. The least recently
+    used deck is evicted when more than max_decks are loaded, and any deck
+    unused for idle_timeout seconds is evicted by evict_idle(). in_use, if
+    given, is called with a deck's key and returns whether live sessions
+    still share the deck; such decks are never evicted.
+    """
+
+    def __init__(self, max_decks=8, idle_timeout=1800.0, in_use=None):
+        self.max_decks = max_decks
+        self.idle_timeout = idle_timeout
+        self.in_use = in_use or (lambda key: False)
+        # (absolute path, deck store) to (deck, monotonic time of last use),
+        # least recently used first.
+        self.decks: OrderedDict[tuple[str, str], tuple[Deck, float]] = OrderedDict()
+        self.loads = 0
+        self.hits = 0
+
+    def get(self, csvfile, store=None):
+        """
+        Return a loaded deck for csvfile in the requested deck store, loading
+        or reloading it if needed.
+        """
+        key = (os.path.abspath(csvfile), get_deck_store(store))
+        entry = self.decks.pop(key, None)
+
+        if entry is None:
+            deck = open_deck(key[0], store=key[1])
+            self.loads += 1
+        else:
+            deck = entry[0]
+            if deck.is_stale():
+                deck.reload()
+                self.loads += 1
+            else:
+                self.hits += 1
+
+        self.decks[key] = (deck, time.monotonic())
+
+        # Decks in use stay loaded even past max_decks.
+        evictable = [other for other in self.decks if other != key and not self.in_use(other)]
+        for other in evictable[: max(0, len(self.decks) - self.max_decks)]:
+            del self.decks[other]
+
+        return deck
+
+    def evict_idle(self):
+        """Drop decks that have not been used within idle_timeout seconds."""
+        cutoff = time.monotonic() - self.idle_timeout
+
+        for key in [
+            key
+            for key, (_, last_used) in self.decks.items()
+            if last_used < cutoff and not self.in_use(key)
+        ]:
+            del self.decks[key]
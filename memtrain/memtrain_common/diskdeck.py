@@ -0,0 +1,241 @@
+import functools
+import json
+import os
+import sqlite3
+from collections.abc import Mapping, Sequence
+
+from memtrain.memtrain_common.database import Database
+from memtrain.memtrain_common.deck import CSVError, Deck
+from memtrain.memtrain_common.models import SessionItem
+from memtrain.memtrain_common.settings import SettingError, Settings
+from memtrain.memtrain_common.tags import TagIndex
+
+# On-disk study-set databases are written next to their CSV file with this
+# extension.
+EXTENSION = ".mtdb"
+
+# Items are read from a cursor in batches of this many when iterated.
+FETCH_SIZE = 1024
+
+# An item with its cue and response text, by position in the deck.
+ITEM_QUERY = """SELECT item_id, cue, response, cue_id, response_id, placement
+                FROM items
+                JOIN cues USING (cue_id)
+                JOIN responses USING (response_id)"""
+
+
+def disk_path(csvfile):
+    """Return where the on-disk study-set database for a CSV file is written."""
+    return os.path.splitext(csvfile)[0] + EXTENSION
+
+
+def write_disk_database(deck, path=None):
+    """
+    Write a loaded deck's study-set database, items, and search index to a
+    database file and return its path.
+    """
+    path = path or disk_path(deck.csvfile)
+    deck.database.build_search_index()
+
+    # The file is built under another name and renamed, so that processes
+    # reading the old file keep a consistent copy and never see a partial one.
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    if os.path.exists(temporary):
+        os.remove(temporary)
+
+    target = sqlite3.connect(temporary)
+    try:
+        deck.database.conn.backup(target)
+        target.execute("PRAGMA journal_mode = OFF")
+        target.execute("PRAGMA synchronous = OFF")
+        target.execute(
+            """CREATE TABLE items
+                          (position INTEGER PRIMARY KEY,
+                          item_id TEXT,
+                          cue_id INTEGER,
+                          response_id INTEGER,
+                          placement INTEGER)"""
+        )
+        target.execute("CREATE INDEX items_by_pair ON items (cue_id, response_id)")
+        target.execute("CREATE INDEX items_by_id ON items (item_id)")
+        target.executemany(
+            "INSERT INTO items VALUES (?,?,?,?,?)",
+            (
+                (position, item.item_id, item.cue_id, item.response_id, item.placement)
+                for position, item in enumerate(deck.all_items)
+            ),
+        )
+        target.execute("CREATE TABLE deck (header TEXT)")
+        target.execute(
+            "INSERT INTO deck VALUES (?)",
+            (
+                json.dumps(
+                    {
+                        "signature": list(deck.signature),
+                        "settings": deck.settings.settings,
+                        "header_row": deck.csv_column_header_row_number,
+                        "indices": deck.indices,
+                        "items": len(deck.all_items),
+                    }
+                ),
+            ),
+        )
+        target.commit()
+    finally:
+        target.close()
+
+    os.replace(temporary, path)
+    return path
+
+
+class DiskItems(Sequence):
+    """A disk deck's items, read from its database file when accessed."""
+
+    def __init__(self, database, count):
+        self.database = database
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("item index out of range")
+
+        row = self.database.conn.execute(ITEM_QUERY + " WHERE position = ?", (index,)).fetchone()
+        return SessionItem(*row)
+
+    def __iter__(self):
+        cursor = self.database.conn.execute(ITEM_QUERY + " ORDER BY position")
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield SessionItem(*row)
+
+
+class DiskItemsByPair(Mapping):
+    """The items for each (cue_id, response_id) pair, looked up in the index."""
+
+    def __init__(self, database):
+        self.database = database
+
+    def __getitem__(self, pair):
+        rows = self.database.conn.execute(
+            ITEM_QUERY + " WHERE cue_id = ? AND response_id = ? ORDER BY position", pair
+        ).fetchall()
+        if not rows:
+            raise KeyError(pair)
+        return [SessionItem(*row) for row in rows]
+
+    def __iter__(self):
+        return iter(self.database.conn.execute("SELECT DISTINCT cue_id, response_id FROM items"))
+
+    def __len__(self):
+        return self.database.conn.execute("SELECT count(*) FROM cues_to_responses").fetchone()[0]
+
+
+class DiskDeck(Deck):
+    """
+    A deck whose study-set database and items stay in a read-only database
+    file instead of memory.
+
+    SQLite pages the file in on demand through a shared memory map, with a
+    capped page cache per connection, so the memory a process needs does not
+    grow with the study set. Items are read when they are used. When the CSV
+    file changes, reload() writes the database file again.
+    """
+
+    def __init__(self, path, csvfile=None):
+        # Deck.__init__ parses the CSV file, which is what opening avoids.
+        self.path = path
+        self.open(csvfile)
+        self.version = 0
+
+    def open(self, csvfile=None):
+        database = Database.open(self.path)
+        try:
+            (header,) = database.conn.execute("SELECT header FROM deck").fetchone()
+            header = json.loads(header)
+        except (sqlite3.DatabaseError, TypeError, ValueError) as exc:
+            database.conn.close()
+            raise CSVError("{} is not a study-set database: {}".format(self.path, exc)) from exc
+
+        self.csvfile = csvfile or os.path.splitext(self.path)[0] + ".csv"
+        self.signature = tuple(header["signature"])
+        self.settings = Settings()
+        self.settings.settings.update(header["settings"])
+        self.indices = header["indices"]
+        self.csv_column_header_row_number = header["header_row"]
+        self.database = database
+        self.all_items = DiskItems(database, header["items"])
+        self.items_by_pair = DiskItemsByPair(database)
+        for name in ("tag_index", "distractors"):
+            self.__dict__.pop(name, None)
+
+    @functools.cached_property
+    def tag_index(self):
+        """Bitsets of the items with each tag, built from item positions without reading items."""
+        positions = {}
+        rows = self.database.conn.execute(
+            """SELECT tag, position FROM items
+               JOIN responses_to_tags USING (response_id)
+               JOIN tags USING (tag_id)"""
+        )
+        for tag, position in rows:
+            positions.setdefault(tag, []).append(position)
+
+        index = TagIndex.from_bitsets(len(self.all_items), {})
+        index.bitsets = {tag: index.to_bitset(items) for tag, items in positions.items()}
+        return index
+
+    def position_of(self, item_id):
+        """Return the position of the item with item_id, looked up in the database file."""
+        row = self.database.conn.execute(
+            "SELECT min(position) FROM items WHERE item_id = ?", (item_id,)
+        ).fetchone()
+        return row[0]
+
+    def reload(self):
+        """Write the database file again if the CSV file changed, and return whether it did."""
+        signature = self.get_signature()
+        if signature == self.signature:
+            return False
+
+        self.signature = signature
+        try:
+            deck = Deck(self.csvfile)
+        except (IndexError, ValueError, SettingError, sqlite3.IntegrityError) as exc:
+            raise CSVError(str(exc) or "The study set could not be parsed.") from exc
+
+        write_disk_database(deck, self.path)
+        self.open(self.csvfile)
+        self.version += 1
+        return True
+
+
+def open_disk_deck(csvfile, timings=None):
+    """
+    Return a disk deck for csvfile, writing its database file first if it is
+    missing or out of date. A deck loaded into memory is returned if the
+    file cannot be written.
+    """
+    path = disk_path(csvfile)
+    try:
+        deck = DiskDeck(path, csvfile)
+        if not deck.is_stale():
+            return deck
+    except (OSError, sqlite3.Error, CSVError):
+        pass
+
+    deck = Deck(csvfile, timings)
+    try:
+        write_disk_database(deck, path)
+        return DiskDeck(path, csvfile)
+    except (OSError, sqlite3.Error):
+        return deck
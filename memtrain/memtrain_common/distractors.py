@@ -0,0 +1,101 @@
+import heapq
+
+from memtrain.memtrain_common.grading import standardize
+
+# Responses are compared by their character trigrams, with the ends padded
+# so that shared beginnings and endings count.
+NGRAM_LENGTH = 3
+PADDING = " "
+
+# The most similar responses kept for each response. A question needs three
+# distractors, and some may already come from its mtags.
+SIMILAR_COUNT = 8
+
+# Trigrams shared by more than this fraction of the responses, such as a
+# common plural ending, are not used to find candidates in large decks. They
+# still count toward the similarity of the candidates that are found.
+COMMON_FRACTION = 0.05
+COMMON_MINIMUM = 64
+
+# How many candidates, by trigrams shared, are scored exactly
+CANDIDATE_COUNT = 64
+
+
+def ngrams(string):
+    """Return the set of padded character trigrams of a response."""
+    padded = PADDING + string.lower() + PADDING
+    return {padded[index : index + NGRAM_LENGTH] for index in range(len(padded) - 2)}
+
+
+class DistractorIndex:
+    """
+    A character trigram inverted index over a deck's responses, for finding
+    the responses most similar to each one.
+
+    The index is built the first time similar responses are asked for.
+    Candidates are the responses that share an uncommon trigram, found from
+    the postings of the response's own trigrams, so finding them does not
+    scan the deck. Candidates are ranked by the Dice coefficient of their
+    trigram sets, then by how close their lengths are, and the results are
+    cached for each response for as long as the deck is loaded.
+    """
+
+    def __init__(self, database):
+        self.database = database
+        self.responses = None
+        self.grams = None
+        self.postings = None
+        self.common_limit = 0
+        self.similar_responses = {}
+
+    def build(self):
+        self.responses = self.database.get_all_responses()
+        self.grams = [ngrams(response) for response in self.responses]
+        self.postings = {}
+        for index, grams in enumerate(self.grams):
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(index)
+        self.common_limit = max(COMMON_MINIMUM, int(len(self.responses) * COMMON_FRACTION))
+
+    def similar(self, response, exclude=()):
+        """
+        Return up to SIMILAR_COUNT responses most similar to response, most
+        similar first. Responses that standardize the same as response or
+        any of exclude, such as its synonyms, are left out.
+        """
+        similar = self.similar_responses.get(response)
+        if similar is None:
+            similar = self.similar_responses[response] = self.find_similar(response)
+
+        if not exclude:
+            return similar
+        excluded = {standardize(answer) for answer in exclude}
+        return [candidate for candidate in similar if standardize(candidate) not in excluded]
+
+    def find_similar(self, response):
+        if self.postings is None:
+            self.build()
+
+        grams = ngrams(response)
+        shared = {}
+        for gram in grams:
+            postings = self.postings.get(gram, ())
+            if len(postings) > self.common_limit:
+                continue
+            for index in postings:
+                shared[index] = shared.get(index, 0) + 1
+
+        # Synonyms of the response are left out later, on every call.
+        excluded = standardize(response)
+        candidates = heapq.nlargest(CANDIDATE_COUNT, shared, key=shared.__getitem__)
+
+        scored = []
+        for index in candidates:
+            candidate = self.responses[index]
+            if standardize(candidate) == excluded:
+                continue
+            candidate_grams = self.grams[index]
+            dice = 2 * len(grams & candidate_grams) / (len(grams) + len(candidate_grams))
+            scored.append((-dice, abs(len(candidate) - len(response)), index))
+
+        return [self.responses[index] for _, _, index in sorted(scored)[:SIMILAR_COUNT]]
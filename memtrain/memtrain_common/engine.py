@@ -1,22 +1,68 @@
-import csv
+from __future__ import annotations
+
+import copy
+import dataclasses
 import hashlib
 import os
 import random
-from typing import Any
+from collections.abc import Callable, Iterator, Sequence
+from datetime import datetime
 
-from memtrain.memtrain_common.database import Database
+from memtrain.memtrain_common.deck import CSVError, open_deck
 from memtrain.memtrain_common.models import ProgressRecord, SessionItem
-from memtrain.memtrain_common.progress_store import ProgressStore
-from memtrain.memtrain_common.settings import SettingError, Settings
+from memtrain.memtrain_common.progress_store import DEFAULT_LEARNER, ProgressStore
+from memtrain.memtrain_common.settings import SettingError
 from memtrain.memtrain_common.stats import SessionStatistics
+from memtrain.memtrain_common.tags import Selection
+from memtrain.memtrain_common.timings import Timings
+
+__all__ = ["CSVError", "Engine", "NoResponsesError", "new_seed"]
+
+# Repeated draws in a row after which random_order shuffles what is left
+REDRAW_LIMIT = 8
 
 
 class NoResponsesError(Exception):
     """Raised when no study items match the selected session criteria."""
 
 
-class CSVError(Exception):
-    """Raised when the study-set CSV is missing required structure."""
+def new_seed():
+    """Return a random seed for a run that was not given one."""
+    return random.SystemRandom().randrange(2**32)
+
+
+def random_order(count, rng):
+    """
+    Yield the positions below count in random order. Positions are drawn at
+    random until draws keep repeating, and the rest are then shuffled, so
+    taking a few positions costs little however large count is.
+    """
+    drawn = set()
+    repeats = 0
+    while len(drawn) < count and repeats < REDRAW_LIMIT:
+        position = rng.randrange(count)
+        if position in drawn:
+            repeats += 1
+            continue
+        repeats = 0
+        drawn.add(position)
+        yield position
+
+    rest = [position for position in range(count) if position not in drawn]
+    rng.shuffle(rest)
+    yield from rest
+
+
+def copy_item(item):
+    """Return a session item for a deck item, without progress."""
+    return SessionItem(
+        item_id=item.item_id,
+        cue=item.cue,
+        response=item.response,
+        cue_id=item.cue_id,
+        response_id=item.response_id,
+        placement=item.placement,
+    )
 
 
 class Engine:
@@ -28,37 +74,53 @@ class Engine:
         4: "Mature",
     }
 
-    def __init__(self, csvfile, level, nquestions, tags, not_tags):
+    def __init__(
+        self,
+        csvfile,
+        level,
+        nquestions,
+        tags,
+        not_tags,
+        deck=None,
+        learner_id=None,
+        plan=True,
+        query=None,
+        deck_store=None,
+        seed=None,
+    ):
         self.csvfile = csvfile
         self.level = level
         self.nquestions = nquestions
         self.tags = tags
         self.not_tags = not_tags
-
-        csv_list = self.load(self.csvfile)
-        self.settings = Settings()
-        self.database = Database()
-        self.progress_store = ProgressStore(self.csvfile)
+        self.query = query
+        # Progress is recorded per learner; see progress_store.
+        self.learner_id = learner_id or DEFAULT_LEARNER
+
+        # Monotonic-clock spans for each loading phase. Front ends add
+        # per-question render, grade, and persist spans.
+        self.timings = Timings()
+
+        # Session planning and multiple-choice layouts draw from this
+        # generator, so a session can be repeated from the seed reported
+        # with its timings.
+        self.seed = new_seed() if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.timings.context["seed"] = self.seed
+
+        # A deck that is already loaded, such as one cached by the daemon, is
+        # shared. Settings are copied because sessions change them.
+        self.deck = deck or open_deck(self.csvfile, self.timings, deck_store)
+        self.deck_version = self.deck.version
+        self.settings = copy.deepcopy(self.deck.settings)
+        self.database = self.deck.database
+        self.all_items = self.deck.all_items
+        self.csv_column_header_row_number = self.deck.csv_column_header_row_number
+
+        with self.timings.span("progress_store"):
+            self.progress_store = ProgressStore(self.csvfile)
         self.study_set_id = self.get_study_set_id()
 
-        indices: dict[str, list[Any]] = {
-            "cue": [],
-            "response": [],
-            "synonym": [],
-            "hint": [],
-            "tag": [],
-            "mtag": [],
-            "item_id": [],
-        }
-
-        self.set_csv_settings(self.settings, csv_list)
-        self.get_csv_column_indices(indices, csv_list)
-        self.csv_column_header_row_number = self.get_csv_column_header_row_number(csv_list)
-        data_list = csv_list[self.csv_column_header_row_number + 1 :]
-
-        self.database.populate(indices, data_list)
-        self.all_items = self.build_item_records(indices, data_list)
-
         self.session_mode = "adaptive"
         self.configure_session_mode()
 
@@ -78,7 +140,15 @@ class Engine:
             except ValueError:
                 raise SettingError("Supplied nquestions is not an int.")
 
-        self.filtered_items = self.filter_items(list(self.all_items))
+        with self.timings.span("filter_items"):
+            self.filtered_items = self.filter_items(self.all_items)
+
+        # Multi-deck sessions plan across engines themselves.
+        if plan:
+            self.plan_session()
+
+    def plan_session(self):
+        """Plan this engine's session from its filtered items."""
         self.session_items = self.build_session_items(self.filtered_items)
         self.cr_id_pairs = [(item.cue_id, item.response_id) for item in self.session_items]
 
@@ -110,10 +180,6 @@ class Engine:
         normalized = os.path.abspath(self.csvfile)
         return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
 
-    def build_item_id(self, cue: str, response: str) -> str:
-        normalized = "{}::{}".format(cue.strip(), response.strip())
-        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
-
     def level_for_stage(self, stage: int) -> str:
         if stage <= 1:
             return "1"
@@ -128,10 +194,12 @@ class Engine:
         self,
         item: SessionItem,
         progress_map: dict[str, ProgressRecord],
+        now: datetime | None = None,
     ) -> SessionItem:
-        progress = progress_map.get(item.item_id, ProgressRecord())
+        progress = progress_map.get(item.item_id)
 
-        item.progress = ProgressRecord.from_mapping(progress.to_mapping())
+        # Unseen items get a fresh record; stored ones are copied.
+        item.progress = ProgressRecord() if progress is None else dataclasses.replace(progress)
         item.current_stage = item.progress.current_stage
         item.level = self.level_for_stage(item.current_stage)
         item.stage_label = self.stage_label(item.current_stage)
@@ -140,115 +208,114 @@ class Engine:
         next_due_at = self.progress_store.parse_datetime(item.progress.next_due_at)
         item.next_due_at = next_due_at
         item.is_due = item.progress.last_seen_at is not None and (
-            next_due_at is None or next_due_at <= self.progress_store.now()
+            next_due_at is None or next_due_at <= (now or self.progress_store.now())
         )
         item.is_weak = item.progress.failure_count > 0 or item.progress.mastery_score < 0.4
 
         return item
 
-    def build_item_records(self, indices, data_list) -> list[SessionItem]:
-        out: list[SessionItem] = []
-
-        for data_row in data_list:
-            cue = data_row[indices["cue"][0]]
-
-            for placement, response_index in enumerate(indices["response"]):
-                response = data_row[response_index]
-
-                if not response:
-                    continue
-
-                explicit_item_id = ""
-                if placement < len(indices["item_id"]) and indices["item_id"][placement]:
-                    explicit_item_id = data_row[indices["item_id"][placement][0]]
-
-                item = SessionItem(
-                    item_id=explicit_item_id or self.build_item_id(cue, response),
-                    cue=cue,
-                    response=response,
-                    cue_id=self.database.get_cue_id(cue),
-                    response_id=self.database.get_response_id(response),
-                    placement=placement + 1,
-                )
-                out.append(item)
-
-        return out
+    def filter_items(self, items: Sequence[SessionItem]) -> Sequence[SessionItem]:
+        """
+        Select the deck's items that match the tag queries. With a search
+        query, only matching items are kept, best match first, and a session
+        of nquestions studies the best nquestions matches.
+        """
+        items = self.deck.tag_index.select(items, self.tags, self.not_tags)
+        if not self.query:
+            return items
 
-    def get_all_response_ids_for_tags(self, tags):
-        these_response_ids = []
-        args_tags = tags.split(",")
+        limit = self.settings.settings["nquestions"] or None
+        if len(items) == len(self.all_items):
+            return self.deck.search(self.query, limit=limit)
+        return self.deck.search(self.query, items, limit)
 
-        for tag in args_tags:
-            tag = tag.strip()
-            if tag:
-                these_response_ids += self.database.get_all_response_ids_by_tag(tag)
+    def item_lookup(self, items: Sequence[SessionItem]) -> Callable[[str], SessionItem | None]:
+        """
+        Return a function that finds the item with an item ID in items, or
+        returns None. Items selected by tags are found through the deck's
+        positions, and other items, such as search results, through a
+        mapping built here.
+        """
+        if items is self.all_items or (
+            isinstance(items, Selection) and items.items is self.all_items
+        ):
 
-        return list(set(these_response_ids))
+            def lookup(item_id):
+                position = self.deck.position_of(item_id)
+                if position is None or (
+                    items is not self.all_items and not items.has_position(position)
+                ):
+                    return None
+                return self.all_items[position]
 
-    def filter_items(self, items: list[SessionItem]) -> list[SessionItem]:
-        if self.tags:
-            these_response_ids = self.get_all_response_ids_for_tags(self.tags)
-            items = [item for item in items if item.response_id in these_response_ids]
+            return lookup
 
-        if self.not_tags:
-            these_response_ids = self.get_all_response_ids_for_tags(self.not_tags)
-            items = [item for item in items if item.response_id not in these_response_ids]
+        return {item.item_id: item for item in items}.get
 
-        return items
+    def iter_new_items(
+        self,
+        items: Sequence[SessionItem],
+        learner_id: str | None = None,
+        rng: random.Random | None = None,
+    ) -> Iterator[SessionItem]:
+        """Yield the items that the learner has not seen, in random order."""
+        seen = self.progress_store.get_item_ids(self.study_set_id, learner_id or self.learner_id)
+        for position in random_order(len(items), rng or self.rng):
+            item = items[position]
+            if item.item_id not in seen:
+                yield item
 
     def build_manual_session_items(
         self,
-        items: list[SessionItem],
-        progress_map: dict[str, ProgressRecord],
+        items: Sequence[SessionItem],
+        learner_id: str,
     ) -> list[SessionItem]:
-        session_items = [
-            self.merge_progress(
-                SessionItem(
-                    item_id=item.item_id,
-                    cue=item.cue,
-                    response=item.response,
-                    cue_id=item.cue_id,
-                    response_id=item.response_id,
-                    placement=item.placement,
-                ),
-                progress_map,
-            )
-            for item in items
-        ]
-        random.shuffle(session_items)
-
         nquestions = self.settings.settings["nquestions"]
 
-        if nquestions != 0:
-            if nquestions > len(session_items) and len(session_items) > 0:
-                add = nquestions - len(session_items)
-                duplicates = list(session_items)
-
-                for i in range(add):
-                    item = random.choice(session_items)
-                    duplicates.append(
-                        SessionItem(
-                            item_id=item.item_id,
-                            cue=item.cue,
-                            response=item.response,
-                            cue_id=item.cue_id,
-                            response_id=item.response_id,
-                            placement=item.placement,
-                            progress=ProgressRecord.from_mapping(item.progress.to_mapping()),
-                            current_stage=item.current_stage,
-                            level=item.level,
-                            stage_label=item.stage_label,
-                            is_new=item.is_new,
-                            next_due_at=item.next_due_at,
-                            is_due=item.is_due,
-                            is_weak=item.is_weak,
-                            session_stage=item.session_stage,
-                        )
+        # A session shorter than the selection studies a random sample of it.
+        if 0 < nquestions < len(items):
+            chosen = [
+                items[position] for position in self.rng.sample(range(len(items)), nquestions)
+            ]
+        else:
+            chosen = list(items)
+            self.rng.shuffle(chosen)
+
+        with self.timings.span("get_progress_map"):
+            progress_map = self.progress_store.get_progress_map(
+                self.study_set_id, [item.item_id for item in chosen], learner_id
+            )
+
+        now = self.progress_store.now()
+        session_items = [self.merge_progress(copy_item(item), progress_map, now) for item in chosen]
+
+        if nquestions > len(session_items) and len(session_items) > 0:
+            add = nquestions - len(session_items)
+            duplicates = list(session_items)
+
+            for i in range(add):
+                item = self.rng.choice(session_items)
+                duplicates.append(
+                    SessionItem(
+                        item_id=item.item_id,
+                        cue=item.cue,
+                        response=item.response,
+                        cue_id=item.cue_id,
+                        response_id=item.response_id,
+                        placement=item.placement,
+                        progress=ProgressRecord.from_mapping(item.progress.to_mapping()),
+                        current_stage=item.current_stage,
+                        level=item.level,
+                        stage_label=item.stage_label,
+                        is_new=item.is_new,
+                        next_due_at=item.next_due_at,
+                        is_due=item.is_due,
+                        is_weak=item.is_weak,
+                        session_stage=item.session_stage,
                     )
+                )
 
-                session_items = duplicates
-            else:
-                session_items = session_items[:nquestions]
+            session_items = duplicates
 
         for item in session_items:
             item.level = self.level
@@ -256,26 +323,6 @@ class Engine:
 
         return session_items
 
-    def sort_due_items(self, items: list[SessionItem]) -> list[SessionItem]:
-        return sorted(
-            items,
-            key=lambda item: (
-                item.next_due_at or self.progress_store.now(),
-                item.progress.mastery_score,
-                -item.progress.failure_count,
-            ),
-        )
-
-    def sort_weak_items(self, items: list[SessionItem]) -> list[SessionItem]:
-        return sorted(
-            items,
-            key=lambda item: (
-                item.progress.mastery_score,
-                -item.progress.failure_count,
-                item.progress.reviews,
-            ),
-        )
-
     def adaptive_session_size(self, total_items: int) -> int:
         nquestions = self.settings.settings["nquestions"]
 
@@ -286,92 +333,169 @@ class Engine:
 
     def take_items(
         self,
-        pool: list[SessionItem],
+        pool: Iterator[tuple[SessionItem, ProgressRecord | None]],
         amount: int,
-        selected_ids: set[str],
-    ) -> list[SessionItem]:
-        out: list[SessionItem] = []
-
-        for item in pool:
-            if len(out) >= amount:
-                break
-            if item.item_id in selected_ids:
+        selected: dict[str, tuple[SessionItem, ProgressRecord | None]],
+    ) -> None:
+        """Move up to amount (item, progress) pairs from pool into selected, skipping repeats."""
+        while amount > 0:
+            entry = next(pool, None)
+            if entry is None:
+                return
+            if entry[0].item_id in selected:
                 continue
-            out.append(item)
-            selected_ids.add(item.item_id)
-
-        return out
+            selected[entry[0].item_id] = entry
+            amount -= 1
 
     def build_adaptive_session_items(
         self,
-        items: list[SessionItem],
-        progress_map: dict[str, ProgressRecord],
+        items: Sequence[SessionItem],
+        learner_id: str,
     ) -> list[SessionItem]:
-        annotated = [
-            self.merge_progress(
-                SessionItem(
-                    item_id=item.item_id,
-                    cue=item.cue,
-                    response=item.response,
-                    cue_id=item.cue_id,
-                    response_id=item.response_id,
-                    placement=item.placement,
-                ),
-                progress_map,
+        now = self.progress_store.now()
+        session_size = self.adaptive_session_size(len(items))
+        lookup = self.item_lookup(items)
+
+        # Due and weak items are read from the progress store in priority
+        # order and new items are drawn at random, so only the items that the
+        # session uses are read and annotated.
+        due_rows = self.progress_store.iter_due(self.study_set_id, now, learner_id)
+        weak_rows = self.progress_store.iter_weak(self.study_set_id, now, learner_id)
+
+        def matching(rows):
+            for item_id, progress in rows:
+                # Progress can outlive items that were removed or filtered out.
+                item = lookup(item_id)
+                if item is not None:
+                    yield item, progress
+
+        due = matching(due_rows)
+        weak = matching(weak_rows)
+        new = ((item, None) for item in self.iter_new_items(items, learner_id))
+
+        selected: dict[str, tuple[SessionItem, ProgressRecord | None]] = {}
+        try:
+            self.take_items(due, max(1, int(session_size * 0.6)), selected)
+            self.take_items(weak, int(session_size * 0.25), selected)
+            self.take_items(new, session_size - len(selected), selected)
+            # Fill any shortfall from whichever queues still have items, and
+            # then from the items in deck order.
+            remainder = ((item, None) for item in items)
+            for pool in (due, weak, new, remainder):
+                self.take_items(pool, session_size - len(selected), selected)
+        finally:
+            due_rows.close()
+            weak_rows.close()
+
+        # Items were drawn without their progress, which is read for them alone.
+        with self.timings.span("get_progress_map"):
+            progress_map = self.progress_store.get_progress_map(
+                self.study_set_id,
+                [item_id for item_id, (_, progress) in selected.items() if progress is None],
+                learner_id,
             )
-            for item in items
-        ]
-        due_items = self.sort_due_items([item for item in annotated if item.is_due])
-        weak_items = self.sort_weak_items(
-            [item for item in annotated if item.is_weak and not item.is_due]
-        )
-        new_items = [item for item in annotated if item.is_new]
-        random.shuffle(new_items)
-
-        session_size = self.adaptive_session_size(len(annotated))
-        due_target = min(len(due_items), max(1, int(session_size * 0.6)))
-        weak_target = min(len(weak_items), int(session_size * 0.25))
-        new_target = min(len(new_items), session_size - due_target - weak_target)
 
-        selected_ids = set()
         session_items = []
-        session_items += self.take_items(due_items, due_target, selected_ids)
-        session_items += self.take_items(weak_items, weak_target, selected_ids)
-        session_items += self.take_items(new_items, new_target, selected_ids)
-
-        remainder_pool = due_items + weak_items + new_items + annotated
-        session_items += self.take_items(
-            remainder_pool, session_size - len(session_items), selected_ids
-        )
-        random.shuffle(session_items)
+        for item_id, (item, progress) in selected.items():
+            if progress is not None:
+                progress_map[item_id] = progress
+            session_items.append(self.merge_progress(copy_item(item), progress_map, now))
+        self.rng.shuffle(session_items)
 
         for item in session_items:
             item.session_stage = item.current_stage
 
         return session_items
 
-    def build_session_items(self, items: list[SessionItem]) -> list[SessionItem]:
-        item_ids = [item.item_id for item in items]
-        progress_map = self.progress_store.get_progress_map(self.study_set_id, item_ids)
-
-        if self.session_mode == "manual":
-            return self.build_manual_session_items(items, progress_map)
+    def build_session_items(
+        self, items: Sequence[SessionItem], learner_id: str | None = None
+    ) -> list[SessionItem]:
+        """
+        Plan a session from items for this engine's learner, or for
+        learner_id. Only the items that the session uses are copied and
+        annotated with progress.
+        """
+        with self.timings.span("session_planning"):
+            if self.session_mode == "manual":
+                return self.build_manual_session_items(items, learner_id or self.learner_id)
 
-        return self.build_adaptive_session_items(items, progress_map)
+            return self.build_adaptive_session_items(items, learner_id or self.learner_id)
 
     def current_item(self, question_index: int) -> SessionItem:
         return self.session_items[question_index]
 
-    def record_result(self, item: SessionItem, is_correct: bool, elapsed_time: float) -> None:
-        progress = ProgressRecord.from_mapping(item.progress.to_mapping())
+    def sync_deck(self):
+        """
+        Reload the deck if its CSV file changed and refilter its items. Return
+        whether the deck changed since this engine last saw it.
+        """
+        if self.deck.is_stale():
+            try:
+                with self.timings.span("reload"):
+                    self.deck.reload()
+            except (CSVError, OSError):
+                # The loaded deck stays in use until the file parses again.
+                pass
+
+        if self.deck.version == self.deck_version:
+            return False
+
+        self.deck_version = self.deck.version
+        self.database = self.deck.database
+        self.all_items = self.deck.all_items
+        self.filtered_items = self.filter_items(self.all_items)
+        return True
+
+    def sync(self, start):
+        """
+        Apply changes to the CSV file to the session from question index start
+        on. Items whose rows were edited are updated, and items whose rows were
+        deleted or no longer match the filters are dropped. Items added to the
+        file are left for the next session. Return whether anything changed.
+        """
+        if not self.sync_deck():
+            return False
+
+        lookup = self.item_lookup(self.filtered_items)
+        items = []
+        for item in self.session_items[start:]:
+            current = lookup(item.item_id)
+            if current is not None:
+                items.append(self.remap_item(item, current))
+        self.session_items[start:] = items
+        self.cr_id_pairs[start:] = [(item.cue_id, item.response_id) for item in items]
+        self.mtstatistics.total = len(self.session_items)
+        return True
+
+    def remap_item(self, item, current):
+        """Return a session item updated to match the deck's current item."""
+        return dataclasses.replace(
+            item,
+            cue=current.cue,
+            response=current.response,
+            cue_id=current.cue_id,
+            response_id=current.response_id,
+            placement=current.placement,
+        )
+
+    def close(self):
+        self.progress_store.close()
+
+    def next_progress(self, progress, is_correct, elapsed_time=None):
+        """
+        Return the progress record that follows progress after one graded
+        answer. Without an elapsed time, the average response time is kept.
+        """
+        progress = ProgressRecord.from_mapping(progress.to_mapping())
         progress.reviews += 1
         progress.last_seen_at = self.progress_store.to_iso(self.progress_store.now())
 
-        previous_avg = progress.average_response_time
-        previous_reviews = progress.reviews - 1
-        progress.average_response_time = (
-            previous_avg * previous_reviews + elapsed_time
-        ) / progress.reviews
+        if elapsed_time is not None:
+            previous_avg = progress.average_response_time
+            previous_reviews = progress.reviews - 1
+            progress.average_response_time = (
+                previous_avg * previous_reviews + elapsed_time
+            ) / progress.reviews
 
         stage = progress.current_stage
         mastery = progress.mastery_score
@@ -398,99 +522,17 @@ class Engine:
         progress.mastery_score = mastery
         progress.next_due_at = self.progress_store.next_due(stage, is_correct)
 
+        return progress
+
+    def record_result(self, item: SessionItem, is_correct: bool, elapsed_time: float) -> None:
+        progress = self.next_progress(item.progress, is_correct, elapsed_time)
+        stage = progress.current_stage
+
         item.progress = progress
         item.current_stage = stage
         item.level = self.level if self.session_mode == "manual" else self.level_for_stage(stage)
         item.stage_label = self.stage_label(stage)
 
-        self.progress_store.update_progress(self.study_set_id, item.item_id, progress)
-
-    def normalize_row(self, row):
-        """Make every string in a row lowercase and remove all whitespace"""
-        return ["".join(value.lower().split()) for value in row]
-
-    def load(self, csvfile):
-        """Load the CSV file"""
-        out = []
-
-        with open(csvfile, encoding="utf-8") as cf:
-            csvreader = csv.reader(cf)
-            for row in csvreader:
-                out.append(row)
-
-        return out
-
-    def get_indices(self, row, target_str):
-        """Get all indices for target_str in a row"""
-        return [index for index, element in enumerate(row) if element == target_str]
-
-    def get_index(self, row, target_str):
-        """Get the first index for target_str in a row."""
-        return self.get_indices(row, target_str)[:1]
-
-    def get_index_mandatory(self, row, target_str):
-        """
-        Get a mandatory index for target_str in a row. It is an error if it doesn't
-        exist.
-        """
-        index = self.get_index(row, target_str)
-
-        if len(index) < 1:
-            raise CSVError(f"The mandatory column {target_str} is missing.")
-
-        return index
-
-    def is_header_row(self, row):
-        """Determine whether the curent row is the header row"""
-        return "cue" in row and "response" in row
-
-    def set_csv_settings(self, settings, csv_list):
-        """Set CSV settings"""
-        for row in csv_list:
-            non_empty = [item for item in row if len(item) > 0]
-
-            if len(non_empty) == 1:
-                settings_str = self.normalize_row(row)[0]
-                if settings_str.startswith("settings:"):
-                    settings.load_settings(settings_str)
-                else:
-                    settings.set_title(row)
-
-            elif len(non_empty) > 1:
-                break
-
-    def get_csv_column_indices(self, indices, csv_list):
-        """Get column indices for database processing"""
-        for row in csv_list:
-            this_row = self.normalize_row(row)
-            if self.is_header_row(this_row):
-                indices["cue"] = self.get_index_mandatory(this_row, "cue")
-
-                indices["response"] = self.get_index_mandatory(this_row, "response")
-                indices["response"] += self.get_index(this_row, "response2")
-                indices["response"] += self.get_index(this_row, "response3")
-
-                indices["synonym"] = [self.get_indices(this_row, "synonym")]
-                indices["synonym"].append(self.get_indices(this_row, "synonym2"))
-                indices["synonym"].append(self.get_indices(this_row, "synonym3"))
-
-                indices["hint"] = [self.get_indices(this_row, "hint")]
-                indices["hint"].append(self.get_indices(this_row, "hint2"))
-                indices["hint"].append(self.get_indices(this_row, "hint3"))
-
-                indices["tag"] = self.get_indices(this_row, "tag")
-                indices["mtag"] = self.get_indices(this_row, "mtag")
-                indices["item_id"] = [self.get_indices(this_row, "id")]
-                indices["item_id"].append(self.get_indices(this_row, "id2"))
-                indices["item_id"].append(self.get_indices(this_row, "id3"))
-
-                break
-
-    def get_csv_column_header_row_number(self, csv_list):
-        """Get the CSV column header row number"""
-        for row_number, row in enumerate(csv_list):
-            this_row = self.normalize_row(row)
-            if self.is_header_row(this_row):
-                return row_number
-
-        raise CSVError("No header row")
+        self.progress_store.update_progress(
+            self.study_set_id, item.item_id, progress, self.learner_id
+        )
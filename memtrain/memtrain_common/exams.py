@@ -0,0 +1,344 @@
+import html
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from memtrain.memtrain_common.cohort import get_context
+from memtrain.memtrain_common.deck import open_deck
+from memtrain.memtrain_common.engine import Engine, NoResponsesError
+from memtrain.memtrain_common.question import is_plural, make_mchoices
+
+# Exam formats and their file extensions
+EXAM_FORMATS = {"markdown": ".md", "html": ".html", "text": ".txt"}
+
+# The letters of multiple-choice answers, as in sessions
+LETTERS = ["a", "b", "c", "d"]
+
+# Questions per exam when neither --nquestions nor the study set sets one
+DEFAULT_QUESTIONS = 50
+
+# Variants sent to a worker at a time
+CHUNK_SIZE = 8
+
+# The deck workers build exams from. Forked workers inherit the parent's
+# copy, so the deck is parsed once for every variant.
+_shared_deck = None
+
+# The worker's exam writer, built once by init_worker.
+_worker_writer = None
+
+
+def variant_random(seed, number):
+    """Return the random generator for one exam variant of a seeded run."""
+    # String seeds are hashed the same way in every process and Python run.
+    return random.Random("{}:{}".format(seed, number))
+
+
+class ExamWriter:
+    """
+    Builds and writes exam variants from a loaded deck.
+
+    Everything that does not change between questions is looked up once:
+    the filtered items, the plural and nonplural response pools, and each
+    response's mtag responses, hints, and synonyms the first time the
+    response is asked. Questions are plain mappings, not Question objects.
+    """
+
+    def __init__(self, engine, level, count, exam_format, distractors="mtag"):
+        self.engine = engine
+        self.database = engine.database
+        self.items = engine.filtered_items
+        self.level = level
+        self.count = min(count, len(self.items))
+        self.exam_format = exam_format
+        self.title = engine.settings.settings["title"] or "Exam"
+        self.templates = engine.deck.cue_templates
+        self.similar = engine.deck.distractors if distractors == "similar" else None
+
+        responses = self.database.get_all_responses()
+        self.plural_responses = [response for response in responses if is_plural(response)]
+        self.nonplural_responses = [response for response in responses if not is_plural(response)]
+
+        # (mtag responses, hints, synonyms) by response ID
+        self.response_data = {}
+
+    def get_response_data(self, response_id):
+        data = self.response_data.get(response_id)
+        if data is None:
+            mtag_responses = []
+            for mtag in self.database.get_response_values("mtag", response_id):
+                mtag_responses += self.database.get_responses_by_mtag(mtag)
+            data = self.response_data[response_id] = (
+                mtag_responses,
+                self.database.get_response_values("hint", response_id),
+                self.database.get_response_values("synonym", response_id),
+            )
+        return data
+
+    def build_question(self, item, rng):
+        mtag_responses, hints, synonyms = self.get_response_data(item.response_id)
+        question = {
+            "item_id": item.item_id,
+            "cue": self.templates[item.cue].render(item.placement),
+            "response": item.response,
+        }
+
+        if self.level == "1":
+            similar = self.similar.similar(item.response, synonyms) if self.similar else []
+            question["choices"], question["answer"] = make_mchoices(
+                item.response,
+                mtag_responses,
+                similar,
+                self.plural_responses,
+                self.nonplural_responses,
+                LETTERS,
+                rng,
+            )
+        else:
+            if self.level == "2":
+                question["hints"] = hints
+            question["answer"] = item.response
+            question["synonyms"] = synonyms
+
+        return question
+
+    def build_exam(self, seed, number):
+        """Return one exam variant, its questions drawn and laid out by its own generator."""
+        rng = variant_random(seed, number)
+        # A fixed-level session shuffles every filtered item and keeps the
+        # first nquestions, which is a uniform sample. Exams take that sample
+        # directly: a variant belongs to no learner, so there is no progress to
+        # merge, and items are not repeated to fill a long exam.
+        items = [self.items[index] for index in rng.sample(range(len(self.items)), self.count)]
+        return {
+            "variant": number,
+            "seed": seed,
+            "title": self.title,
+            "level": self.level,
+            "questions": [self.build_question(item, rng) for item in items],
+        }
+
+    def write_exam(self, exam, out_dir):
+        """Write an exam variant and its answer key, and return the key record."""
+        extension = EXAM_FORMATS[self.exam_format]
+        name = "exam-{:04d}".format(exam["variant"])
+        render = RENDERERS[self.exam_format]
+
+        for suffix, is_key in (("", False), ("-key", True)):
+            path = os.path.join(out_dir, name + suffix + extension)
+            with open(path, "w", encoding="utf-8") as out:
+                out.write(render(exam, is_key))
+
+        return {
+            "variant": exam["variant"],
+            "seed": exam["seed"],
+            "file": name + extension,
+            "questions": [
+                {
+                    "number": number,
+                    "item_id": question["item_id"],
+                    "answer": question["answer"],
+                    "response": question["response"],
+                }
+                for number, question in enumerate(exam["questions"], 1)
+            ],
+        }
+
+    def write_variants(self, seed, numbers, out_dir):
+        return [self.write_exam(self.build_exam(seed, number), out_dir) for number in numbers]
+
+
+# Rendering ###################################################################
+def answer_text(question):
+    if "choices" in question:
+        return "{}) {}".format(question["answer"], question["choices"][question["answer"]])
+    return question["answer"]
+
+
+def escape_markdown(text):
+    """Escape the characters that Markdown would read as formatting, such as blanks."""
+    for character in "\\`*_[]<>#":
+        text = text.replace(character, "\\" + character)
+    return text
+
+
+def render_markdown(exam, is_key):
+    lines = [
+        "# {}{}".format(escape_markdown(exam["title"]), " — answer key" if is_key else ""),
+        "",
+        "Variant {} · Level {}".format(exam["variant"], exam["level"]),
+        "",
+    ]
+    for number, question in enumerate(exam["questions"], 1):
+        if is_key:
+            lines.append("{}. {}".format(number, escape_markdown(answer_text(question))))
+            continue
+
+        lines.append("{}. {}".format(number, escape_markdown(question["cue"])))
+        if "choices" in question:
+            lines.append("")
+            for letter, choice in question["choices"].items():
+                lines.append("   - {}) {}".format(letter, escape_markdown(choice)))
+        if question.get("hints"):
+            lines.append("")
+            lines.append("   *Hints: {}*".format(escape_markdown(", ".join(question["hints"]))))
+        lines.append("")
+
+    return "\n".join(lines).rstrip("\n") + "\n"
+
+
+def render_text(exam, is_key):
+    heading = "{}{}".format(exam["title"], " - answer key" if is_key else "")
+    lines = [
+        heading,
+        "Variant {} - Level {}".format(exam["variant"], exam["level"]),
+        "",
+    ]
+    for number, question in enumerate(exam["questions"], 1):
+        if is_key:
+            lines.append("{}. {}".format(number, answer_text(question)))
+            continue
+
+        lines.append("{}. {}".format(number, question["cue"]))
+        for letter, choice in question.get("choices", {}).items():
+            lines.append("   {}) {}".format(letter, choice))
+        if question.get("hints"):
+            lines.append("   Hints: {}".format(", ".join(question["hints"])))
+        if "choices" not in question:
+            lines.append("   Answer: ______________________")
+        lines.append("")
+
+    return "\n".join(lines).rstrip("\n") + "\n"
+
+
+def render_html(exam, is_key):
+    title = html.escape(exam["title"] + (" — answer key" if is_key else ""))
+    parts = [
+        "<!DOCTYPE html>",
+        '<html><head><meta charset="utf-8"><title>{}</title></head><body>'.format(title),
+        "<h1>{}</h1>".format(title),
+        "<p>Variant {} · Level {}</p>".format(exam["variant"], html.escape(exam["level"])),
+        "<ol>",
+    ]
+    for question in exam["questions"]:
+        if is_key:
+            parts.append("<li>{}</li>".format(html.escape(answer_text(question))))
+            continue
+
+        parts.append("<li><p>{}</p>".format(html.escape(question["cue"])))
+        if "choices" in question:
+            parts.append('<ol type="a">')
+            parts.extend(
+                "<li>{}</li>".format(html.escape(choice)) for choice in question["choices"].values()
+            )
+            parts.append("</ol>")
+        if question.get("hints"):
+            parts.append(
+                "<p><em>Hints: {}</em></p>".format(html.escape(", ".join(question["hints"])))
+            )
+        parts.append("</li>")
+
+    parts.append("</ol></body></html>")
+    return "\n".join(parts) + "\n"
+
+
+RENDERERS = {"markdown": render_markdown, "html": render_html, "text": render_text}
+
+
+# Parallel generation #########################################################
+def init_worker(csvfile, options, query, writer_options):
+    global _worker_writer
+
+    deck = _shared_deck
+    if deck is None or deck.csvfile != csvfile:
+        # Spawned workers do not inherit the deck and load their own.
+        deck = open_deck(csvfile)
+
+    engine = Engine(csvfile, *options, deck=deck, plan=False, query=query)
+    _worker_writer = ExamWriter(engine, *writer_options)
+
+
+def write_in_worker(seed, numbers, out_dir):
+    return _worker_writer.write_variants(seed, numbers, out_dir)
+
+
+class ExamGenerator:
+    """
+    Generate many randomized exam variants of one study set, with answer keys.
+
+    The deck is loaded and filtered once, as for a fixed-level session.
+    Each variant draws its questions and lays out its choices with its own
+    generator, seeded from the run's seed and the variant number, so a
+    variant is the same however the run is split between workers. Variants
+    are built and written in a process pool whose workers share the loaded
+    deck.
+    """
+
+    def __init__(
+        self,
+        csvfile,
+        level="1",
+        nquestions=None,
+        tags=None,
+        not_tags=None,
+        exam_format="markdown",
+        distractors="mtag",
+        workers=None,
+        query=None,
+        deck=None,
+    ):
+        self.csvfile = os.path.abspath(csvfile)
+        self.options = (level, nquestions, tags, not_tags)
+        self.query = query
+        self.workers = workers or os.cpu_count() or 1
+        self.deck = deck or open_deck(self.csvfile)
+
+        # Settings and empty selections are reported here, before any worker starts.
+        self.engine = Engine(self.csvfile, *self.options, self.deck, plan=False, query=query)
+        if not self.engine.filtered_items:
+            raise NoResponsesError("No items match the selected tags.")
+
+        count = self.engine.settings.settings["nquestions"] or DEFAULT_QUESTIONS
+        self.writer_options = (self.engine.settings.level, count, exam_format, distractors)
+        self.writer = ExamWriter(self.engine, *self.writer_options)
+
+    def generate(self, variants, seed, out_dir):
+        """Write variants 1 to variants into out_dir and yield their key records in order."""
+        os.makedirs(out_dir, exist_ok=True)
+        numbers = list(range(1, variants + 1))
+        chunks = [numbers[start : start + CHUNK_SIZE] for start in range(0, variants, CHUNK_SIZE)]
+
+        if self.workers == 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                yield from self.writer.write_variants(seed, chunk, out_dir)
+            return
+
+        global _shared_deck
+        _shared_deck = self.deck
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=get_context(),
+                initializer=init_worker,
+                initargs=(self.csvfile, self.options, self.query, self.writer_options),
+            ) as executor:
+                futures = [
+                    executor.submit(write_in_worker, seed, chunk, out_dir) for chunk in chunks
+                ]
+                for future in futures:
+                    yield from future.result()
+        finally:
+            _shared_deck = None
+
+    def close(self):
+        self.engine.close()
+
+
+def write_keys(keys, out):
+    """Write answer key records to a text stream as JSON lines and return how many were written."""
+    count = 0
+    for key in keys:
+        out.write(json.dumps(key) + "\n")
+        count += 1
+    return count
@@ -0,0 +1,237 @@
+from typing import NamedTuple, Optional
+
+# Fuzzy grading allows one edit for every this many characters of a
+# standardized answer, up to the fuzzy setting. Answers shorter than this
+# must match exactly.
+CHARACTERS_PER_EDIT = 5
+
+# The most bigrams one edit can change: swapping two adjacent characters
+# changes the bigram they form and the bigram on each side.
+BIGRAMS_PER_EDIT = 3
+
+# Items with more near answers than this are indexed by bigram.
+INDEX_MINIMUM = 8
+
+# How an answer matched: exactly after standardization, or within the
+# allowed number of edits.
+EXACT = "exact"
+NEAR = "near"
+
+
+def standardize(string):
+    """Standardize strings so they can be compared for correctness"""
+    # The idea here is that a question shouldn't be marked wrong just
+    # because the user forgot to enter a hyphen or a space or used the
+    # wrong case.
+    #
+    # Standarization involves the removal of all case, whitespace, and
+    # hyphens. This means the grading of questions is not case, whitespace,
+    # or hyphen sensitive.
+
+    # Remove case (transform to lowercase)
+    out = string.lower()
+    # Remove whitespace
+    out = "".join(out.split())
+    # Remove hyphens
+    out = out.replace("-", "")
+    out = out.replace("–", "")
+    out = out.replace("—", "")
+
+    return out
+
+
+def bigrams(string):
+    """Return the set of pairs of adjacent characters in a string."""
+    return {string[index : index + 2] for index in range(len(string) - 1)}
+
+
+def allowed_edits(answer, max_edits):
+    """Return the edits allowed for a standardized answer."""
+    return max(0, min(max_edits, len(answer) // CHARACTERS_PER_EDIT))
+
+
+def bounded_distance(a, b, limit):
+    """
+    Return the edit distance between a and b, counting insertions,
+    deletions, substitutions, and swaps of adjacent characters, or limit + 1
+    if it is more than limit.
+
+    Only the band of cells within limit of the diagonal is computed, and the
+    computation stops as soon as a whole row of the band is over limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if a == b:
+        return 0
+
+    # A common prefix or suffix never needs an edit, so only the differing
+    # middles are compared.
+    start = 0
+    shorter = min(len(a), len(b))
+    while start < shorter and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < shorter - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start : len(a) - end]
+    b = b[start : len(b) - end]
+    if not a or not b:
+        return len(a) + len(b)
+
+    over = limit + 1
+    width = len(b) + 1
+
+    # Cells outside the band are left over limit.
+    before = None
+    previous = [column if column <= limit else over for column in range(width)]
+
+    for row in range(1, len(a) + 1):
+        current = [over] * width
+        if row <= limit:
+            current[0] = row
+
+        first = max(1, row - limit)
+        last = min(len(b), row + limit)
+        character = a[row - 1]
+        best = current[first - 1]
+
+        for column in range(first, last + 1):
+            cost = 0 if character == b[column - 1] else 1
+            value = min(previous[column] + 1, current[column - 1] + 1, previous[column - 1] + cost)
+            if (
+                cost
+                and before is not None
+                and column > 1
+                and character == b[column - 2]
+                and a[row - 2] == b[column - 1]
+            ):
+                value = min(value, before[column - 2] + 1)
+
+            current[column] = value if value <= limit else over
+            best = min(best, value)
+
+        if best > limit:
+            return over
+
+        before, previous = previous, current
+
+    return previous[len(b)]
+
+
+class Grade(NamedTuple):
+    """
+    How an input matched an item: match is EXACT, NEAR, or None, answer is
+    the response or synonym it matched, and distance is the edits it took.
+    """
+
+    match: Optional[str]
+    answer: Optional[str]
+    distance: int
+
+
+# The grade of an input that matched nothing
+NO_MATCH = Grade(None, None, 0)
+
+
+class AnswerKey:
+    """
+    An item's response and synonyms, standardized and indexed once so that
+    each input is graded with a dict lookup and, in fuzzy mode, bounded edit
+    distances to only the answers that share enough of its bigrams.
+    """
+
+    __slots__ = (
+        "response",
+        "synonyms",
+        "max_edits",
+        "exact",
+        "near",
+        "grams",
+        "postings",
+        "unfiltered",
+    )
+
+    def __init__(self, response, synonyms=(), max_edits=0):
+        self.response = response
+        self.synonyms = list(synonyms)
+        self.max_edits = max_edits
+
+        # Standardized answers, with the response ahead of any synonym that
+        # standardizes the same way
+        self.exact = {}
+        for answer in [response] + self.synonyms:
+            self.exact.setdefault(standardize(answer), answer)
+
+        # (standardized answer, answer, allowed edits) for answers long
+        # enough to allow edits
+        self.near = []
+        for standardized, answer in self.exact.items():
+            edits = allowed_edits(standardized, max_edits)
+            if edits:
+                self.near.append((standardized, answer, edits))
+
+        # The bigrams of each near answer and the near answers with each
+        # bigram. An edit changes at most BIGRAMS_PER_EDIT of a string's
+        # bigrams, so an answer within its edits shares all but that many
+        # per edit with the input. Answers with too few bigrams for that to
+        # rule anything out are always compared. A few answers are cheaper
+        # to compare than to index.
+        self.grams = None
+        self.postings = None
+        self.unfiltered = []
+        if len(self.near) > INDEX_MINIMUM:
+            self.grams = [bigrams(standardized) for standardized, _, _ in self.near]
+            self.postings = {}
+            for index, grams in enumerate(self.grams):
+                for gram in grams:
+                    self.postings.setdefault(gram, []).append(index)
+                if len(grams) <= BIGRAMS_PER_EDIT * self.near[index][2]:
+                    self.unfiltered.append(index)
+
+    def matches(self, response, synonyms, max_edits):
+        """Return whether this key grades the given answers."""
+        return (
+            self.response == response and self.synonyms == synonyms and self.max_edits == max_edits
+        )
+
+    def grade(self, user_input):
+        """Return the Grade of an input."""
+        standardized = standardize(user_input)
+
+        answer = self.exact.get(standardized)
+        if answer is not None:
+            return Grade(EXACT, answer, 0)
+        if not self.near:
+            return NO_MATCH
+
+        if self.postings is None:
+            candidates = range(len(self.near))
+        else:
+            grams = bigrams(standardized)
+            shared = dict.fromkeys(self.unfiltered, 0)
+            for gram in grams:
+                for index in self.postings.get(gram, ()):
+                    shared[index] = shared.get(index, 0) + 1
+            candidates = sorted(shared)
+
+        out = NO_MATCH
+        for index in candidates:
+            candidate, answer, edits = self.near[index]
+
+            # Only an answer closer than the best so far can replace it.
+            if out.match:
+                edits = min(edits, out.distance - 1)
+            if abs(len(candidate) - len(standardized)) > edits:
+                continue
+            if self.postings is not None:
+                required = max(len(grams), len(self.grams[index])) - BIGRAMS_PER_EDIT * edits
+                if shared[index] < required:
+                    continue
+
+            distance = bounded_distance(standardized, candidate, edits)
+            if distance <= edits:
+                out = Grade(NEAR, answer, distance)
+                if distance == 1:
+                    break
+
+        return out
@@ -0,0 +1,175 @@
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+
+from memtrain.memtrain_common.timings import percentile
+
+
+class LoadError(Exception):
+    """Raised when the server answers a load-generator request with an error."""
+
+
+class HTTPClient:
+    """A minimal keep-alive HTTP/1.1 client for the session server's JSON API."""
+
+    def __init__(self, reader, writer, host):
+        self.reader = reader
+        self.writer = writer
+        self.host = host
+
+    @classmethod
+    async def open(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer, host)
+
+    async def request(self, method, path, body=None):
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        head = "{} {} HTTP/1.1\r\nHost: {}\r\nContent-Length: {}\r\n".format(
+            method, path, self.host, len(data)
+        )
+        if body is not None:
+            head += "Content-Type: application/json\r\n"
+        self.writer.write((head + "\r\n").encode("latin-1") + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value)
+
+        payload = json.loads(await self.reader.readexactly(length)) if length else None
+        if status >= 400:
+            raise LoadError("{} {}: {} {}".format(method, path, status, payload))
+
+        return payload
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+@dataclass
+class LoadResult:
+    """Throughput and latency collected from virtual learners."""
+
+    seed: int = 0
+    sessions: int = 0
+    questions: int = 0
+    wall_time: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+
+    def to_mapping(self):
+        values = sorted(self.latencies)
+        return {
+            "seed": self.seed,
+            "sessions": self.sessions,
+            "questions": self.questions,
+            "requests": len(values),
+            "wall_time": self.wall_time,
+            "sessions_per_sec": self.sessions / self.wall_time if self.wall_time else 0.0,
+            "requests_per_sec": len(values) / self.wall_time if self.wall_time else 0.0,
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+
+
+async def timed_request(client, result, method, path, body=None):
+    start = time.perf_counter()
+    payload = await client.request(method, path, body)
+    result.latencies.append(time.perf_counter() - start)
+    return payload
+
+
+def choose_answer(question, rng):
+    """Pick a multiple-choice letter, or a free-text answer that may be wrong."""
+    if "choices" in question:
+        return rng.choice(sorted(question["choices"]))
+
+    return rng.choice(["yes", "no", "maybe"])
+
+
+async def run_learner(host, port, deck, sessions, options, result, rng):
+    client = await HTTPClient.open(host, port)
+
+    try:
+        for _ in range(sessions):
+            # Sessions are planned from the run's seed, so that runs with
+            # the same seed ask the same questions.
+            created = await timed_request(
+                client,
+                result,
+                "POST",
+                "/sessions",
+                dict(options, deck=deck, seed=rng.randrange(2**32)),
+            )
+            path = "/sessions/{}".format(created["session_id"])
+            question = created["question"]
+
+            while not question["complete"]:
+                reply = await timed_request(
+                    client,
+                    result,
+                    "POST",
+                    path + "/answer",
+                    {"answer": choose_answer(question, rng), "response_time": 1.0},
+                )
+                question = reply["next"]
+                result.questions += 1
+
+            await timed_request(client, result, "DELETE", path)
+            result.sessions += 1
+    finally:
+        await client.close()
+
+
+async def run_load(host, port, deck, learners=10, sessions=10, options=None, seed=0):
+    """Run concurrent virtual learners against a session server."""
+    result = LoadResult(seed=seed)
+    rng = random.Random(seed)
+    options = options or {}
+
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(
+            run_learner(
+                host,
+                port,
+                deck,
+                sessions,
+                # Each virtual learner has its own progress.
+                dict(options, learner="loadgen-{}".format(number)),
+                result,
+                random.Random(rng.random()),
+            )
+            for number in range(learners)
+        )
+    )
+    result.wall_time = time.perf_counter() - start
+
+    return result
+
+
+def format_report(result):
+    """Format a load result as plain text."""
+    mapping = result.to_mapping()
+    return "\n".join(
+        [
+            "Seed: {}  Sessions: {}  Questions: {}  Requests: {}".format(
+                mapping["seed"], mapping["sessions"], mapping["questions"], mapping["requests"]
+            ),
+            "Wall time: {:.3f}s  Sessions/sec: {:.1f}  Requests/sec: {:.1f}".format(
+                mapping["wall_time"], mapping["sessions_per_sec"], mapping["requests_per_sec"]
+            ),
+            "Request latency: p50 {:.3f} ms  p95 {:.3f} ms  p99 {:.3f} ms".format(
+                mapping["p50"] * 1000, mapping["p95"] * 1000, mapping["p99"] * 1000
+            ),
+        ]
+    )
@@ -0,0 +1,395 @@
+import bisect
+import heapq
+import itertools
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from memtrain.memtrain_common.binarydeck import EXTENSION, compile_deck, open_compiled_deck
+from memtrain.memtrain_common.cohort import get_context
+from memtrain.memtrain_common.deck import Deck, get_deck_store
+from memtrain.memtrain_common.engine import (
+    Engine,
+    NoResponsesError,
+    copy_item,
+    new_seed,
+    random_order,
+)
+from memtrain.memtrain_common.question import Question
+from memtrain.memtrain_common.session import StudySession
+from memtrain.memtrain_common.stats import SessionStatistics
+from memtrain.memtrain_common.timings import Timings
+
+# Questions in an adaptive multi-deck session when none are requested.
+DEFAULT_SESSION_SIZE = 20
+
+
+def compile_in_worker(csvfile, path):
+    """Parse a study set and compile it to path. Return whether it was compiled."""
+    try:
+        compile_deck(Deck(csvfile), path)
+    except Exception:
+        # The parent loads the study set itself and reports the error.
+        return False
+    return True
+
+
+class MultiDeckEngine:
+    """
+    Plan one session across several study sets.
+
+    Each study set gets an engine that loads its deck and progress store but
+    does not plan. Due and weak items are read lazily from each progress
+    store in priority order and merged into global queues, and new items are
+    drawn at random positions in turn from each deck, so that only the items
+    a session uses are read and annotated with progress.
+
+    Study sets without an up-to-date compiled deck are parsed in forked
+    worker processes and compiled into a temporary directory that lasts as
+    long as the engine, and the compiled decks are mapped here.
+    """
+
+    session_mode = "adaptive"
+
+    def __init__(
+        self,
+        csvfiles,
+        level=None,
+        nquestions=None,
+        tags=None,
+        not_tags=None,
+        learner_id=None,
+        query=None,
+        seed=None,
+        workers=None,
+    ):
+        if not csvfiles:
+            raise NoResponsesError("No study sets were given.")
+
+        self.level = level
+        self.nquestions = nquestions
+        self.timings = Timings()
+
+        # Planning and every deck's questions share one generator.
+        self.seed = new_seed() if seed is None else seed
+        self.rng = random.Random(self.seed)
+        self.timings.context["seed"] = self.seed
+
+        self.compiled_dir = None
+        with self.timings.span("load"):
+            decks = self.load_decks(csvfiles, workers or os.cpu_count() or 1)
+            self.engines = [
+                Engine(csvfile, level, nquestions, tags, not_tags, deck, learner_id, False, query)
+                for csvfile, deck in zip(csvfiles, decks)
+            ]
+
+        self.learner_id = self.engines[0].learner_id
+        if level:
+            self.session_mode = "manual"
+
+        with self.timings.span("session_planning"):
+            # Pairs of (engine, item) in question order.
+            self.session_entries = self.plan_session()
+
+        self.session_items = [item for _, item in self.session_entries]
+        self.cr_id_pairs = [(item.cue_id, item.response_id) for item in self.session_items]
+        self.current_engine = None
+
+        self.mtstatistics = SessionStatistics()
+        self.mtstatistics.total = len(self.session_items)
+
+        if self.mtstatistics.total == 0:
+            raise NoResponsesError("There are no responses available that match the criteria.")
+
+    def load_decks(self, csvfiles, workers):
+        """
+        Return a compiled deck for each study set that can be loaded in
+        parallel, or None for the engine to load it.
+        """
+        decks = [None] * len(csvfiles)
+        if get_deck_store() != "memory":
+            return decks
+
+        pending = []
+        for index, csvfile in enumerate(csvfiles):
+            decks[index] = open_compiled_deck(csvfile)
+            if decks[index] is None:
+                pending.append(index)
+
+        workers = min(workers, len(pending))
+        if workers <= 1:
+            return decks
+
+        self.compiled_dir = tempfile.TemporaryDirectory(prefix="memtrain-")
+        paths = [os.path.join(self.compiled_dir.name, str(index) + EXTENSION) for index in pending]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context()) as executor:
+            compiled = executor.map(
+                compile_in_worker, [csvfiles[index] for index in pending], paths
+            )
+            for index, path, ok in zip(pending, paths, compiled):
+                if ok:
+                    decks[index] = open_compiled_deck(csvfiles[index], path)
+
+        return decks
+
+    def session_size(self, total_items):
+        if self.nquestions:
+            return min(int(self.nquestions), total_items)
+        if self.session_mode == "manual":
+            return total_items
+
+        return min(DEFAULT_SESSION_SIZE, total_items)
+
+    def plan_session(self):
+        if self.session_mode == "manual":
+            entries = self.plan_manual_session()
+        else:
+            entries = self.plan_adaptive_session()
+
+        self.rng.shuffle(entries)
+        return entries
+
+    def sample_items(self, count):
+        """Yield count distinct (engine, item) pairs drawn from all decks at random."""
+        sizes = list(itertools.accumulate(len(engine.filtered_items) for engine in self.engines))
+
+        for index in itertools.islice(random_order(sizes[-1], self.rng), count):
+            deck_index = bisect.bisect_right(sizes, index)
+            offset = index - (sizes[deck_index - 1] if deck_index else 0)
+            engine = self.engines[deck_index]
+            yield engine, engine.filtered_items[offset]
+
+    def plan_manual_session(self):
+        now = self.engines[0].progress_store.now()
+        total = sum(len(engine.filtered_items) for engine in self.engines)
+        sampled = list(self.sample_items(self.session_size(total)))
+
+        # Fixed-level sessions keep each item's stored progress, so that
+        # their answers add to it.
+        progress_maps = {}
+        for engine in self.engines:
+            item_ids = [item.item_id for owner, item in sampled if owner is engine]
+            progress_maps[id(engine)] = engine.progress_store.get_progress_map(
+                engine.study_set_id, item_ids, engine.learner_id
+            )
+
+        entries = []
+        for engine, item in sampled:
+            item = engine.merge_progress(copy_item(item), progress_maps[id(engine)], now)
+            item.level = self.level
+            item.session_stage = item.current_stage
+            entries.append((engine, item))
+
+        return entries
+
+    def plan_adaptive_session(self):
+        now = self.engines[0].progress_store.now()
+        total = sum(len(engine.filtered_items) for engine in self.engines)
+        session_size = self.session_size(total)
+        if session_size == 0:
+            return []
+
+        lookups = [engine.item_lookup(engine.filtered_items) for engine in self.engines]
+
+        def ranked(deck_index, rows, key):
+            for item_id, progress in rows:
+                # Progress can outlive items that were removed or filtered out.
+                item = lookups[deck_index](item_id)
+                if item is not None:
+                    yield key(progress), deck_index, item_id, progress, item
+
+        sources = []
+        for deck_index, engine in enumerate(self.engines):
+            store = engine.progress_store
+            sources.append(
+                ranked(
+                    deck_index,
+                    store.iter_due(engine.study_set_id, now, engine.learner_id),
+                    lambda progress: (progress.next_due_at, progress.mastery_score),
+                )
+            )
+            sources.append(
+                ranked(
+                    deck_index,
+                    store.iter_weak(engine.study_set_id, now, engine.learner_id),
+                    lambda progress: (
+                        progress.mastery_score,
+                        -progress.failure_count,
+                        progress.reviews,
+                    ),
+                )
+            )
+
+        due = heapq.merge(*sources[0::2])
+        weak = heapq.merge(*sources[1::2])
+        new = (
+            (None, deck_index, item.item_id, None, item)
+            for deck_index, item in self.round_robin(
+                [
+                    engine.iter_new_items(engine.filtered_items, rng=self.rng)
+                    for engine in self.engines
+                ]
+            )
+        )
+
+        due_target = max(1, int(session_size * 0.6))
+        weak_target = int(session_size * 0.25)
+
+        selected = {}
+        try:
+            self.take(due, due_target, selected)
+            self.take(weak, weak_target, selected)
+            self.take(new, session_size - len(selected), selected)
+            # Fill any shortfall from whichever queues still have items.
+            for queue in (due, weak, new):
+                self.take(queue, session_size - len(selected), selected)
+        finally:
+            for source in sources:
+                source.close()
+
+        if len(selected) < session_size:
+            # Items that have been seen but are neither due nor weak.
+            remainder = (
+                (None, self.engines.index(engine), item.item_id, None, item)
+                for engine, item in self.sample_items(total)
+            )
+            self.take(remainder, session_size - len(selected), selected)
+
+        # New and remaining items were selected without their progress.
+        progress_maps = []
+        for deck_index, engine in enumerate(self.engines):
+            item_ids = [
+                item_id
+                for (index, item_id), (_, progress) in selected.items()
+                if index == deck_index and progress is None
+            ]
+            progress_maps.append(
+                engine.progress_store.get_progress_map(
+                    engine.study_set_id, item_ids, engine.learner_id
+                )
+            )
+
+        entries = []
+        for (deck_index, item_id), (item, progress) in selected.items():
+            engine = self.engines[deck_index]
+            progress_map = progress_maps[deck_index] if progress is None else {item_id: progress}
+            item = engine.merge_progress(copy_item(item), progress_map, now)
+            item.session_stage = item.current_stage
+            entries.append((engine, item))
+
+        return entries
+
+    def round_robin(self, iterators):
+        """Yield (index, value) pairs taking one value from each iterator in turn."""
+        iterators = list(enumerate(iterators))
+        while iterators:
+            for entry in list(iterators):
+                index, iterator = entry
+                try:
+                    yield index, next(iterator)
+                except StopIteration:
+                    iterators.remove(entry)
+
+    def take(self, queue, amount, selected):
+        while amount > 0:
+            entry = next(queue, None)
+            if entry is None:
+                return
+            _, deck_index, item_id, progress, item = entry
+            if (deck_index, item_id) in selected:
+                continue
+            selected[(deck_index, item_id)] = (item, progress)
+            amount -= 1
+
+    def current_item(self, question_index):
+        self.current_engine, item = self.session_entries[question_index]
+        return item
+
+    def sync(self, start):
+        """Apply changes to the study sets' CSV files to the session from start on."""
+        changed = [engine for engine in self.engines if engine.sync_deck()]
+        if not changed:
+            return False
+
+        lookups = {id(engine): engine.item_lookup(engine.filtered_items) for engine in changed}
+        entries = []
+        for engine, item in self.session_entries[start:]:
+            if id(engine) not in lookups:
+                entries.append((engine, item))
+                continue
+            current = lookups[id(engine)](item.item_id)
+            if current is not None:
+                entries.append((engine, engine.remap_item(item, current)))
+
+        self.session_entries[start:] = entries
+        self.session_items[start:] = [item for _, item in entries]
+        self.cr_id_pairs[start:] = [
+            (item.cue_id, item.response_id) for item in self.session_items[start:]
+        ]
+        self.mtstatistics.total = len(self.session_entries)
+        return True
+
+    def record_result(self, item, is_correct, elapsed_time):
+        self.current_engine.record_result(item, is_correct, elapsed_time)
+
+    def close(self):
+        for engine in self.engines:
+            engine.close()
+        if self.compiled_dir is not None:
+            self.compiled_dir.cleanup()
+
+
+class MultiDeckSession(StudySession):
+    """A study session whose questions come from several study sets."""
+
+    def __init__(self, engine, lock=None):
+        self.engine = engine
+        self.mtstatistics = engine.mtstatistics
+        self.lock = lock or nullcontext()
+
+        # One question per study set. The current item's study set picks the
+        # question and settings that render it.
+        with self.lock:
+            self.questions = {
+                id(study_set): Question(
+                    study_set.settings,
+                    study_set.database,
+                    study_set.deck.cue_templates,
+                    study_set.deck.distractors,
+                    engine.rng,
+                )
+                for study_set in engine.engines
+            }
+
+        self.current_item = None
+        self.presented_at = None
+        self.last_used = time.monotonic()
+
+    @property
+    def study_set(self):
+        """The engine of the current item's study set, or the first before any item."""
+        return self.engine.current_engine or self.engine.engines[0]
+
+    @property
+    def settings(self):
+        # Questions are rendered with their own study set's settings.
+        return self.study_set.settings
+
+    @property
+    def question(self):
+        return self.questions[id(self.study_set)]
+
+    def reset_questions(self):
+        self.questions = {
+            id(study_set): Question(
+                study_set.settings,
+                study_set.database,
+                study_set.deck.cue_templates,
+                study_set.deck.distractors,
+                self.engine.rng,
+            )
+            for study_set in self.engine.engines
+        }
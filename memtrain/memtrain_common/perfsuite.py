@@ -0,0 +1,385 @@
+import gc
+import json
+import math
+import os
+import platform
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from memtrain.memtrain_common.bench import SyntheticDeckConfig, generate_study_set
+from memtrain.memtrain_common.columnar import ColumnarDeck
+from memtrain.memtrain_common.database import Database
+from memtrain.memtrain_common.deck import Deck
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.question import Question
+
+# Deck sizes large enough that whole-deck operations take tens of
+# milliseconds or more, well above timer and scheduler noise.
+DEFAULT_SIZES = [5000, 10000, 20000, 40000]
+
+# Runs per measurement, of which the median is kept.
+DEFAULT_REPEAT = 5
+
+# Number of questions each per-question benchmark runs per repeat.
+OPS_PER_RUN = 500
+
+# Number of sessions the planning benchmark plans per repeat.
+PLANS_PER_RUN = 100
+
+SUITE_FORMAT = 2
+
+# Deck classes for the study-set database backends compared by compare_stores().
+STORES = {"memory": Deck, "columns": ColumnarDeck}
+
+
+class Fixture:
+    """A synthetic study set loaded at one size, shared by the benchmarks."""
+
+    def __init__(self, workdir, size, seed=0):
+        self.csvfile = generate_study_set(
+            os.path.join(workdir, "deck-{}.csv".format(size)),
+            SyntheticDeckConfig(items=size, synonyms=2, seed=seed),
+        )
+        self.engine = Engine(self.csvfile, None, None, None, None, seed=seed)
+
+        self.deck = self.engine.deck
+
+        self.csv_list = self.deck.load(self.csvfile)
+        self.indices = {
+            "cue": [],
+            "response": [],
+            "synonym": [],
+            "hint": [],
+            "tag": [],
+            "mtag": [],
+            "item_id": [],
+        }
+        self.deck.get_csv_column_indices(self.indices, self.csv_list)
+        header_row_number = self.deck.get_csv_column_header_row_number(self.csv_list)
+        self.data_list = self.csv_list[header_row_number + 1 :]
+
+        self.question = Question(
+            self.engine.settings,
+            self.engine.database,
+            self.engine.deck.cue_templates,
+            self.engine.deck.distractors,
+            self.engine.rng,
+        )
+        self.items = self.engine.all_items[:OPS_PER_RUN]
+
+    def close(self):
+        self.engine.close()
+
+    def load_question(self, item, level):
+        self.engine.settings.level = level
+        self.engine.mtstatistics.response_number = 1
+        self.question.main_data_loop(item.cue_id, item.response_id, self.engine.mtstatistics)
+
+
+def bench_csv_load(fixture):
+    fixture.deck.load(fixture.csvfile)
+
+
+def bench_populate(fixture):
+    Database().populate(fixture.indices, fixture.data_list)
+
+
+def bench_build_item_records(fixture):
+    fixture.deck.build_item_records(fixture.indices, fixture.data_list)
+
+
+def bench_session_planning(fixture):
+    for _ in range(PLANS_PER_RUN):
+        fixture.engine.build_session_items(fixture.engine.filtered_items)
+
+
+def bench_mchoice_generation(fixture):
+    for item in fixture.items:
+        fixture.load_question(item, "1")
+        fixture.question.generate_mchoices()
+
+
+def bench_grading(fixture):
+    for item in fixture.items:
+        fixture.load_question(item, "3")
+        fixture.question.user_input = item.response.lower()
+        fixture.question.grade_input()
+
+
+def bench_progress_writes(fixture):
+    for item in fixture.items:
+        fixture.engine.record_result(item, True, 1.0)
+
+
+# Each benchmark declares the largest log-log growth exponent of its run time
+# against deck size that still counts as acceptable. Whole-deck operations
+# should be linear. Session planning reads only the items a session uses, and
+# per-question operations run a fixed number of questions, so they should be
+# close to flat. Distractors are sampled from the response pools rather than
+# scanned, but mchoice generation still copies and shuffles the responses
+# that share the answer's mtags, which grow with the deck.
+BENCHMARKS = {
+    "csv_load": (bench_csv_load, 1.3),
+    "populate": (bench_populate, 1.3),
+    "build_item_records": (bench_build_item_records, 1.3),
+    "session_planning": (bench_session_planning, 0.5),
+    "mchoice_generation": (bench_mchoice_generation, 1.3),
+    "grading": (bench_grading, 0.5),
+    "progress_writes": (bench_progress_writes, 0.5),
+}
+
+
+def time_median(func, fixture, repeat):
+    """Return the median of repeat runs, which one slow or fast outlier cannot move."""
+    times = []
+
+    # As in timeit, garbage collection is paused so that a collection
+    # triggered by earlier allocations is not charged to the run.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func(fixture)
+            times.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return statistics.median(times)
+
+
+def scaling_exponent(sizes, times):
+    """Least-squares slope of log(time) against log(size)."""
+    points = [(math.log(size), math.log(t)) for size, t in zip(sizes, times) if t > 0]
+
+    if len(points) < 2:
+        return 0.0
+
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in points)
+    denominator = sum((x - mean_x) ** 2 for x, _ in points)
+
+    return numerator / denominator if denominator else 0.0
+
+
+def run_suite(sizes=None, repeat=DEFAULT_REPEAT, benchmarks=None, seed=0):
+    """Run the benchmark suite and return a JSON-serializable result."""
+    sizes = sorted(sizes or DEFAULT_SIZES)
+    names = benchmarks or list(BENCHMARKS)
+    results = {name: {"times": {}} for name in names}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Progress writes go to a throwaway database.
+        previous_progress_db = os.environ.get("MEMTRAIN_PROGRESS_DB")
+        os.environ["MEMTRAIN_PROGRESS_DB"] = os.path.join(workdir, "progress.sqlite3")
+
+        try:
+            for size in sizes:
+                fixture = Fixture(workdir, size, seed)
+                try:
+                    for name in names:
+                        func, _ = BENCHMARKS[name]
+                        results[name]["times"][str(size)] = time_median(func, fixture, repeat)
+                finally:
+                    fixture.close()
+        finally:
+            if previous_progress_db is None:
+                os.environ.pop("MEMTRAIN_PROGRESS_DB", None)
+            else:
+                os.environ["MEMTRAIN_PROGRESS_DB"] = previous_progress_db
+
+    for name in names:
+        times = [results[name]["times"][str(size)] for size in sizes]
+        results[name]["exponent"] = scaling_exponent(sizes, times)
+        results[name]["max_exponent"] = BENCHMARKS[name][1]
+
+    return {
+        "format": SUITE_FORMAT,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def check_scaling(suite):
+    """Return a message for every benchmark that grows faster than allowed."""
+    out = []
+
+    for name, result in suite["results"].items():
+        if result["exponent"] > result["max_exponent"]:
+            out.append(
+                "{}: run time grows as size^{:.2f} (allowed: size^{:.2f})".format(
+                    name, result["exponent"], result["max_exponent"]
+                )
+            )
+
+    return out
+
+
+def compare(baseline, current, threshold=0.25):
+    """
+    Return a message for every benchmark and size that is more than threshold
+    slower than the baseline, plus any scaling failures in current.
+    """
+    out = []
+
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+
+        baseline_times = baseline["results"][name]["times"]
+        for size, seconds in result["times"].items():
+            if size not in baseline_times or not baseline_times[size]:
+                continue
+
+            ratio = seconds / baseline_times[size]
+            if ratio > 1 + threshold:
+                out.append(
+                    "{} @ {}: {:.3f} ms vs baseline {:.3f} ms ({:+.0%})".format(
+                        name, size, seconds * 1000, baseline_times[size] * 1000, ratio - 1
+                    )
+                )
+
+    return out + check_scaling(current)
+
+
+def format_suite(suite):
+    """Format a suite result as a plain-text table."""
+    sizes = suite["sizes"]
+    lines = [
+        "{:<20}".format("Benchmark")
+        + "".join("{:>12}".format(size) for size in sizes)
+        + "{:>10}".format("Scaling")
+    ]
+
+    for name, result in suite["results"].items():
+        lines.append(
+            "{:<20}".format(name)
+            + "".join("{:>12.3f}".format(result["times"][str(size)] * 1000) for size in sizes)
+            + "{:>10.2f}".format(result["exponent"])
+        )
+
+    lines.append("")
+    lines.append(
+        "Times are the median of {} runs in milliseconds, seed {}.".format(
+            suite["repeat"], suite.get("seed", 0)
+        )
+    )
+    return "\n".join(lines)
+
+
+def load_suite(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_suite(suite, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(suite, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def lookup_item(database, item):
+    """Make the study-set database lookups that rendering a question makes."""
+    database.get_value("cue", item.cue_id)
+    database.get_value("response", item.response_id)
+    database.get_placement(item.cue_id, item.response_id)
+    database.get_response_values("synonym", item.response_id)
+    database.get_response_values("hint", item.response_id)
+    for mtag in database.get_response_values("mtag", item.response_id):
+        database.get_responses_by_mtag(mtag)
+
+
+def deck_memory(deck_class, csvfile):
+    """
+    Return the bytes a loaded deck keeps: its Python allocations, plus the
+    pages of an SQLite database, which tracemalloc cannot see.
+    """
+    tracemalloc.start()
+    try:
+        deck = deck_class(csvfile)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    conn = getattr(deck.database, "conn", None)
+    if conn is not None:
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        size += page_count * page_size
+    return size
+
+
+def compare_stores(sizes=None, repeat=DEFAULT_REPEAT):
+    """
+    Load synthetic study sets into each study-set database backend and
+    return the load time, lookup latency per question, and memory of each.
+    """
+    sizes = sorted(sizes or DEFAULT_SIZES)
+    results = {store: {} for store in STORES}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            csvfile = generate_study_set(
+                os.path.join(workdir, "deck-{}.csv".format(size)),
+                SyntheticDeckConfig(items=size, synonyms=2),
+            )
+
+            for store, deck_class in STORES.items():
+                deck = deck_class(csvfile)
+                items = deck.all_items[:OPS_PER_RUN]
+
+                def lookups(_):
+                    for item in items:
+                        lookup_item(deck.database, item)
+
+                results[store][str(size)] = {
+                    "load": time_median(deck_class, csvfile, repeat),
+                    "lookup": time_median(lookups, None, repeat) / len(items),
+                    "memory": deck_memory(deck_class, csvfile),
+                }
+
+    return {
+        "format": SUITE_FORMAT,
+        "python": platform.python_version(),
+        "sizes": sizes,
+        "repeat": repeat,
+        "stores": results,
+    }
+
+
+def format_store_comparison(comparison):
+    """Format a store comparison as a plain-text table."""
+    lines = [
+        "{:<10}{:>10}{:>12}{:>14}{:>12}".format(
+            "Store", "Items", "Load ms", "Lookup us", "Memory KB"
+        )
+    ]
+
+    for size in comparison["sizes"]:
+        for store, results in comparison["stores"].items():
+            result = results[str(size)]
+            lines.append(
+                "{:<10}{:>10}{:>12.1f}{:>14.1f}{:>12.0f}".format(
+                    store,
+                    size,
+                    result["load"] * 1000,
+                    result["lookup"] * 1e6,
+                    result["memory"] / 1024,
+                )
+            )
+
+    lines.append("")
+    lines.append(
+        "Load times are the median of {} runs. Lookups are the study-set database queries of one "
+        "question. Memory is what a loaded deck keeps.".format(comparison["repeat"])
+    )
+    return "\n".join(lines)
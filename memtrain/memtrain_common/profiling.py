@@ -0,0 +1,128 @@
+import cProfile
+import os
+import tracemalloc
+from contextlib import contextmanager
+
+# Number of allocation sites listed per phase in memory profiles.
+TOP_ALLOCATIONS = 25
+
+# Frames kept per allocation traceback.
+TRACEBACK_FRAMES = 10
+
+
+def phase_path(path, phase, extension):
+    """Derive a per-phase output path, e.g. session.pstats -> session.load.pstats."""
+    root, ext = os.path.splitext(path)
+    return "{}.{}{}".format(root, phase, ext or extension)
+
+
+class SessionProfiler:
+    """
+    Capture cProfile statistics and tracemalloc allocations for each phase of
+    a real session, such as deck loading and the per-question loop.
+
+    A phase can be entered many times (the GUI enters the question phase once
+    per Tk event); its statistics accumulate across entries.
+    """
+
+    def __init__(self, profile_path=None, memprofile_path=None, top=TOP_ALLOCATIONS):
+        self.profile_path = profile_path
+        self.memprofile_path = memprofile_path
+        self.top = top
+
+        self.profiles: dict[str, cProfile.Profile] = {}
+        self.depth: dict[str, int] = {}
+        self.first_snapshots: dict[str, tracemalloc.Snapshot] = {}
+        self.last_snapshots: dict[str, tracemalloc.Snapshot] = {}
+        self.peaks: dict[str, int] = {}
+
+        if self.memprofile_path and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEBACK_FRAMES)
+
+    @property
+    def enabled(self):
+        return bool(self.profile_path or self.memprofile_path)
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            ]
+        )
+
+    def start_phase(self, name):
+        depth = self.depth.get(name, 0)
+        self.depth[name] = depth + 1
+
+        # Nested entries into the same phase are already being measured.
+        if depth:
+            return
+
+        if self.memprofile_path:
+            if name not in self.first_snapshots:
+                self.first_snapshots[name] = self.take_snapshot()
+            tracemalloc.reset_peak()
+
+        if self.profile_path:
+            self.profiles.setdefault(name, cProfile.Profile()).enable()
+
+    def stop_phase(self, name):
+        self.depth[name] -= 1
+
+        if self.depth[name]:
+            return
+
+        if self.profile_path:
+            self.profiles[name].disable()
+
+        if self.memprofile_path:
+            peak = tracemalloc.get_traced_memory()[1]
+            self.peaks[name] = max(self.peaks.get(name, 0), peak)
+            self.last_snapshots[name] = self.take_snapshot()
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        self.start_phase(name)
+        try:
+            yield
+        finally:
+            self.stop_phase(name)
+
+    def format_allocations(self, name):
+        stats = self.last_snapshots[name].compare_to(self.first_snapshots[name], "lineno")
+        lines = [
+            "Phase: {}".format(name),
+            "Peak traced memory: {:.1f} KiB".format(self.peaks[name] / 1024),
+            "",
+            "Top {} allocation sites by growth during the phase:".format(self.top),
+            "",
+        ]
+        lines += [str(stat) for stat in stats[: self.top]]
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """Write one pstats file and one allocation report per phase."""
+        written = []
+
+        if self.profile_path:
+            for name, profile in self.profiles.items():
+                path = phase_path(self.profile_path, name, ".pstats")
+                profile.dump_stats(path)
+                written.append(path)
+
+        if self.memprofile_path:
+            for name in self.last_snapshots:
+                path = phase_path(self.memprofile_path, name, ".txt")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(self.format_allocations(name))
+                written.append(path)
+
+            tracemalloc.stop()
+
+        return written
@@ -2,15 +2,81 @@ import os
 import sqlite3
 from datetime import datetime, timedelta, timezone
 
+from memtrain.memtrain_common import sqlprofile
 from memtrain.memtrain_common.models import ProgressRecord
 
+# Learner that progress belongs to when none is named. Progress recorded
+# before learners existed is migrated to this learner.
+DEFAULT_LEARNER = "default"
+
+# Schema version stored in PRAGMA user_version.
+SCHEMA_VERSION = 2
+
+# Item lists longer than this are matched by scanning the learner's rows for
+# the study set instead of binding one parameter per item, which would run
+# into SQLite's host parameter limit.
+IN_LIST_LIMIT = 500
+
+CREATE_ITEM_PROGRESS = """CREATE TABLE IF NOT EXISTS item_progress (
+                      learner_id TEXT NOT NULL DEFAULT 'default',
+                      study_set_id TEXT,
+                      item_id TEXT,
+                      current_stage INTEGER NOT NULL DEFAULT 0,
+                      mastery_score REAL NOT NULL DEFAULT 0.0,
+                      success_streak INTEGER NOT NULL DEFAULT 0,
+                      failure_count INTEGER NOT NULL DEFAULT 0,
+                      lapse_count INTEGER NOT NULL DEFAULT 0,
+                      average_response_time REAL NOT NULL DEFAULT 0.0,
+                      reviews INTEGER NOT NULL DEFAULT 0,
+                      last_seen_at TEXT,
+                      next_due_at TEXT,
+                      PRIMARY KEY (learner_id, study_set_id, item_id))"""
+
+PROGRESS_COLUMNS = [
+    "current_stage",
+    "mastery_score",
+    "success_streak",
+    "failure_count",
+    "lapse_count",
+    "average_response_time",
+    "reviews",
+    "last_seen_at",
+    "next_due_at",
+]
+
+UPSERT_PROGRESS = """INSERT INTO item_progress(
+                   learner_id, study_set_id, item_id, current_stage, mastery_score,
+                   success_streak, failure_count, lapse_count,
+                   average_response_time, reviews, last_seen_at, next_due_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(learner_id, study_set_id, item_id) DO UPDATE SET
+                   current_stage = excluded.current_stage,
+                   mastery_score = excluded.mastery_score,
+                   success_streak = excluded.success_streak,
+                   failure_count = excluded.failure_count,
+                   lapse_count = excluded.lapse_count,
+                   average_response_time = excluded.average_response_time,
+                   reviews = excluded.reviews,
+                   last_seen_at = excluded.last_seen_at,
+                   next_due_at = excluded.next_due_at"""
+
+
+def progress_row(learner_id, study_set_id, item_id, progress):
+    """Return the UPSERT_PROGRESS parameters for a progress record."""
+    progress_values = progress.to_mapping()
+    return (learner_id, study_set_id, item_id) + tuple(
+        progress_values[column] for column in PROGRESS_COLUMNS
+    )
+
 
 class ProgressStore:
     """Persist per-item learner progress for adaptive sessions."""
 
     def __init__(self, csvfile):
         self.db_path = self.get_db_path(csvfile)
-        self.conn = sqlite3.connect(self.db_path)
+        # Sessions served from a thread pool use their store from more than
+        # one thread, one call at a time.
+        self.conn = sqlprofile.connect(self.db_path, "progress", check_same_thread=False)
         self.conn.row_factory = sqlite3.Row
         self.create_tables()
 
@@ -23,36 +89,64 @@ class ProgressStore:
         return os.path.join(csv_dir, ".memtrain-progress.sqlite3")
 
     def create_tables(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        with self.conn:
+            # DDL does not open a transaction by itself; the migration must
+            # not be left half done.
+            self.conn.execute("BEGIN")
+            self.conn.execute(CREATE_ITEM_PROGRESS)
+
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(item_progress)")]
+            if "learner_id" not in columns:
+                self.migrate_to_learners()
+
+            # Due queues are read in next_due_at order per learner and study set.
+            self.conn.execute(
+                """CREATE INDEX IF NOT EXISTS item_progress_due
+                   ON item_progress (learner_id, study_set_id, next_due_at)"""
+            )
+            self.conn.execute("PRAGMA user_version = {}".format(SCHEMA_VERSION))
+
+    def migrate_to_learners(self):
+        """Rebuild a single-learner item_progress table with a learner_id key."""
+        columns = ", ".join(["study_set_id", "item_id"] + PROGRESS_COLUMNS)
+
+        self.conn.execute("ALTER TABLE item_progress RENAME TO item_progress_v1")
+        self.conn.execute(CREATE_ITEM_PROGRESS)
         self.conn.execute(
-            """CREATE TABLE IF NOT EXISTS item_progress (
-                          study_set_id TEXT,
-                          item_id TEXT,
-                          current_stage INTEGER NOT NULL DEFAULT 0,
-                          mastery_score REAL NOT NULL DEFAULT 0.0,
-                          success_streak INTEGER NOT NULL DEFAULT 0,
-                          failure_count INTEGER NOT NULL DEFAULT 0,
-                          lapse_count INTEGER NOT NULL DEFAULT 0,
-                          average_response_time REAL NOT NULL DEFAULT 0.0,
-                          reviews INTEGER NOT NULL DEFAULT 0,
-                          last_seen_at TEXT,
-                          next_due_at TEXT,
-                          PRIMARY KEY (study_set_id, item_id))"""
+            """INSERT INTO item_progress (learner_id, {columns})
+               SELECT ?, {columns} FROM item_progress_v1""".format(
+                columns=columns
+            ),
+            (DEFAULT_LEARNER,),
         )
-        self.conn.commit()
+        self.conn.execute("DROP TABLE item_progress_v1")
 
-    def get_progress_map(self, study_set_id, item_ids):
+    def get_progress_map(self, study_set_id, item_ids, learner_id=DEFAULT_LEARNER):
         if not item_ids:
             return {}
 
-        placeholders = ",".join("?" for _ in item_ids)
-        params = [study_set_id] + list(item_ids)
-        query = """SELECT * FROM item_progress
-                   WHERE study_set_id = ?
-                   AND item_id IN ({})""".format(
-            placeholders
-        )
+        if len(item_ids) > IN_LIST_LIMIT:
+            wanted = set(item_ids)
+            rows = self.conn.execute(
+                """SELECT * FROM item_progress
+                   WHERE learner_id = ? AND study_set_id = ?""",
+                (learner_id, study_set_id),
+            )
+            rows = [row for row in rows if row["item_id"] in wanted]
+        else:
+            placeholders = ",".join("?" for _ in item_ids)
+            params = [learner_id, study_set_id] + list(item_ids)
+            query = """SELECT * FROM item_progress
+                       WHERE learner_id = ? AND study_set_id = ?
+                       AND item_id IN ({})""".format(
+                placeholders
+            )
+            rows = self.conn.execute(query, params).fetchall()
 
-        rows = self.conn.execute(query, params).fetchall()
         out = {}
 
         for row in rows:
@@ -60,40 +154,102 @@ class ProgressStore:
 
         return out
 
-    def update_progress(self, study_set_id, item_id, progress):
-        progress_values = progress.to_mapping()
+    def get_due_item_ids(self, study_set_id, now=None, limit=None, learner_id=DEFAULT_LEARNER):
+        """Return IDs of reviewed items that are due, soonest due first."""
+        query = """SELECT item_id FROM item_progress
+                   WHERE learner_id = ? AND study_set_id = ?
+                   AND next_due_at <= ?
+                   ORDER BY next_due_at"""
+        params = [learner_id, study_set_id, self.to_iso(now or self.now())]
+
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        return [row["item_id"] for row in self.conn.execute(query, params)]
+
+    def get_item_ids(self, study_set_id, learner_id=DEFAULT_LEARNER):
+        """Return the set of IDs of items the learner has progress for."""
+        rows = self.conn.execute(
+            "SELECT item_id FROM item_progress WHERE learner_id = ? AND study_set_id = ?",
+            (learner_id, study_set_id),
+        )
+        return {row["item_id"] for row in rows}
+
+    def iter_progress(self, query, params):
+        """Yield (item_id, progress) pairs for a query, reading rows as they are consumed."""
+        cursor = self.conn.execute(query, params)
+        try:
+            for row in cursor:
+                yield row["item_id"], ProgressRecord.from_mapping(dict(row))
+        finally:
+            cursor.close()
+
+    def iter_due(self, study_set_id, now=None, learner_id=DEFAULT_LEARNER):
+        """Yield due items and their progress, soonest due first."""
+        return self.iter_progress(
+            """SELECT * FROM item_progress
+               WHERE learner_id = ? AND study_set_id = ?
+               AND next_due_at <= ?
+               ORDER BY next_due_at, mastery_score, failure_count DESC""",
+            (learner_id, study_set_id, self.to_iso(now or self.now())),
+        )
+
+    def iter_weak(self, study_set_id, now=None, learner_id=DEFAULT_LEARNER):
+        """Yield weak items that are not yet due and their progress, weakest first."""
+        return self.iter_progress(
+            """SELECT * FROM item_progress
+               WHERE learner_id = ? AND study_set_id = ?
+               AND next_due_at > ?
+               AND (failure_count > 0 OR mastery_score < 0.4)
+               ORDER BY mastery_score, failure_count DESC, reviews""",
+            (learner_id, study_set_id, self.to_iso(now or self.now())),
+        )
+
+    def get_learner_ids(self):
+        rows = self.conn.execute("SELECT DISTINCT learner_id FROM item_progress ORDER BY 1")
+        return [row["learner_id"] for row in rows]
+
+    def export_learner(self, learner_id):
+        """Yield every progress row for a learner as a mapping."""
+        rows = self.conn.execute(
+            """SELECT * FROM item_progress WHERE learner_id = ?
+               ORDER BY study_set_id, item_id""",
+            (learner_id,),
+        )
+
+        for row in rows:
+            yield dict(row)
+
+    def delete_learner(self, learner_id):
+        """Delete all progress for a learner and return the number of rows removed."""
+        with self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM item_progress WHERE learner_id = ?", (learner_id,)
+            )
+
+        return cursor.rowcount
+
+    def update_progress(self, study_set_id, item_id, progress, learner_id=DEFAULT_LEARNER):
         self.conn.execute(
-            """INSERT INTO item_progress(
-                   study_set_id, item_id, current_stage, mastery_score,
-                   success_streak, failure_count, lapse_count,
-                   average_response_time, reviews, last_seen_at, next_due_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-               ON CONFLICT(study_set_id, item_id) DO UPDATE SET
-                   current_stage = excluded.current_stage,
-                   mastery_score = excluded.mastery_score,
-                   success_streak = excluded.success_streak,
-                   failure_count = excluded.failure_count,
-                   lapse_count = excluded.lapse_count,
-                   average_response_time = excluded.average_response_time,
-                   reviews = excluded.reviews,
-                   last_seen_at = excluded.last_seen_at,
-                   next_due_at = excluded.next_due_at""",
-            (
-                study_set_id,
-                item_id,
-                progress_values["current_stage"],
-                progress_values["mastery_score"],
-                progress_values["success_streak"],
-                progress_values["failure_count"],
-                progress_values["lapse_count"],
-                progress_values["average_response_time"],
-                progress_values["reviews"],
-                progress_values["last_seen_at"],
-                progress_values["next_due_at"],
-            ),
+            UPSERT_PROGRESS, progress_row(learner_id, study_set_id, item_id, progress)
         )
         self.conn.commit()
 
+    def update_progress_many(self, study_set_id, updates):
+        """Write (learner_id, item_id, progress) updates in one transaction."""
+        with self.conn:
+            self.conn.executemany(
+                UPSERT_PROGRESS,
+                (
+                    progress_row(learner_id, study_set_id, item_id, progress)
+                    for learner_id, item_id, progress in updates
+                ),
+            )
+
+    def close(self):
+        self.conn.close()
+
     def now(self):
         return datetime.now(timezone.utc)
 
@@ -1,20 +1,122 @@
 import random
 
+from memtrain.memtrain_common.distractors import DistractorIndex
+from memtrain.memtrain_common.grading import EXACT, NEAR, AnswerKey, standardize
+from memtrain.memtrain_common.templates import CueTemplates
+
+# Random draws tried per distractor before a pool is filtered instead
+DRAW_ATTEMPTS = 4
+
 
 class NoResponsesError(Exception):
     pass
 
 
+def is_plural(string):
+    """Detects most plural words in English"""
+    return string[-1:] == "s" or string[-2:] == "es"
+
+
+def draw_responses(pool, count, used, rng=random):
+    """
+    Return up to count random responses from pool whose lowercase forms are
+    not in used, and add those forms to used. Large pools are sampled without
+    copying them.
+    """
+    out = []
+    for _ in range(DRAW_ATTEMPTS * count if pool else 0):
+        if len(out) == count:
+            return out
+        response = pool[rng.randrange(len(pool))]
+        if response.lower() not in used:
+            used.add(response.lower())
+            out.append(response)
+
+    # Small pools, or pools that are mostly used, are filtered and shuffled.
+    if len(out) < count:
+        rest = [response for response in pool if response.lower() not in used]
+        rng.shuffle(rest)
+        for response in rest:
+            if len(out) == count:
+                break
+            if response.lower() not in used:
+                used.add(response.lower())
+                out.append(response)
+
+    return out
+
+
+def make_mchoices(
+    response,
+    same_mtag_responses,
+    similar_responses,
+    plural_responses,
+    nonplural_responses,
+    letters,
+    rng=random,
+):
+    """
+    Return multiple choices by letter, with the response at a random letter,
+    and that letter.
+
+    Distractors are drawn first from same_mtag_responses, in random order.
+    Then they come from similar_responses, in order. After that they are
+    random responses of the same plurality, and then of the other plurality.
+    Choices are shown capitalized and graded ignoring case, so no two differ
+    only in case.
+    """
+    used = {response.lower()}
+    needed = len(letters) - 1
+    distractors = []
+
+    same_mtag_responses = list(dict.fromkeys(same_mtag_responses))
+    rng.shuffle(same_mtag_responses)
+    for pool in (same_mtag_responses, similar_responses):
+        for candidate in pool:
+            if len(distractors) < needed and candidate.lower() not in used:
+                used.add(candidate.lower())
+                distractors.append(candidate)
+
+    if is_plural(response):
+        pools = (plural_responses, nonplural_responses)
+    else:
+        pools = (nonplural_responses, plural_responses)
+    for pool in pools:
+        distractors += draw_responses(pool, needed - len(distractors), used, rng)
+
+    if len(distractors) < needed:
+        raise NoResponsesError("There are no more responses available.")
+
+    # Get the index of the correct answer.
+    correct_letter = rng.choice(letters)
+    distractors = iter(distractors)
+
+    out = dict()
+    for letter in letters:
+        this_response = response if letter == correct_letter else next(distractors)
+        # Capitalize only the first letter of this_response
+        out[letter] = this_response[0].upper() + this_response[1:]
+
+    return out, correct_letter
+
+
 class Question:
     """Manages the current cue and response interface"""
 
-    def __init__(self, settings, database):
+    def __init__(self, settings, database, templates=None, distractors=None, rng=None):
         # Initialize core objects
         self.settings = settings
-        self.conn = database.conn
-        self.cur = self.conn.cursor()
         self.database = database
 
+        # Compiled cue templates, shared with the deck when it passes its own
+        self.templates = CueTemplates() if templates is None else templates
+
+        # The response trigram index for similar distractors, likewise
+        self.distractors = DistractorIndex(database) if distractors is None else distractors
+
+        # The random generator choices are laid out with, usually the engine's
+        self.rng = random if rng is None else rng
+
         self.responses = self.database.get_all_responses()
 
         self.cue_id = 0
@@ -22,6 +124,8 @@ class Question:
         self.f_cue = ""
         self.mtags = []
         self.mchoices = dict()
+        # The letter of the response among the last generated choices
+        self.answer_letter = None
 
         self.ascii_range = ["a", "b", "c", "d"]
 
@@ -29,6 +133,10 @@ class Question:
         self.user_input = ""
         self.synonyms = []
 
+        # The grading of the last input: EXACT, NEAR, or None if it was wrong
+        self.answer_keys = {}
+        self.match = None
+
         self.plural_responses = [i for i in self.responses if self.is_plural(i)]
         self.nonplural_responses = [i for i in self.responses if not self.is_plural(i)]
 
@@ -43,12 +151,7 @@ class Question:
         self.stage_text = ""
 
     def get_value(self, value, value_id):
-        self.cur.execute(
-            """SELECT {} FROM {} WHERE {} = (?)""".format(value, value + "s", value + "_id"),
-            (str(value_id),),
-        )
-        rows = self.cur.fetchall()
-        return rows[0][0]
+        return self.database.get_value(value, value_id)
 
     def get_cue(self, cue_id):
         return self.get_value("cue", cue_id)
@@ -57,115 +160,27 @@ class Question:
         return self.get_value("response", response_id)
 
     def get_hints(self):
-        # Translate response_id into hint_id
-        self.cur.execute(
-            """SELECT hint_id FROM responses_to_hints
-                         WHERE response_id = (?)""",
-            (str(self.response_id),),
-        )
-        rows = self.cur.fetchall()
-        rows = list(map(lambda x: x[0], rows))
-
-        out = []
-
-        # Translate hint_id to hint
-        for hint_id in rows:
-            out.append(self.get_value("hint", hint_id))
-
-        return out
+        return self.database.get_response_values("hint", self.response_id)
 
     def get_synonyms(self):
-        # Translate response_id into synonym_id
-        self.cur.execute(
-            """SELECT synonym_id FROM responses_to_synonyms
-                         WHERE response_id = (?)""",
-            (str(self.response_id),),
-        )
-        rows = self.cur.fetchall()
-        rows = list(map(lambda x: x[0], rows))
-
-        out = []
-
-        # Translate synonym_id to synonym
-        for synonym_id in rows:
-            out.append(self.get_value("synonym", synonym_id))
-
-        return out
+        return self.database.get_response_values("synonym", self.response_id)
 
     def get_mtags(self):
-        # Translate response_id into mtag_id
-        self.cur.execute(
-            """SELECT mtag_id FROM responses_to_mtags
-                         WHERE response_id = (?)""",
-            (str(self.response_id),),
-        )
-        rows = self.cur.fetchall()
-        rows = list(map(lambda x: x[0], rows))
-
-        out = []
-
-        # Translate mtag_id to mtag
-        for mtag_id in rows:
-            out.append(self.get_value("mtag", mtag_id))
-
-        return out
+        return self.database.get_response_values("mtag", self.response_id)
 
     def get_placement(self, cue_id, response_id):
-        self.cur.execute(
-            """SELECT placement FROM cues_to_responses
-                         WHERE cue_id = (?) AND response_id = (?)""",
-            (str(cue_id), str(response_id)),
-        )
-        rows = self.cur.fetchall()
-        return rows[0][0]
+        return self.database.get_placement(cue_id, response_id)
 
     def get_responses_by_mtag(self, mtag):
-        # Translate mtag_id to mtag
-        self.cur.execute("""SELECT mtag_id FROM mtags WHERE mtag = (?)""", (mtag,))
-        rows = self.cur.fetchall()
-        rows = list(map(lambda x: x[0], rows))
-
-        # Translate mtag_id to response_id
-        response_ids = []
-
-        for mtag_id in rows:
-            self.cur.execute(
-                """SELECT response_id FROM responses_to_mtags
-                             WHERE mtag_id = (?)""",
-                (mtag_id,),
-            )
-            more_rows = self.cur.fetchall()
-            response_ids += list(map(lambda x: x[0], more_rows))
-
-        # Translate response_id to response
-        out = []
-
-        for response_id in response_ids:
-            out.append(self.get_value("response", response_id))
-
-        return out
+        return self.database.get_responses_by_mtag(mtag)
 
     def is_plural(self, string):
         """Detects most plural words in English"""
-        return string[-1:] == "s" or string[-2:] == "es"
+        return is_plural(string)
 
     # Question rendering ######################################################
     def format_cue(self):
-        self.f_cue = self.cue.replace("{{}}", "_" * 9)
-
-        if self.placement == 1:
-            self.f_cue = self.f_cue.replace("{{1}}", "___(1)___")
-        else:
-            self.f_cue = self.f_cue.replace("{{1}}", "_" * 9)
-        if self.placement == 2:
-            self.f_cue = self.f_cue.replace("{{2}}", "___(2)___")
-        else:
-            self.f_cue = self.f_cue.replace("{{2}}", "_" * 9)
-        if self.placement == 3:
-            self.f_cue = self.f_cue.replace("{{3}}", "___(3)___")
-        else:
-            self.f_cue = self.f_cue.replace("{{3}}", "_" * 9)
-
+        self.f_cue = self.templates[self.cue].render(self.placement)
         return self.f_cue
 
     def main_data_loop(self, cue_id, response_id, mtstatistics):
@@ -215,78 +230,27 @@ class Question:
 
     def generate_mchoices(self):
         """Return the choices for the multiple choice questions"""
-        out = dict()
-
         # Get responses for all mtags for this response
         same_mtag_responses = []
 
         for mtag in self.mtags:
             same_mtag_responses += self.get_responses_by_mtag(mtag)
 
-        # Get responses of the same and the other plurality
-        plurality = self.is_plural(self.response)
-
-        same_plurality_responses = (
-            list(self.plural_responses) if plurality else list(self.nonplural_responses)
-        )
-        other_plurality_responses = (
-            list(self.nonplural_responses) if plurality else list(self.plural_responses)
+        # The most similar responses that aren't synonyms
+        similar_responses = []
+        if self.settings.distractors == "similar":
+            similar_responses = self.distractors.similar(self.response, self.synonyms)
+
+        choices, self.answer_letter = make_mchoices(
+            self.response,
+            same_mtag_responses,
+            similar_responses,
+            self.plural_responses,
+            self.nonplural_responses,
+            self.ascii_range,
+            self.rng,
         )
-
-        # We will select first from same_mtag_responses. Then, if
-        # that's empty, we'll select from same_plurality_responses. If
-        # that's also empty, we'll resort to other_plurality_responses.
-
-        # Filter all three of these lists to make sure they don't contain
-        # the correct response
-        same_mtag_responses = [i for i in same_mtag_responses if i != self.response]
-        same_plurality_responses = [i for i in same_plurality_responses if i != self.response]
-        # The response won't be located in other_plurality_responses.
-
-        # Filter the pluarlity_responses lists
-        same_plurality_responses = [
-            i for i in same_plurality_responses if i not in same_mtag_responses
-        ]
-        other_plurality_responses = [
-            i for i in other_plurality_responses if i not in same_mtag_responses
-        ]
-
-        # Shuffle the response lists.
-        random.shuffle(same_mtag_responses)
-        random.shuffle(same_plurality_responses)
-        random.shuffle(other_plurality_responses)
-
-        # Get the index of the correct answer.
-        correct_letter = random.choice(self.ascii_range)
-
-        response_pool_consumption_index = 0
-        response_pool = same_mtag_responses
-
-        # Loop through the ascii range
-        for i in self.ascii_range:
-            # If we have the correct letter, output the correct response.
-            if i == correct_letter:
-                this_response = self.response
-            # Otherwise...
-            else:
-                # If the response_pool is empty...
-                while len(response_pool) == 0:
-                    response_pool_consumption_index = response_pool_consumption_index + 1
-
-                    if response_pool_consumption_index == 1:
-                        response_pool = same_plurality_responses
-                    elif response_pool_consumption_index == 2:
-                        response_pool = other_plurality_responses
-                    elif response_pool_consumption_index > 2:
-                        raise NoResponsesError("There are no more responses available.")
-
-                this_response = response_pool.pop()
-            # Capitalize only the first letter of this_response
-            this_response = this_response[0].upper() + this_response[1:]
-            # Now that we have our choice, insert it into self.mchoices
-            out[i] = this_response
-
-        return out
+        return choices
 
     def validate_input(self):
         """Determine if input is valid"""
@@ -301,44 +265,29 @@ class Question:
 
     def standardize_string(self, string):
         """Standardize strings so they can be compared for correctness"""
-        # The idea here is that a question shouldn't be marked wrong just
-        # because the user forgot to enter a hyphen or a space or used the
-        # wrong case.
-        #
-        # Standarization involves the removal of all case, whitespace, and
-        # hyphens. This means the grading of questions is not case, whitespace,
-        # or hyphen sensitive.
-
-        # Remove case (transform to lowercase)
-        out = string.lower()
-        # Remove whitespace
-        out = "".join(out.split())
-        # Remove hyphens
-        out = out.replace("-", "")
-        out = out.replace("–", "")
-        out = out.replace("—", "")
-
-        return out
+        return standardize(string)
+
+    def get_answer_key(self):
+        """Return the answer key for the current response, building it the first time"""
+        max_edits = self.settings.settings.get("fuzzy", 0)
+        answer_key = self.answer_keys.get(self.response_id)
+        if answer_key is None or not answer_key.matches(self.response, self.synonyms, max_edits):
+            answer_key = self.answer_keys[self.response_id] = AnswerKey(
+                self.response, self.synonyms, max_edits
+            )
+        return answer_key
 
     def determine_equivalence(self):
-        """See if input matches a synonym or standarized string"""
-        self.mtstatistics.is_input_correct = False
+        """See if input matches the response or a synonym, exactly or within the fuzzy edits"""
+        grade = self.get_answer_key().grade(self.user_input)
 
-        # If not, does the input match the response?
-        std_input = self.standardize_string(self.user_input)
-        std_response = self.standardize_string(self.response)
+        self.match = grade.match
+        self.mtstatistics.is_input_correct = grade.match is not None
 
-        if std_input == std_response:
+        if grade.answer == self.response:
             self.mtstatistics.used_response = self.response
-            self.mtstatistics.is_input_correct = True
-
-        if not self.mtstatistics.is_input_correct:
-            # If not, does the input match a synonym?
-            for synonym in self.synonyms:
-                std_synonym = self.standardize_string(synonym)
-                if std_input == std_synonym:
-                    self.mtstatistics.used_synonym = synonym
-                    self.mtstatistics.is_input_correct = True
+        elif grade.answer is not None:
+            self.mtstatistics.used_synonym = grade.answer
 
     def grade_input(self):
         """Determine whether input is correct."""
@@ -347,6 +296,7 @@ class Question:
             # First, translate the letter to its corresponding choice.
             self.user_input = self.mchoices[self.user_input]
             self.mtstatistics.is_input_correct = self.response.lower() == self.user_input.lower()
+            self.match = EXACT if self.mtstatistics.is_input_correct else None
         else:
             # For levels 2 or 3, make sure the right input was entered.
             self.determine_equivalence()
@@ -355,7 +305,10 @@ class Question:
         """Notify the user of correctness, update statistics, and print"""
         if self.mtstatistics.is_input_correct:
             self.mtstatistics.number_correct += 1
-            if self.mtstatistics.has_synonym_been_used():
+            if self.match == NEAR:
+                self.correctness_str = "Correct, allowing for a typo. Answer: " + self.response
+                self.other_answers_str = "Other correct responses: " + ", ".join(self.synonyms)
+            elif self.mtstatistics.has_synonym_been_used():
                 self.correctness_str = "Correct. Default answer: " + self.response
             else:
                 self.correctness_str = "Correct."
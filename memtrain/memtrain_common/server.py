@@ -0,0 +1,393 @@
+import asyncio
+import functools
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from memtrain.memtrain_common.deck import CSVError, DeckCache
+from memtrain.memtrain_common.engine import Engine, NoResponsesError
+from memtrain.memtrain_common.question import NoResponsesError as NoChoicesError
+from memtrain.memtrain_common.session import SessionError, StudySession
+from memtrain.memtrain_common.settings import SettingError
+
+# Largest request body accepted, in bytes.
+MAX_BODY_SIZE = 64 * 1024
+
+# Longest request line or header line accepted, in bytes.
+MAX_LINE_SIZE = 8 * 1024
+
+# Seconds between sweeps for idle sessions and decks.
+SWEEP_INTERVAL = 60.0
+
+ROUTES = [
+    (re.compile(r"^/decks$"), {"GET": "list_decks"}),
+    (re.compile(r"^/sessions$"), {"POST": "create_session"}),
+    (
+        re.compile(r"^/sessions/(?P<session_id>[\w-]+)$"),
+        {"GET": "get_session", "DELETE": "delete_session"},
+    ),
+    (re.compile(r"^/sessions/(?P<session_id>[\w-]+)/answer$"), {"POST": "answer"}),
+]
+
+
+class HTTPError(Exception):
+    """An error that is reported to the client with an HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def study_set_name(csvfile):
+    """Name a study set after its file, e.g. decks/animals.csv -> animals."""
+    return os.path.splitext(os.path.basename(csvfile))[0]
+
+
+class SessionServer:
+    """
+    Host concurrent study sessions over a small JSON-over-HTTP API.
+
+    HTTP is handled on the asyncio event loop. Engine and SQLite work runs
+    in a bounded thread pool. Sessions on the same study set share one loaded
+    deck; reads of its database are serialized with a per-deck lock, and each
+    session writes progress through its own connection.
+    """
+
+    def __init__(
+        self,
+        csvfiles,
+        workers=4,
+        max_sessions=1000,
+        session_timeout=1800.0,
+        max_decks=8,
+    ):
+        self.study_sets = {study_set_name(path): os.path.abspath(path) for path in csvfiles}
+        # Open sessions per CSV file, guarded by cache_lock
+        self.deck_sessions: dict[str, int] = {}
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="memtrain")
+        self.max_sessions = max_sessions
+        self.session_timeout = session_timeout
+
+        # Decks with open sessions are never evicted, so that every session on
+        # a study set shares one loaded copy of it.
+        self.cache = DeckCache(max_decks, session_timeout, lambda key: key[0] in self.deck_sessions)
+        self.cache_lock = threading.Lock()
+        self.deck_locks: dict[str, threading.Lock] = {}
+
+        self.sessions: dict[str, StudySession] = {}
+        # Requests for one session are handled one at a time.
+        self.session_locks: dict[str, asyncio.Lock] = {}
+
+    async def run_blocking(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    # Blocking work, run in the thread pool ##################################
+
+    def open_session(
+        self,
+        name,
+        level=None,
+        nquestions=None,
+        tags=None,
+        not_tags=None,
+        learner=None,
+        query=None,
+        seed=None,
+    ):
+        csvfile = self.study_sets[name]
+
+        with self.cache_lock:
+            lock = self.deck_locks.setdefault(csvfile, threading.Lock())
+            # Counted before the deck is fetched, so that it cannot be evicted
+            # while the session is set up.
+            self.deck_sessions[csvfile] = self.deck_sessions.get(csvfile, 0) + 1
+
+        try:
+            # A cached deck is reloaded in place, so it is fetched under the
+            # lock that its sessions hold while they read it.
+            with lock:
+                with self.cache_lock:
+                    deck = self.cache.get(csvfile)
+                engine = Engine(
+                    csvfile,
+                    level,
+                    nquestions,
+                    tags,
+                    not_tags,
+                    deck,
+                    learner,
+                    query=query,
+                    seed=seed,
+                )
+
+            return StudySession(engine, lock)
+        except BaseException:
+            self.release_deck(csvfile)
+            raise
+
+    def release_deck(self, csvfile):
+        """Record that a session on csvfile closed."""
+        with self.cache_lock:
+            self.deck_sessions[csvfile] -= 1
+            if not self.deck_sessions[csvfile]:
+                del self.deck_sessions[csvfile]
+
+    def evict_idle_decks(self):
+        with self.cache_lock:
+            self.cache.evict_idle()
+
+    # API handlers ###########################################################
+
+    async def list_decks(self, body):
+        return HTTPStatus.OK, {"decks": sorted(self.study_sets)}
+
+    async def create_session(self, body):
+        name = body.get("deck")
+        if name not in self.study_sets:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown study set: {}".format(name))
+        if len(self.sessions) >= self.max_sessions:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many open sessions.")
+        seed = body.get("seed")
+        if seed is not None and (isinstance(seed, bool) or not isinstance(seed, int)):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Seed must be an integer.")
+
+        try:
+            session = await self.run_blocking(
+                self.open_session,
+                name,
+                body.get("level"),
+                body.get("nquestions"),
+                body.get("tags"),
+                body.get("not_tags"),
+                body.get("learner"),
+                body.get("query"),
+                seed,
+            )
+        except (CSVError, NoResponsesError, SettingError) as exc:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, str(exc))
+
+        session_id = secrets.token_urlsafe(16)
+        self.sessions[session_id] = session
+        self.session_locks[session_id] = asyncio.Lock()
+
+        payload = await self.run_blocking(session.current)
+        return HTTPStatus.CREATED, {
+            "session_id": session_id,
+            "seed": session.engine.seed,
+            "question": payload,
+        }
+
+    def get_session_or_404(self, session_id):
+        if session_id not in self.sessions:
+            raise HTTPError(HTTPStatus.NOT_FOUND, "Unknown session: {}".format(session_id))
+
+        return self.sessions[session_id], self.session_locks[session_id]
+
+    async def get_session(self, body, session_id):
+        session, lock = self.get_session_or_404(session_id)
+
+        async with lock:
+            return HTTPStatus.OK, await self.run_blocking(session.current)
+
+    async def answer(self, body, session_id):
+        session, lock = self.get_session_or_404(session_id)
+
+        if "answer" not in body:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Missing answer.")
+
+        async with lock:
+            try:
+                result = await self.run_blocking(
+                    session.answer, body["answer"], body.get("response_time")
+                )
+            except SessionError as exc:
+                raise HTTPError(HTTPStatus.CONFLICT, str(exc))
+            except NoChoicesError as exc:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, str(exc))
+
+        return HTTPStatus.OK, result
+
+    async def close_session(self, session_id):
+        session, lock = self.get_session_or_404(session_id)
+
+        async with lock:
+            # Another request may have closed the session while this one
+            # waited for the lock.
+            if self.sessions.pop(session_id, None) is None:
+                return
+            del self.session_locks[session_id]
+            try:
+                await self.run_blocking(session.close)
+            finally:
+                self.release_deck(session.engine.csvfile)
+
+    async def delete_session(self, body, session_id):
+        await self.close_session(session_id)
+        return HTTPStatus.NO_CONTENT, None
+
+    # HTTP ###################################################################
+
+    async def dispatch(self, method, path, body):
+        for pattern, methods in ROUTES:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if method not in methods:
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed.")
+
+            handler = getattr(self, methods[method])
+            return await handler(body, **match.groupdict())
+
+        raise HTTPError(HTTPStatus.NOT_FOUND, "Not found.")
+
+    async def read_request(self, reader):
+        """Read one request; return (method, path, keep_alive, body) or None at EOF."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line.")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Malformed Content-Length.")
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large.")
+
+        body = {}
+        if length:
+            try:
+                body = json.loads(await reader.readexactly(length))
+            except ValueError:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body is not valid JSON.")
+            if not isinstance(body, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object.")
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        return method, target.split("?", 1)[0], keep_alive, body
+
+    def write_response(self, writer, status, payload, keep_alive):
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        head = [
+            "HTTP/1.1 {} {}".format(status.value, status.phrase),
+            "Content-Length: {}".format(len(body)),
+            "Connection: {}".format("keep-alive" if keep_alive else "close"),
+        ]
+        if payload is not None:
+            head.append("Content-Type: application/json")
+
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, path, keep_alive, body = request
+                    status, payload = await self.dispatch(method, path, body)
+                except HTTPError as exc:
+                    status, payload = exc.status, {"error": str(exc)}
+                except Exception:
+                    traceback.print_exc()
+                    status, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Server error."}
+
+                self.write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            # Truncated requests, dropped connections, and overlong lines.
+            pass
+        finally:
+            writer.close()
+
+    async def sweep_forever(self):
+        """Close sessions and unload decks that have been idle too long."""
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            cutoff = time.monotonic() - self.session_timeout
+
+            for session_id, session in list(self.sessions.items()):
+                if session.last_used < cutoff and session_id in self.sessions:
+                    await self.close_session(session_id)
+
+            await self.run_blocking(self.evict_idle_decks)
+
+    async def serve(self, host="127.0.0.1", port=8765, started=None):
+        """Serve until cancelled. started, if given, is called with the bound port."""
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_LINE_SIZE)
+        sweeper = asyncio.create_task(self.sweep_forever())
+
+        if started is not None:
+            started(server.sockets[0].getsockname()[1])
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            sweeper.cancel()
+            self.executor.shutdown(wait=True)
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+
+
+class ServerThread(threading.Thread):
+    """Run a session server on its own event loop in a background thread."""
+
+    def __init__(self, server, host="127.0.0.1", port=0):
+        super().__init__(daemon=True)
+        self.server = server
+        self.host = host
+        self.port = port
+        self.ready = threading.Event()
+        self.loop = None
+        self.task = None
+
+    def run(self):
+        try:
+            asyncio.run(self.main())
+        except asyncio.CancelledError:
+            pass
+
+    async def main(self):
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        await self.server.serve(self.host, self.port, started=self.on_started)
+
+    def on_started(self, port):
+        self.port = port
+        self.ready.set()
+
+    def start(self):
+        """Start serving and return the bound port."""
+        super().start()
+        self.ready.wait()
+        return self.port
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.join()
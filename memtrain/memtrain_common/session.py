@@ -0,0 +1,169 @@
+import time
+from contextlib import nullcontext
+
+from memtrain.memtrain_common.question import Question
+
+
+class SessionError(Exception):
+    """Raised when a session is asked to do something it cannot do."""
+
+
+class StudySession:
+    """
+    Drive one study session through JSON-serializable payloads.
+
+    This is the front-end-independent version of the CLI's question loop: it
+    presents the current question, grades an answer, and persists the result.
+    When the study-set database is shared between threads, pass a lock that
+    guards it.
+    """
+
+    def __init__(self, engine, lock=None):
+        self.engine = engine
+        self.settings = engine.settings
+        self.mtstatistics = engine.mtstatistics
+        self.lock = lock or nullcontext()
+
+        with self.lock:
+            self.question = Question(
+                self.settings,
+                engine.database,
+                engine.deck.cue_templates,
+                engine.deck.distractors,
+                engine.rng,
+            )
+
+        self.current_item = None
+        self.presented_at = None
+        self.last_used = time.monotonic()
+
+    @property
+    def is_complete(self):
+        return self.mtstatistics.is_last_question()
+
+    def load_question(self):
+        """Load the current question unless it is already loaded"""
+        if self.current_item is not None or self.is_complete:
+            return
+
+        question_index = self.mtstatistics.response_number - 1
+
+        # Edits to the CSV file are picked up between questions.
+        with self.lock:
+            if self.engine.sync(question_index):
+                self.reset_questions()
+        if self.is_complete:
+            return
+
+        self.current_item = self.engine.current_item(question_index)
+        self.settings.level = self.current_item.level
+        self.settings.current_stage_label = self.current_item.stage_label
+
+        with self.lock:
+            self.question.main_data_loop(
+                self.current_item.cue_id, self.current_item.response_id, self.mtstatistics
+            )
+
+            if self.settings.level == "1":
+                self.question.mchoices = self.question.generate_mchoices()
+
+        self.presented_at = time.monotonic()
+
+    def reset_questions(self):
+        """Rebuild questions after the study-set database changed."""
+        self.question = Question(
+            self.settings,
+            self.engine.database,
+            self.engine.deck.cue_templates,
+            self.engine.deck.distractors,
+            self.engine.rng,
+        )
+
+    def current(self):
+        """Return the current question, or the summary once the session is complete"""
+        self.last_used = time.monotonic()
+        self.load_question()
+
+        # Loading can also complete the session, when the rest of its items
+        # were deleted from the study set.
+        if self.is_complete:
+            return {"complete": True, "summary": self.summary()}
+
+        payload = {
+            "complete": False,
+            "response_number": self.mtstatistics.response_number,
+            "total": self.mtstatistics.total,
+            "title": self.settings.settings["title"],
+            "level": self.settings.level,
+            "stage": self.current_item.stage_label,
+            "cue": self.question.cue_text,
+        }
+
+        if self.settings.level == "1":
+            payload["choices"] = self.question.mchoices
+        elif self.settings.level == "2":
+            payload["hints"] = [hint for hint in self.question.hints if hint]
+
+        return payload
+
+    def answer(self, user_input, elapsed_time=None):
+        """
+        Grade an answer to the current question and save the result. Return
+        the result and the next question or summary.
+        """
+        self.last_used = time.monotonic()
+        self.load_question()
+
+        if self.is_complete:
+            raise SessionError("The session is already complete.")
+
+        self.question.user_input = str(user_input).lower()
+        self.question.validate_input()
+
+        if not self.mtstatistics.is_input_valid:
+            return {"valid": False, "next": self.current()}
+
+        if elapsed_time is None:
+            elapsed_time = time.monotonic() - self.presented_at
+
+        with self.engine.timings.span("grade"):
+            self.question.grade_input()
+
+        self.mtstatistics.times.append(elapsed_time)
+
+        with self.engine.timings.span("persist"):
+            self.engine.record_result(
+                self.current_item, self.mtstatistics.is_input_correct, elapsed_time
+            )
+
+        correct = self.mtstatistics.is_input_correct
+        self.question.finalize()
+        self.current_item = None
+
+        result = {
+            "valid": True,
+            "correct": correct,
+            "match": self.question.match,
+            "feedback": self.question.correctness_str,
+        }
+        if self.question.synonyms:
+            result["other_answers"] = self.question.other_answers_str
+
+        result["next"] = self.current()
+        return result
+
+    def close(self):
+        self.engine.close()
+
+    def summary(self):
+        self.mtstatistics.update_percentage()
+        times = self.mtstatistics.times
+
+        return {
+            "total": self.mtstatistics.total,
+            "correct": self.mtstatistics.number_correct,
+            "incorrect": self.mtstatistics.number_incorrect,
+            "percentage": round(float(self.mtstatistics.percentage), 1),
+            "average_response_time": sum(times) / len(times) if times else 0.0,
+            "incorrect_responses": list(self.mtstatistics.incorrect_responses),
+        }
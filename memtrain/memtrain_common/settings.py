@@ -9,7 +9,7 @@ class Settings:
     """Manage settings for memtrain"""
 
     BOOLEAN_LABELS = ["level1", "level2", "level3"]
-    INTEGER_LABELS = ["nquestions"]
+    INTEGER_LABELS = ["nquestions", "fuzzy"]
     STRING_LABELS = ["title"]
 
     def __init__(self):
@@ -19,11 +19,13 @@ class Settings:
             "level2": True,
             "level3": True,
             "nquestions": 0,
+            "fuzzy": 0,
             "title": "",
         }
-        self.all_labels = ["title", "level1", "level2", "level3", "nquestions"]
+        self.all_labels = ["title", "level1", "level2", "level3", "nquestions", "fuzzy"]
         self.level = ""
         self.session_mode = "adaptive"
+        self.distractors = "mtag"
 
     def load_settings(self, settings_row):
         """Load settings from CSV row"""
@@ -0,0 +1,345 @@
+import atexit
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+
+# Statements executed at least this often while returning at most one row on
+# average are reported as likely N+1 query patterns.
+REPEATED_STATEMENT_COUNT = 100
+
+# Number of slowest statements to run EXPLAIN QUERY PLAN on.
+EXPLAIN_TOP = 5
+
+# The progress handler runs every this many SQLite VM instructions.
+PROGRESS_INTERVAL = 100
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+PARAMETER_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+WHITESPACE = re.compile(r"\s+")
+
+_profiler = None
+
+
+def normalize_statement(sql):
+    """
+    Collapse a statement to a stable key by replacing literals with ? and
+    squeezing whitespace and parameter lists.
+    """
+    out = STRING_LITERAL.sub("?", sql)
+    out = NUMBER_LITERAL.sub("?", out)
+    out = WHITESPACE.sub(" ", out).strip()
+    return PARAMETER_LIST.sub("?, ...", out)
+
+
+@dataclass
+class StatementStats:
+    """Aggregated cost of one normalized statement on one connection."""
+
+    connection: str
+    statement: str
+    count: int = 0
+    total_time: float = 0.0
+    rows: int = 0
+    vm_steps: int = 0
+    sample_sql: str = ""
+    sample_parameters: tuple = ()
+    query_plan: list[str] = field(default_factory=list)
+
+    @property
+    def is_table_scan(self):
+        return any(detail.startswith("SCAN") for detail in self.query_plan)
+
+    @property
+    def is_repeated(self):
+        return self.count >= REPEATED_STATEMENT_COUNT and self.rows <= self.count
+
+    def to_mapping(self):
+        return {
+            "connection": self.connection,
+            "statement": self.statement,
+            "count": self.count,
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.count if self.count else 0.0,
+            "rows": self.rows,
+            "vm_steps": self.vm_steps,
+            "query_plan": self.query_plan,
+            "table_scan": self.is_table_scan,
+            "repeated": self.is_repeated,
+        }
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Cursor that reports execute and fetch time and row counts."""
+
+    def execute(self, sql, parameters=()):
+        profiler = self.connection.profiler
+        self.stats = profiler.begin(self.connection.label, sql, parameters)
+        start = time.perf_counter()
+
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.stats.total_time += time.perf_counter() - start
+            profiler.end(self.connection.label)
+
+    def executemany(self, sql, seq_of_parameters):
+        profiler = self.connection.profiler
+        self.stats = profiler.begin(self.connection.label, sql, ())
+        start = time.perf_counter()
+
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.stats.total_time += time.perf_counter() - start
+            profiler.end(self.connection.label)
+
+    def fetch(self, method, *args):
+        start = time.perf_counter()
+        rows = method(*args)
+        stats = getattr(self, "stats", None)
+
+        if stats is not None:
+            stats.total_time += time.perf_counter() - start
+            if isinstance(rows, list):
+                stats.rows += len(rows)
+            elif rows is not None:
+                stats.rows += 1
+
+        return rows
+
+    def fetchone(self):
+        return self.fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self.fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self.fetch(super().fetchall)
+
+    def __next__(self):
+        return self.fetch(super().__next__)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """Connection whose cursors report to the active SQL profiler."""
+
+    profiler = None
+    label = ""
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class SQLProfiler:
+    """
+    Aggregate SQLite statement cost per connection and normalized statement.
+
+    Cursor wrappers measure wall time and rows. The trace callback counts every
+    statement SQLite runs, including implicit BEGIN and COMMIT statements, and
+    the progress handler attributes VM instructions to the running statement.
+    """
+
+    def __init__(self, report_path="-"):
+        self.report_path = report_path
+        self.stats: dict[tuple[str, str], StatementStats] = {}
+        self.connections: dict[str, list[sqlite3.Connection]] = {}
+        # The statement each connection is running, and whether a cursor
+        # wrapper has already counted it.
+        self.current: dict[str, StatementStats] = {}
+        self.wrapped: dict[str, str] = {}
+
+    def get_stats(self, label, statement):
+        key = (label, statement)
+
+        if key not in self.stats:
+            self.stats[key] = StatementStats(connection=label, statement=statement)
+
+        return self.stats[key]
+
+    def attach(self, conn, label):
+        conn.profiler = self
+        conn.label = label
+        conn.set_trace_callback(lambda sql: self.on_trace(label, sql))
+        conn.set_progress_handler(lambda: self.on_progress(label), PROGRESS_INTERVAL)
+        self.connections.setdefault(label, []).append(conn)
+
+    def begin(self, label, sql, parameters):
+        stats = self.get_stats(label, normalize_statement(sql))
+        stats.count += 1
+        stats.sample_sql = sql
+        stats.sample_parameters = tuple(parameters) if not isinstance(parameters, dict) else ()
+        self.current[label] = stats
+        self.wrapped[label] = stats.statement
+        return stats
+
+    def end(self, label):
+        self.wrapped.pop(label, None)
+
+    def on_trace(self, label, sql):
+        statement = normalize_statement(sql)
+
+        if self.wrapped.get(label) == statement:
+            # Already counted by the cursor wrapper.
+            self.current[label] = self.get_stats(label, statement)
+            return
+
+        stats = self.get_stats(label, statement)
+        stats.count += 1
+        if not stats.sample_sql:
+            stats.sample_sql = sql
+        self.current[label] = stats
+
+    def on_progress(self, label):
+        stats = self.current.get(label)
+        if stats is not None:
+            stats.vm_steps += PROGRESS_INTERVAL
+        return 0
+
+    def ordered_stats(self):
+        return sorted(self.stats.values(), key=lambda stats: stats.total_time, reverse=True)
+
+    def explain_worst(self, top=EXPLAIN_TOP):
+        """Capture EXPLAIN QUERY PLAN for the slowest data statements."""
+        explained = 0
+
+        for stats in self.ordered_stats():
+            if explained >= top:
+                break
+
+            verb = stats.sample_sql.split(None, 1)[0].upper() if stats.sample_sql else ""
+            if verb not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                continue
+
+            for conn in self.connections.get(stats.connection, []):
+                try:
+                    # A plain cursor keeps EXPLAIN out of the profile.
+                    rows = (
+                        sqlite3.Cursor(conn)
+                        .execute("EXPLAIN QUERY PLAN " + stats.sample_sql, stats.sample_parameters)
+                        .fetchall()
+                    )
+                except sqlite3.Error:
+                    continue
+
+                stats.query_plan = [row[-1] for row in rows]
+                explained += 1
+                break
+
+    def report(self):
+        return {
+            "statements": [stats.to_mapping() for stats in self.ordered_stats()],
+        }
+
+    def format_report(self):
+        lines = [
+            "SQL profile",
+            "",
+            "{:<10}{:>8}{:>12}{:>10}{:>10}{:>12}  {}".format(
+                "Conn", "Count", "Total ms", "Mean ms", "Rows", "VM steps", "Statement"
+            ),
+        ]
+
+        for stats in self.ordered_stats():
+            mean = stats.total_time / stats.count if stats.count else 0.0
+            lines.append(
+                "{:<10}{:>8}{:>12.3f}{:>10.4f}{:>10}{:>12}  {}".format(
+                    stats.connection,
+                    stats.count,
+                    stats.total_time * 1000,
+                    mean * 1000,
+                    stats.rows,
+                    stats.vm_steps,
+                    stats.statement,
+                )
+            )
+
+        planned = [stats for stats in self.ordered_stats() if stats.query_plan]
+        if planned:
+            lines += ["", "Query plans for the slowest statements", ""]
+            for stats in planned:
+                lines.append("[{}] {}".format(stats.connection, stats.statement))
+                lines += ["    " + detail for detail in stats.query_plan]
+
+        warnings = []
+        for stats in self.ordered_stats():
+            if stats.is_table_scan:
+                warnings.append("Table scan: [{}] {}".format(stats.connection, stats.statement))
+            if stats.is_repeated:
+                warnings.append(
+                    "Repeated {} times (possible N+1): [{}] {}".format(
+                        stats.count, stats.connection, stats.statement
+                    )
+                )
+        if warnings:
+            lines += ["", "Warnings", ""] + warnings
+
+        return "\n".join(lines)
+
+    def detach(self):
+        for connections in self.connections.values():
+            for conn in connections:
+                try:
+                    conn.set_trace_callback(None)
+                    conn.set_progress_handler(None, 0)
+                except sqlite3.ProgrammingError:
+                    # The connection has already been closed.
+                    pass
+
+    def write_report(self):
+        self.detach()
+        self.explain_worst()
+
+        if self.report_path.endswith(".json"):
+            text = json.dumps(self.report(), indent=2)
+        else:
+            text = self.format_report()
+
+        if self.report_path == "-":
+            print(text, file=sys.stderr)
+        else:
+            with open(self.report_path, "w", encoding="utf-8") as f:
+                f.write(text + "\n")
+
+
+def enable(report_path="-"):
+    """Turn on SQL profiling for connections opened from now on."""
+    global _profiler
+
+    if _profiler is None:
+        _profiler = SQLProfiler(report_path)
+        atexit.register(_profiler.write_report)
+    else:
+        _profiler.report_path = report_path
+
+    return _profiler
+
+
+def get_profiler():
+    """Return the active profiler, enabling it from MEMTRAIN_SQL_PROFILE if set."""
+    if _profiler is None and os.environ.get("MEMTRAIN_SQL_PROFILE"):
+        enable(os.environ["MEMTRAIN_SQL_PROFILE"])
+
+    return _profiler
+
+
+def connect(database, label, **kwargs):
+    """Open an SQLite connection, profiled when SQL profiling is on."""
+    profiler = get_profiler()
+
+    if profiler is None:
+        return sqlite3.connect(database, **kwargs)
+
+    conn = sqlite3.connect(database, factory=ProfiledConnection, **kwargs)
+    profiler.attach(conn, label)
+    return conn
@@ -0,0 +1,237 @@
+import re
+from array import array
+from collections.abc import Sequence
+
+from memtrain.memtrain_common.settings import SettingError
+
+# Operators of the tag query language. A comma means the same as |, so that
+# lists like "a,b" keep working.
+TOKEN_PATTERN = re.compile(r"\s*(?:([&|!(),])|([^&|!(),]+))")
+
+# Bit positions set in each byte value, for listing the members of a bitset.
+BYTE_POSITIONS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+
+
+class TagQueryError(SettingError):
+    """Raised when a tag query cannot be parsed."""
+
+
+def tokenize(query):
+    """Split a tag query into operators and stripped tag names."""
+    raw = []
+    position = 0
+    query = query.rstrip()
+
+    while position < len(query):
+        match = TOKEN_PATTERN.match(query, position)
+        operator, name = match.groups()
+        if operator:
+            raw.append(operator)
+        elif name.strip():
+            raw.append(("tag", name.strip()))
+        position = match.end()
+
+    # Empty entries in comma lists, as in "a,,b" or "a,", are ignored.
+    tokens = []
+    for index, token in enumerate(raw):
+        if token == ",":
+            following = raw[index + 1] if index + 1 < len(raw) else None
+            if (
+                tokens
+                and tokens[-1] not in ("|", "&", "!", "(")
+                and following
+                not in (
+                    None,
+                    ",",
+                    "|",
+                    "&",
+                    ")",
+                )
+            ):
+                tokens.append("|")
+        else:
+            tokens.append(token)
+
+    return tokens
+
+
+class TagIndex:
+    """
+    A bitset per tag over a deck's items.
+
+    Bit i of a tag's bitset is set when item i of the deck has the tag. Tag
+    queries such as "a & (b | c) & !d" are evaluated with integer bitwise
+    operations, so their cost depends on the number of tags in the query
+    rather than the number of items.
+    """
+
+    def __init__(self, items, response_tags):
+        self.size = len(items)
+        self.all = (1 << self.size) - 1
+
+        positions_by_response = {}
+        for position, item in enumerate(items):
+            positions_by_response.setdefault(item.response_id, []).append(position)
+
+        positions_by_tag = {}
+        for response_id, tag in response_tags:
+            positions_by_tag.setdefault(tag, []).extend(positions_by_response.get(response_id, []))
+
+        self.bitsets = {
+            tag: self.to_bitset(positions) for tag, positions in positions_by_tag.items()
+        }
+
+    @classmethod
+    def from_bitsets(cls, size, bitsets):
+        """Return an index over size items from precomputed tag bitsets."""
+        index = cls.__new__(cls)
+        index.size = size
+        index.all = (1 << size) - 1
+        index.bitsets = bitsets
+        return index
+
+    def to_bitset(self, positions):
+        data = bytearray((self.size + 7) // 8)
+        for position in positions:
+            data[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(data, "little")
+
+    def positions(self, bitset):
+        """Return the item positions set in a bitset, in ascending order."""
+        return positions_of(bitset.to_bytes((self.size + 7) // 8, "little"))
+
+    def tag(self, name):
+        # Unknown tags match nothing.
+        return self.bitsets.get(name, 0)
+
+    def evaluate(self, query):
+        """Return the bitset of items matching a tag query."""
+        tokens = tokenize(query)
+        if not tokens:
+            return self.all
+
+        return QueryParser(self, tokens).parse()
+
+    def select(self, items, tags=None, not_tags=None):
+        """
+        Return the items that match tags and none of not_tags. items must be
+        the items the index was built from, in the same order. items itself
+        is returned when every item matches, and a Selection of their
+        positions otherwise, so that no items are read or copied.
+        """
+        bitset = self.all
+        if tags:
+            bitset &= self.evaluate(tags)
+        if not_tags:
+            bitset &= ~self.evaluate(not_tags)
+
+        if bitset == self.all:
+            return items
+
+        return Selection(items, bitset.to_bytes((self.size + 7) // 8, "little"))
+
+
+def positions_of(data):
+    """Return the positions set in a little-endian bitset's bytes, in ascending order."""
+    out = array("I")
+    for index, value in enumerate(data):
+        if value:
+            base = index << 3
+            out.extend([base + bit for bit in BYTE_POSITIONS[value]])
+
+    return out
+
+
+class Selection(Sequence):
+    """
+    The items at the positions set in a bitset, in deck order.
+
+    Only the bitset and a compact array of positions are kept. Items are read
+    from the deck's items when they are accessed.
+    """
+
+    def __init__(self, items, members):
+        self.items = items
+        self.members = members
+        self.positions = positions_of(members)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.items[position] for position in self.positions[index]]
+        return self.items[self.positions[index]]
+
+    def __iter__(self):
+        for position in self.positions:
+            yield self.items[position]
+
+    def has_position(self, position):
+        """Return whether the deck's item at position is selected."""
+        return bool(self.members[position >> 3] >> (position & 7) & 1)
+
+
+class QueryParser:
+    """
+    Recursive-descent parser for tag queries, evaluating as it parses.
+
+        query  := term ("|" term)*
+        term   := factor ("&" factor)*
+        factor := "!" factor | "(" query ")" | TAG
+    """
+
+    def __init__(self, index, tokens):
+        self.index = index
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def advance(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        bitset = self.query()
+        if self.peek() is not None:
+            raise TagQueryError("Unexpected {!r} in tag query.".format(self.describe(self.peek())))
+        return bitset
+
+    def query(self):
+        bitset = self.term()
+        while self.peek() == "|":
+            self.advance()
+            bitset |= self.term()
+        return bitset
+
+    def term(self):
+        bitset = self.factor()
+        while self.peek() == "&":
+            self.advance()
+            bitset &= self.factor()
+        return bitset
+
+    def factor(self):
+        token = self.advance()
+
+        if token == "!":
+            return self.index.all & ~self.factor()
+        if token == "(":
+            bitset = self.query()
+            if self.advance() != ")":
+                raise TagQueryError("Missing ) in tag query.")
+            return bitset
+        if isinstance(token, tuple):
+            return self.index.tag(token[1])
+        if token is None:
+            raise TagQueryError("Tag query ends early.")
+
+        raise TagQueryError("Unexpected {!r} in tag query.".format(token))
+
+    def describe(self, token):
+        return token[1] if isinstance(token, tuple) else token
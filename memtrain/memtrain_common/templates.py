@@ -0,0 +1,53 @@
+import re
+
+# A blank in a cue: {{}}, or a numbered blank such as {{2}} that marks where
+# the response with that placement goes.
+BLANK_PATTERN = re.compile(r"\{\{(\d*)\}\}")
+
+# How blanks are rendered. The blank for the response being asked is numbered.
+BLANK = "_" * 9
+NUMBERED_BLANK = "___({})___"
+
+
+class CueTemplate:
+    """
+    A cue split once into literal text and blank slots.
+
+    Rendering for a placement fills the blanks numbered with that placement
+    and joins the parts. A cue may have any number of numbered blanks.
+    """
+
+    __slots__ = ("parts", "slots", "text")
+
+    def __init__(self, cue):
+        # split() with a group alternates literal text and blank numbers.
+        pieces = BLANK_PATTERN.split(cue)
+        self.parts = [BLANK if index % 2 else piece for index, piece in enumerate(pieces)]
+
+        # The part positions of each numbered blank
+        self.slots = {}
+        for index in range(1, len(pieces), 2):
+            if pieces[index]:
+                self.slots.setdefault(int(pieces[index]), []).append(index)
+
+        # The cue rendered for a placement with no numbered blank
+        self.text = "".join(self.parts)
+
+    def render(self, placement):
+        """Return the cue with its blanks filled for the response at placement."""
+        positions = self.slots.get(placement)
+        if not positions:
+            return self.text
+
+        parts = list(self.parts)
+        for position in positions:
+            parts[position] = NUMBERED_BLANK.format(placement)
+        return "".join(parts)
+
+
+class CueTemplates(dict):
+    """Compiled cue templates by cue text, compiled the first time each cue is rendered."""
+
+    def __missing__(self, cue):
+        template = self[cue] = CueTemplate(cue)
+        return template
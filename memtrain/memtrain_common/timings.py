@@ -0,0 +1,133 @@
+import math
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+TIMINGS_FORMATS = ["table", "json"]
+
+
+class TimingsError(Exception):
+    """Raised when an unsupported timings format is requested."""
+
+
+def percentile(sorted_values, pct):
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+
+    if lower == upper:
+        return sorted_values[lower]
+
+    weight = rank - lower
+    return sorted_values[lower] * (1 - weight) + sorted_values[upper] * weight
+
+
+class Timings:
+    """Collect monotonic-clock spans for named phases."""
+
+    def __init__(self):
+        # Phase name to the list of its span durations in seconds, in the
+        # order phases were first seen.
+        self.spans: dict[str, list[float]] = {}
+        # Details of the run that the spans were measured on, such as its
+        # random seed, reported alongside them.
+        self.context: dict[str, object] = {}
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.spans.setdefault(name, []).append(seconds)
+
+    def last(self, name):
+        """Return the most recent duration recorded for name."""
+        return self.spans[name][-1]
+
+    def summary(self):
+        """Return count, total, mean, p50, p95, and max seconds per phase."""
+        out = {}
+
+        for name, values in self.spans.items():
+            ordered = sorted(values)
+            total = sum(ordered)
+            out[name] = {
+                "count": len(ordered),
+                "total": total,
+                "mean": total / len(ordered),
+                "p50": percentile(ordered, 50),
+                "p95": percentile(ordered, 95),
+                "max": ordered[-1],
+            }
+
+        return out
+
+    def format_table(self):
+        lines = ["{}: {}".format(name, value) for name, value in self.context.items()]
+        lines += [
+            "{:<20}{:>8}{:>12}{:>10}{:>10}{:>10}{:>10}".format(
+                "Phase", "Count", "Total ms", "Mean ms", "p50 ms", "p95 ms", "Max ms"
+            )
+        ]
+
+        for name, stats in self.summary().items():
+            lines.append(
+                "{:<20}{:>8}{:>12.3f}{:>10.3f}{:>10.3f}{:>10.3f}{:>10.3f}".format(
+                    name,
+                    stats["count"],
+                    stats["total"] * 1000,
+                    stats["mean"] * 1000,
+                    stats["p50"] * 1000,
+                    stats["p95"] * 1000,
+                    stats["max"] * 1000,
+                )
+            )
+
+        return "\n".join(lines)
+
+    def format_json(self):
+        import json
+
+        return json.dumps({**self.context, "timings": self.summary()})
+
+
+def get_timings_format(requested=None):
+    """
+    Return the timings output format from an explicit request or the
+    MEMTRAIN_TIMINGS environment variable, or None when timings are off.
+    """
+    value = requested or os.environ.get("MEMTRAIN_TIMINGS")
+
+    if not value:
+        return None
+
+    value = value.lower()
+    if value in ("1", "true", "yes"):
+        return "table"
+    if value not in TIMINGS_FORMATS:
+        raise TimingsError(
+            "'{}': Invalid timings format. Use one of: {}.".format(
+                value, ", ".join(TIMINGS_FORMATS)
+            )
+        )
+
+    return value
+
+
+def emit_timings(timings, output_format, stream=None):
+    """Write timings to stream (stderr by default) in the given format."""
+    stream = stream or sys.stderr
+
+    if output_format == "json":
+        print(timings.format_json(), file=stream)
+    else:
+        print(timings.format_table(), file=stream)
@@ -1,3 +1,4 @@
+import sys
 import time
 import tkinter as tk
 import tkinter.filedialog as tk_filedialog
@@ -8,13 +9,18 @@ from functools import partial
 from statistics import mean
 
 from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.profiling import SessionProfiler
 from memtrain.memtrain_common.question import Question
+from memtrain.memtrain_common.timings import emit_timings, get_timings_format
 
 
 class MemtrainGUI:
     """Tk GUI for memtrain."""
 
-    def __init__(self):
+    def __init__(self, profiler=None, learner=None):
+        self.profiler = profiler or SessionProfiler()
+        self.learner = learner
+
         self.root = tk.Tk()
         self.root.title("memtrain v0.4.2")
         self.root.minsize(720, 420)
@@ -24,6 +30,7 @@ class MemtrainGUI:
         self.nquestions = ""
         self.tags = ""
         self.not_tags = ""
+        self.engine = None
         self.current_item = None
 
         self.start_time = None
@@ -250,12 +257,34 @@ class MemtrainGUI:
             return False
 
     def initialize_engine_and_core_objects(self):
-        self.engine = Engine(self.filename, self.level, self.nquestions, self.tags, self.not_tags)
-        self.settings = self.engine.settings
-        self.database = self.engine.database
-        self.mtstatistics = self.engine.mtstatistics
-        self.cr_id_pairs = self.engine.cr_id_pairs
-        self.question = Question(self.settings, self.database)
+        with self.profiler.phase("load"):
+            # A study set that is already loaded is brought up to date with
+            # its CSV file rather than loaded again.
+            deck = None
+            if self.engine is not None and self.engine.csvfile == self.filename:
+                deck = self.engine.deck
+                deck.reload()
+
+            self.engine = Engine(
+                self.filename,
+                self.level,
+                self.nquestions,
+                self.tags,
+                self.not_tags,
+                deck=deck,
+                learner_id=self.learner,
+            )
+            self.settings = self.engine.settings
+            self.database = self.engine.database
+            self.mtstatistics = self.engine.mtstatistics
+            self.cr_id_pairs = self.engine.cr_id_pairs
+            self.question = Question(
+                self.settings,
+                self.database,
+                self.engine.deck.cue_templates,
+                self.engine.deck.distractors,
+                self.engine.rng,
+            )
 
     def select_csv(self):
         self.filename = tk_filedialog.askopenfilename(
@@ -443,6 +472,8 @@ class MemtrainGUI:
                 self.hint_frame.grid_remove()
 
     def render_question(self):
+        self.profiler.start_phase("questions")
+        render_start = time.perf_counter()
         question_index = self.mtstatistics.response_number - 1
 
         self.current_item = self.engine.current_item(question_index)
@@ -498,9 +529,13 @@ class MemtrainGUI:
 
             self.mchoice_buttons["a"].focus_set()
 
+        self.engine.timings.add("render", time.perf_counter() - render_start)
+        self.profiler.stop_phase("questions")
         self.start_time = time.time()
 
     def submit(self, event=None, mchoice_letter=None):
+        self.profiler.start_phase("questions")
+
         if self.settings.level == "1":
             self.question.user_input = mchoice_letter
         else:
@@ -516,10 +551,12 @@ class MemtrainGUI:
             elapsed_time = self.end_time - self.start_time
             self.mtstatistics.times.append(elapsed_time)
 
-            self.question.grade_input()
-            self.engine.record_result(
-                self.current_item, self.mtstatistics.is_input_correct, elapsed_time
-            )
+            with self.engine.timings.span("grade"):
+                self.question.grade_input()
+            with self.engine.timings.span("persist"):
+                self.engine.record_result(
+                    self.current_item, self.mtstatistics.is_input_correct, elapsed_time
+                )
             self.question.finalize()
 
             self.feedback_label.configure(text=self.question.correctness_str)
@@ -534,12 +571,25 @@ class MemtrainGUI:
                 parent=self.training_window,
             )
 
+        # Edits to the CSV file are picked up between questions.
+        if self.engine.sync(self.mtstatistics.response_number - 1):
+            self.database = self.engine.database
+            self.question = Question(
+                self.settings,
+                self.database,
+                self.engine.deck.cue_templates,
+                self.engine.deck.distractors,
+                self.engine.rng,
+            )
+
         if not self.mtstatistics.is_last_question():
             if self.settings.level != "1":
                 self.response_clear()
             self.render_question()
+            self.profiler.stop_phase("questions")
             return
 
+        self.profiler.stop_phase("questions")
         self.training_window.destroy()
 
         result = "Correct: {}/{} ({:.1f}%)\n".format(
@@ -548,13 +598,17 @@ class MemtrainGUI:
             round(self.mtstatistics.percentage, 1),
         )
         result += "Average response time: {} seconds".format(
-            timedelta(seconds=mean(self.mtstatistics.times))
+            timedelta(seconds=mean(self.mtstatistics.times or [0]))
         )
 
         if self.mtstatistics.number_incorrect > 0:
             result += "\nResponses for which answers were incorrect: "
             result += self.mtstatistics.incorrect_responses_as_string()
 
+        timings_format = get_timings_format()
+        if timings_format:
+            emit_timings(self.engine.timings, timings_format)
+
         tk_messagebox.showinfo("Training session complete", result, parent=self.root)
 
         if self.level == "1":
@@ -570,9 +624,20 @@ class MemtrainGUI:
         self.root.mainloop()
 
 
-def main():
-    mtgui = MemtrainGUI()
-    mtgui.tk_mainloop()
+def run(args):
+    profiler = SessionProfiler(args.profile, args.memprofile)
+    mtgui = MemtrainGUI(profiler, args.learner)
+    try:
+        mtgui.tk_mainloop()
+    finally:
+        for path in profiler.write():
+            print("Wrote profile: " + path, file=sys.stderr)
+
+
+def main(argv=None):
+    from memtrain.gui import build_parser
+
+    run(build_parser().parse_args(argv))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+import io
+import json
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_cli import grade
+from memtrain.memtrain_common.batchgrade import (
+    CHUNK_SIZE,
+    AnswerFormatError,
+    BatchGrader,
+    read_answers,
+)
+from memtrain.memtrain_common.deck import Deck
+
+
+class BatchGraderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = self.workspace / "animals.csv"
+        self.csv_path.write_text(
+            textwrap.dedent(
+                """
+                Animals
+                Cue,Response,Synonym
+                {{}} make milk.,Cows,cattle
+                You can ride on a {{}}.,horse,pony
+                {{}} purr.,Cats,
+                This is a large carnivore often seen in zoos.,elephants,
+                """
+            ).lstrip(),
+            encoding="utf-8",
+        )
+        self.item_ids = {item.response: item.item_id for item in Deck(str(self.csv_path)).all_items}
+
+    def open_grader(self, **kwargs):
+        grader = BatchGrader(str(self.csv_path), **kwargs)
+        self.addCleanup(grader.close)
+        return grader
+
+    def answers(self, *pairs, learner=None):
+        lines = []
+        for response, answer in pairs:
+            record = {"item_id": self.item_ids.get(response, response), "answer": answer}
+            if learner:
+                record["learner"] = learner
+            lines.append(json.dumps(record))
+        return read_answers(io.StringIO("\n".join(lines) + "\n"), "jsonl")
+
+    def test_grades_answers_and_unknown_items(self):
+        grader = self.open_grader(workers=1, max_edits=2)
+        results = list(
+            grader.grade(
+                self.answers(
+                    ("Cows", "cattle"),
+                    ("horse", "zebra"),
+                    ("elephants", "elephnats"),
+                    ("Cats", "Cots"),
+                    ("missing", "anything"),
+                )
+            )
+        )
+
+        self.assertEqual(
+            [(result.get("correct"), result.get("match")) for result in results],
+            [(True, "exact"), (False, None), (True, "near"), (False, None), (None, None)],
+        )
+        self.assertEqual(results[2]["response"], "elephants")
+        self.assertEqual(results[4]["error"], "Unknown item")
+
+        missing = '{{"item_id": "{}"}}\n'.format(self.item_ids["Cows"])
+        result = next(grader.grade(read_answers(io.StringIO(missing), "jsonl")))
+        self.assertEqual(result["error"], "Missing answer")
+        self.assertNotIn("correct", result)
+        self.assertEqual([result["line"] for result in results], [1, 2, 3, 4, 5])
+
+    def test_json_numbers_are_graded_and_recorded_as_text(self):
+        csv_path = self.workspace / "numbers.csv"
+        csv_path.write_text("Numbers\nCue,Response,Id\nZero is {{}}.,0,7\n", encoding="utf-8")
+        grader = BatchGrader(str(csv_path), workers=1)
+        self.addCleanup(grader.close)
+
+        sheet = '{"item_id": 7, "answer": 0, "learner": 12}\n'
+        results = list(grader.grade(read_answers(io.StringIO(sheet), "jsonl")))
+
+        self.assertEqual(results[0]["item_id"], "7")
+        self.assertEqual(results[0]["learner"], "12")
+        self.assertTrue(results[0]["correct"])
+        self.assertEqual(grader.apply(results), 1)
+        progress = grader.engine.progress_store.get_progress_map(
+            grader.engine.study_set_id, ["7"], "12"
+        )
+        self.assertEqual(progress["7"].reviews, 1)
+
+    def test_reads_csv_answer_sheets(self):
+        sheet = "item_id,answer,learner,elapsed\n{},Cows,ana,2.5\n{},mare,,\n".format(
+            self.item_ids["Cows"], self.item_ids["horse"]
+        )
+        results = list(self.open_grader(workers=1).grade(read_answers(io.StringIO(sheet), "csv")))
+
+        self.assertEqual([result["correct"] for result in results], [True, False])
+        self.assertEqual([result["learner"] for result in results], ["ana", "default"])
+        self.assertEqual(results[0]["elapsed"], 2.5)
+        self.assertEqual([result["line"] for result in results], [2, 3])
+
+        with self.assertRaises(AnswerFormatError):
+            list(read_answers(io.StringIO("id,response\n"), "csv"))
+
+    def test_worker_pool_grades_in_order(self):
+        pairs = [("Cows", "cows"), ("horse", "donkey"), ("Cats", "cats")] * CHUNK_SIZE
+        expected = [
+            result["correct"] for result in self.open_grader(workers=1).grade(self.answers(*pairs))
+        ]
+        grader = self.open_grader(workers=2)
+        results = list(grader.grade(self.answers(*pairs)))
+
+        self.assertEqual([result["correct"] for result in results], expected)
+        self.assertEqual(len(results), len(pairs))
+
+        # The progress store is closed across the fork and reopened for apply.
+        self.assertEqual(grader.apply(results[:1]), 1)
+
+    def test_apply_records_reviews_in_one_pass(self):
+        grader = self.open_grader(workers=1)
+        results = list(
+            grader.grade(
+                self.answers(("Cows", "cows"), ("Cows", "cows"), ("horse", "mule"), learner="ana")
+            )
+        )
+
+        self.assertEqual(grader.apply(results), 3)
+        progress = grader.engine.progress_store.get_progress_map(
+            grader.engine.study_set_id, list(self.item_ids.values()), "ana"
+        )
+        self.assertEqual(progress[self.item_ids["Cows"]].reviews, 2)
+        self.assertEqual(progress[self.item_ids["Cows"]].current_stage, 1)
+        self.assertEqual(progress[self.item_ids["horse"]].failure_count, 1)
+        self.assertNotIn(self.item_ids["Cats"], progress)
+
+    def test_command_writes_results_and_summary(self):
+        answers_path = self.workspace / "answers.jsonl"
+        answers_path.write_text(
+            "".join(
+                json.dumps({"item_id": self.item_ids[response], "answer": answer}) + "\n"
+                for response, answer in (("Cows", "cows"), ("horse", "hrose"), ("Cats", "dogs"))
+            ),
+            encoding="utf-8",
+        )
+        output_path = self.workspace / "results.jsonl"
+
+        grade.main(
+            [
+                "--fuzzy",
+                "1",
+                "--apply",
+                "-o",
+                str(output_path),
+                str(self.csv_path),
+                str(answers_path),
+            ]
+        )
+
+        lines = [json.loads(line) for line in output_path.read_text().splitlines()]
+        self.assertEqual([line["type"] for line in lines], ["answer"] * 3 + ["summary"])
+        self.assertEqual(
+            lines[-1],
+            {"type": "summary", "answers": 3, "correct": 2, "near": 1, "errors": 0, "applied": 3},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
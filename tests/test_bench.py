@@ -0,0 +1,54 @@
+import tempfile
+import unittest
+
+from memtrain.memtrain_common.bench import (
+    PHASES,
+    LearnerConfig,
+    SyntheticDeckConfig,
+    percentile,
+    run_benchmark,
+)
+
+
+class BenchmarkHarnessTestCase(unittest.TestCase):
+    def test_percentile_interpolates(self):
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+
+        self.assertEqual(percentile(values, 50), 3.0)
+        self.assertEqual(percentile(values, 100), 5.0)
+        self.assertAlmostEqual(percentile(values, 95), 4.8)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_simulated_sessions_record_every_phase(self):
+        deck_config = SyntheticDeckConfig(items=12, tags=3, mtags=2, synonyms=2, seed=7)
+        learner_config = LearnerConfig(accuracy=1.0, level_penalty=0.0)
+
+        with tempfile.TemporaryDirectory() as workdir:
+            result = run_benchmark(
+                workdir, deck_config, learner_config, learners=2, sessions=2, nquestions=5
+            )
+
+        self.assertEqual(result.sessions, 4)
+        self.assertEqual(result.questions, 20)
+        self.assertEqual(result.correct, 20)
+
+        summary = result.summary()
+        self.assertEqual(set(summary), set(PHASES))
+        self.assertEqual(summary["engine"]["count"], 4)
+        self.assertEqual(summary["record_result"]["count"], 20)
+
+    def test_seeded_runs_repeat(self):
+        deck_config = SyntheticDeckConfig(items=12, tags=3, mtags=2, synonyms=2, seed=11)
+        learner_config = LearnerConfig(accuracy=0.6)
+
+        def run():
+            with tempfile.TemporaryDirectory() as workdir:
+                result = run_benchmark(workdir, deck_config, learner_config, sessions=4)
+            return result.seed, result.questions, result.correct
+
+        self.assertEqual(run(), run())
+        self.assertEqual(run()[0], 11)
+
+
+if __name__ == "__main__":
+    unittest.main()
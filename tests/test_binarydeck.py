@@ -0,0 +1,155 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.binarydeck import MappedDeck, compile_deck, compiled_path
+from memtrain.memtrain_common.database import RESPONSE_VALUES
+from memtrain.memtrain_common.deck import Deck, DeckCache, open_deck
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.session import StudySession
+
+STUDY_SET = """
+Animals
+Cue,Response,Synonym,Hint,Tag,Tag,MTag
+{{}} make milk.,Cows,cattle,Farm animal,Ungulates,Farm,mammals
+You can ride on a {{}}.,horse,pony;steed,,Ungulates,Farm,mammals
+"{{}} are smaller than lions, {{}}.",Cats,kitties,Pet,Felidae,Farm,mammals
+This is a large carnivore often seen in zoos.,Lion,,Big cat,Felidae,Wild,mammals
+{{}} lay eggs in the zoo.,Hens,chickens,,Birds,Farm,birds
+Straußen sind {{}}.,Vögel,,,Birds,Wild,birds
+"""
+
+
+def item_tuples(items):
+    return [
+        (item.item_id, item.cue, item.response, item.cue_id, item.response_id, item.placement)
+        for item in items
+    ]
+
+
+class BinaryDeckTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "animals.csv"
+        self.write(STUDY_SET)
+        self.deck = Deck(str(self.csv_path))
+        self.path = compile_deck(self.deck)
+        self.mapped = MappedDeck(self.path, str(self.csv_path))
+
+    def write(self, text):
+        self.csv_path.write_text(textwrap.dedent(text).lstrip(), encoding="utf-8")
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_mtime_ns + 10**9, stat.st_mtime_ns + 10**9))
+
+    def test_compiled_path(self):
+        self.assertEqual(compiled_path("sets/animals.csv"), "sets/animals.mtdeck")
+        self.assertEqual(self.path, str(self.csv_path.with_suffix(".mtdeck")))
+
+    def test_items_and_settings_match_the_csv(self):
+        self.assertEqual(item_tuples(self.mapped.all_items), item_tuples(self.deck.all_items))
+        self.assertEqual(
+            item_tuples(self.mapped.all_items[-2:]), item_tuples(self.deck.all_items[-2:])
+        )
+        self.assertEqual(self.mapped.settings.settings, self.deck.settings.settings)
+        self.assertEqual(self.mapped.indices, self.deck.indices)
+        self.assertFalse(self.mapped.is_stale())
+        with self.assertRaises(IndexError):
+            self.mapped.all_items[len(self.deck.all_items)]
+
+    def test_lookups_match_the_study_set_database(self):
+        expected, actual = self.deck.database, self.mapped.database
+        self.assertEqual(actual.get_all_responses(), expected.get_all_responses())
+
+        for item in self.deck.all_items:
+            self.assertEqual(actual.get_value("cue", item.cue_id), item.cue)
+            self.assertEqual(
+                actual.get_placement(item.cue_id, item.response_id),
+                expected.get_placement(item.cue_id, item.response_id),
+            )
+            for value in RESPONSE_VALUES:
+                self.assertEqual(
+                    actual.get_response_values(value, item.response_id),
+                    expected.get_response_values(value, item.response_id),
+                )
+
+        for mtag in ("mammals", "birds", "fish"):
+            self.assertEqual(
+                actual.get_responses_by_mtag(mtag), expected.get_responses_by_mtag(mtag)
+            )
+
+    def test_missing_pairs_raise_key_error(self):
+        database = self.mapped.database
+        last = max((item.cue_id, item.response_id) for item in self.deck.all_items)
+
+        for cue_id, response_id in [(last[0] + 1, 0), (last[0], last[1] + 1), (-1, -1)]:
+            with self.assertRaises(KeyError):
+                database.get_placement(cue_id, response_id)
+
+    def test_tag_queries_use_the_stored_bitsets(self):
+        for query in ("Farm", "Felidae | Birds", "Farm & !Ungulates", "Unknown"):
+            self.assertEqual(
+                item_tuples(self.mapped.tag_index.select(self.mapped.all_items, query)),
+                item_tuples(self.deck.tag_index.select(self.deck.all_items, query)),
+            )
+
+    def test_search_matches_substrings(self):
+        self.assertEqual([item.response for item in self.mapped.search("zoo")], ["Lion", "Hens"])
+        self.assertEqual([item.response for item in self.mapped.search("EGGS zoo")], ["Hens"])
+        self.assertEqual([item.response for item in self.mapped.search("vögel")], ["Vögel"])
+        self.assertEqual(self.mapped.search(""), [])
+
+    def test_sessions_run_from_the_mapping(self):
+        engine = Engine(str(self.csv_path), "1", None, "Felidae", None, deck=self.mapped)
+        self.addCleanup(engine.close)
+        session = StudySession(engine)
+
+        question = session.current()
+        self.assertEqual(question["total"], 2)
+        self.assertIn(
+            question["cue"],
+            [
+                "_________ are smaller than lions, _________.",
+                "This is a large carnivore often seen in zoos.",
+            ],
+        )
+        self.assertEqual(len(question["choices"]), 4)
+
+        item = session.current_item
+        result = session.answer(
+            next(
+                letter for letter, choice in question["choices"].items() if choice == item.response
+            )
+        )
+        self.assertTrue(result["correct"])
+
+    def test_open_deck_uses_up_to_date_compiled_decks(self):
+        self.assertIsInstance(open_deck(str(self.csv_path)), MappedDeck)
+        self.assertIsInstance(DeckCache().get(str(self.csv_path)), MappedDeck)
+
+        self.write(STUDY_SET.replace("Cows", "Goats"))
+        deck = open_deck(str(self.csv_path))
+        self.assertNotIsInstance(deck, MappedDeck)
+        self.assertIn("Goats", [item.response for item in deck.all_items])
+
+        Path(self.path).write_bytes(b"not a deck")
+        self.assertNotIsInstance(open_deck(str(self.csv_path)), MappedDeck)
+
+    def test_reload_compiles_the_edited_csv(self):
+        self.write(STUDY_SET.replace("Cows", "Goats"))
+        self.assertTrue(self.mapped.reload())
+
+        self.assertEqual(self.mapped.version, 1)
+        self.assertIn("Goats", [item.response for item in self.mapped.all_items])
+        self.assertFalse(self.mapped.reload())
+        self.assertIsInstance(open_deck(str(self.csv_path)), MappedDeck)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.check import check_study_set, check_study_sets
+from memtrain.memtrain_common.deck import Deck
+
+
+class CheckTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+
+    def write_csv(self, name, content):
+        csv_path = self.workspace / name
+        csv_path.write_text(textwrap.dedent(content).lstrip(), encoding="utf-8")
+        return str(csv_path)
+
+    def codes(self, csvfile):
+        return [(problem.line, problem.code) for problem in check_study_set(csvfile)]
+
+    def test_valid_study_set_has_no_problems(self):
+        csv_path = self.write_csv(
+            "animals.csv",
+            """
+            Animals
+            "Settings: !level3, nquestions=10"
+            Cue,Response,Hint,Tag
+            {{}} make milk.,Cows,Mooo,Ungulates
+            You can ride on a {{}}.,horse,Neigh,Ungulates
+            """,
+        )
+
+        self.assertEqual(self.codes(csv_path), [])
+        Deck(csv_path)
+
+    def test_row_problems_are_reported_with_line_numbers(self):
+        csv_path = self.write_csv(
+            "animals.csv",
+            """
+            Animals
+            Cue,Response,Response2,Id,Id2
+            {{}} make milk.,Cows,,cows,
+            {{}} make milk.,Goats,,goats,
+            You can ride on a {{}}.,horse,pony,cows,
+            ,Lion,,lion,
+            Too short,Fish
+
+            Nothing to answer,,,,
+            """,
+        )
+
+        self.assertEqual(
+            self.codes(csv_path),
+            [
+                (4, "duplicate-cue"),
+                (5, "duplicate-id"),
+                (6, "empty-cue"),
+                (7, "short-row"),
+                (8, "short-row"),
+                (9, "no-response"),
+            ],
+        )
+
+    def test_structure_problems(self):
+        bad_setting = self.write_csv(
+            "bad_setting.csv",
+            """
+            Animals
+            Settings: level9=true
+            Cue,Response
+            {{}} make milk.,Cows
+            """,
+        )
+        no_response = self.write_csv(
+            "no_response.csv",
+            """
+            Animals
+            Cue,Answer
+            {{}} make milk.,Cows
+            """,
+        )
+        duplicate_item = self.write_csv(
+            "duplicate_item.csv",
+            """
+            Animals
+            Cue,Response
+            {{}} make milk.,Cows
+            {{}} make milk.,Cows
+            """,
+        )
+
+        self.assertEqual(self.codes(bad_setting), [(2, "invalid-setting")])
+        self.assertEqual(self.codes(no_response), [(2, "missing-column")])
+        self.assertEqual(self.codes(duplicate_item), [(4, "duplicate-cue"), (4, "duplicate-item")])
+        self.assertEqual(self.codes(str(self.workspace / "missing.csv")), [(0, "unreadable")])
+
+    def test_study_sets_are_checked_in_a_worker_pool(self):
+        valid = """
+            Animals
+            Cue,Response
+            {{}} make milk.,Cows
+            """
+        csvfiles = [self.write_csv("deck{}.csv".format(n), valid) for n in range(40)]
+        csvfiles[7] = self.write_csv("deck7.csv", "Animals\nCue\n")
+
+        results = list(check_study_sets(csvfiles, workers=2))
+
+        self.assertEqual([csvfile for csvfile, _ in results], csvfiles)
+        self.assertEqual([csvfile for csvfile, problems in results if problems], [csvfiles[7]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import json
+import os
+import tempfile
+import textwrap
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from memtrain.memtrain_cli.__main__ import main
+
+
+class ScriptedSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        self.progress_db = self.workspace / "progress.sqlite3"
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.progress_db)
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = self.workspace / "animals.csv"
+        self.csv_path.write_text(
+            textwrap.dedent(
+                """
+                Animals
+                Cue,Response,Hint,Tag,Id
+                {{}} make milk.,Cows,Mooo,Ungulates,cows-1
+                You can ride on a {{}}.,horse,Neigh,Ungulates,horse-1
+                """
+            ).lstrip(),
+            encoding="utf-8",
+        )
+
+    def run_cli(self, argv):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            main(argv)
+        return [json.loads(line) for line in stdout.getvalue().splitlines()]
+
+    def test_scripted_session_prints_json_records(self):
+        answers = self.workspace / "answers.txt"
+        answers.write_text("\nhorse\nhorse\n", encoding="utf-8")
+
+        records = self.run_cli(["--answers", str(answers), "-l", "3", str(self.csv_path)])
+
+        questions = [record for record in records if record["type"] == "question"]
+        self.assertEqual(len(questions), 2)
+        self.assertEqual(sorted(record["item_id"] for record in questions), ["cows-1", "horse-1"])
+        self.assertEqual([record["response_number"] for record in questions], [1, 2])
+        self.assertTrue(all(record["grading_latency"] >= 0 for record in questions))
+
+        summary = records[-1]
+        self.assertEqual(summary["type"], "summary")
+        self.assertEqual(summary["answered"], 2)
+        self.assertEqual(summary["correct"], 1)
+
+    def test_scripted_session_stops_when_answers_run_out(self):
+        answers = self.workspace / "answers.txt"
+        answers.write_text("horse\n", encoding="utf-8")
+
+        records = self.run_cli(["--answers", str(answers), "-l", "3", str(self.csv_path)])
+
+        self.assertEqual(records[-1]["answered"], 1)
+        self.assertEqual(records[-1]["total"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
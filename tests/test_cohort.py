@@ -0,0 +1,83 @@
+import io
+import json
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.cohort import CHUNK_SIZE, CohortPlanner, write_plans
+from memtrain.memtrain_common.engine import Engine
+
+
+class CohortPlannerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = self.workspace / "animals.csv"
+        self.csv_path.write_text(
+            textwrap.dedent(
+                """
+                Animals
+                Cue,Response,Hint,Tag
+                {{}} make milk.,Cows,Mooo,Ungulates
+                You can ride on a {{}}.,horse,Neigh,Ungulates
+                "{{}} are smaller than lions.",Cats,Meow,Felidae
+                This is a large carnivore often seen in zoos.,Lion,Roar,Felidae
+                """
+            ).lstrip(),
+            encoding="utf-8",
+        )
+
+    def open_planner(self, **kwargs):
+        planner = CohortPlanner(str(self.csv_path), **kwargs)
+        self.addCleanup(planner.close)
+        return planner
+
+    def test_plans_follow_each_learners_progress(self):
+        engine = Engine(str(self.csv_path), None, None, None, None, learner_id="ana")
+        item = engine.session_items[0]
+        engine.record_result(item, False, 1.0)
+        engine.progress_store.close()
+
+        planner = self.open_planner(workers=1)
+        plans = {plan["learner"]: plan for plan in planner.plan(["ana", "ben"])}
+
+        ana_stages = {entry["item_id"]: entry["stage"] for entry in plans["ana"]["items"]}
+        self.assertEqual(planner.learner_ids(), ["ana"])
+        self.assertEqual(len(plans["ben"]["items"]), 4)
+        self.assertIn(item.item_id, ana_stages)
+        self.assertTrue(all(entry["stage"] == "New" for entry in plans["ben"]["items"]))
+
+    def test_worker_pool_plans_every_learner_in_order(self):
+        planner = self.open_planner(workers=2, tags="Felidae")
+        learner_ids = ["learner-{}".format(number) for number in range(CHUNK_SIZE * 2 + 1)]
+
+        out = io.StringIO()
+        count = write_plans(planner.plan(learner_ids), out)
+        plans = [json.loads(line) for line in out.getvalue().splitlines()]
+
+        self.assertEqual(count, len(learner_ids))
+        self.assertEqual([plan["learner"] for plan in plans], learner_ids)
+        for plan in plans:
+            self.assertEqual(sorted(entry["response"] for entry in plan["items"]), ["Cats", "Lion"])
+
+        # The parent's progress store is closed across the fork and reopened.
+        self.assertEqual(planner.learner_ids(), [])
+
+    def test_seeded_plans_repeat_across_workers(self):
+        learner_ids = ["learner-{}".format(number) for number in range(CHUNK_SIZE + 1)]
+        plans = list(self.open_planner(workers=1, seed=3).plan(learner_ids))
+        pooled = list(self.open_planner(workers=2, seed=3).plan(learner_ids))
+
+        self.assertEqual(plans, pooled)
+        self.assertEqual({plan["seed"] for plan in plans}, {3})
+        self.assertNotEqual(plans, list(self.open_planner(workers=1, seed=4).plan(learner_ids)))
+
+
+if __name__ == "__main__":
+    unittest.main()
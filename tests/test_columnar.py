@@ -0,0 +1,135 @@
+import os
+import sqlite3
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.columnar import ColumnarDatabase, ColumnarDeck
+from memtrain.memtrain_common.database import RESPONSE_VALUES
+from memtrain.memtrain_common.deck import CSVError, Deck, open_deck
+from memtrain.memtrain_common.engine import Engine
+
+STUDY_SET = """
+Animals
+Cue,Response,Synonym,Hint,Tag,Tag,MTag
+{{}} make milk.,Cows,cattle,Farm animal,Ungulates,Farm,mammals
+You can ride on a {{}}.,horse,pony;steed,,Ungulates,Farm,mammals
+"{{}} are smaller than lions, {{}}.",Cats,kitties,Pet,Felidae,Farm,mammals
+This is a large carnivore often seen in zoos.,Lion,,Big cat,Felidae,Wild,mammals
+{{}} lay eggs in the zoo.,Hens,chickens,,Birds,Farm,birds
+"""
+
+
+def contents(deck):
+    """A deck's items and lookups by value, independent of IDs."""
+    database = deck.database
+    out = {
+        "responses": sorted(database.get_all_responses()),
+        "tags": sorted(
+            (database.get_value("response", response_id), tag)
+            for response_id, tag in database.get_response_tags()
+        ),
+        # Edits relink responses at the end of their mtag lists, in either store.
+        "mtags": {
+            mtag: sorted(database.get_responses_by_mtag(mtag))
+            for mtag in ("mammals", "birds", "fish")
+        },
+        "items": [],
+    }
+    for item in deck.all_items:
+        out["items"].append(
+            (
+                item.item_id,
+                database.get_value("cue", item.cue_id),
+                database.get_value("response", item.response_id),
+                database.get_placement(item.cue_id, item.response_id),
+                [
+                    database.get_response_values(value, item.response_id)
+                    for value in RESPONSE_VALUES
+                ],
+            )
+        )
+    return out
+
+
+class ColumnarDeckTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "animals.csv"
+        self.write(STUDY_SET)
+        self.deck = open_deck(str(self.csv_path), store="columns")
+
+    def write(self, text):
+        self.csv_path.write_text(textwrap.dedent(text).lstrip(), encoding="utf-8")
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_mtime_ns + 10**9, stat.st_mtime_ns + 10**9))
+
+    def test_lookups_match_sqlite(self):
+        self.assertIsInstance(self.deck.database, ColumnarDatabase)
+        expected = Deck(str(self.csv_path))
+        self.assertEqual(contents(self.deck), contents(expected))
+        self.assertEqual(
+            self.deck.database.get_responses_by_mtag("mammals"),
+            expected.database.get_responses_by_mtag("mammals"),
+        )
+        # IDs are numbered the same way too.
+        self.assertEqual(
+            [(item.cue_id, item.response_id) for item in self.deck.all_items],
+            [(item.cue_id, item.response_id) for item in expected.all_items],
+        )
+        self.assertEqual(
+            self.deck.database.get_all_response_ids_by_tag("Farm"),
+            expected.database.get_all_response_ids_by_tag("Farm"),
+        )
+
+    def test_duplicate_pairs_are_rejected(self):
+        database = ColumnarDatabase()
+        indices = {
+            "cue": [0],
+            "response": [1],
+            "synonym": [[]],
+            "hint": [[]],
+            "tag": [],
+            "mtag": [],
+        }
+        with self.assertRaises(sqlite3.IntegrityError):
+            database.populate(indices, [["{{}} moo.", "Cows"], ["{{}} moo.", "Cows"]])
+
+    def test_reload_matches_a_fresh_load(self):
+        self.write(
+            STUDY_SET.replace("Pet,Felidae", "Pet;house cat,Felidae")
+            .replace("{{}} lay eggs in the zoo.,Hens,chickens,,Birds,Farm,birds\n", "")
+            .replace("You can ride on a {{}}.,horse", "{{}} make milk.,horse")
+            + "{{}} bark.,Dogs,hounds,Pet,Canidae,Farm,mammals\n"
+        )
+        self.assertTrue(self.deck.reload())
+        self.assertEqual(contents(self.deck), contents(Deck(str(self.csv_path))))
+        self.assertNotIn("Hens", self.deck.database.get_all_responses())
+
+        self.write("Animals\nCue,Response\n{{}} make milk.,Cows\n{{}} make milk.,Cows\n")
+        with self.assertRaises(CSVError):
+            self.deck.reload()
+
+    def test_tags_and_search(self):
+        self.assertEqual(
+            [item.response for item in self.deck.tag_index.select(self.deck.all_items, "Felidae")],
+            ["Cats", "Lion"],
+        )
+        self.assertEqual([item.response for item in self.deck.search("ZOO")], ["Lion", "Hens"])
+        self.assertEqual([item.response for item in self.deck.search("zoo eggs")], ["Hens"])
+
+    def test_engine_sessions(self):
+        engine = Engine(str(self.csv_path), "2", None, None, None, deck_store="columns")
+        self.addCleanup(engine.close)
+        self.assertIsInstance(engine.deck, ColumnarDeck)
+        self.assertEqual(len(engine.session_items), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import tempfile
+import textwrap
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_cli import client
+from memtrain.memtrain_cli.daemon import DaemonServer, serve
+from memtrain.memtrain_common.deck import DeckCache
+
+STUDY_SET = """
+Animals
+Cue,Response,Hint,Tag,Id
+{{}} make milk.,Cows,Mooo,Ungulates,cows-1
+You can ride on a {{}}.,horse,Neigh,Ungulates,horse-1
+"""
+
+
+class DaemonTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = self.workspace / "animals.csv"
+        self.csv_path.write_text(textwrap.dedent(STUDY_SET).lstrip(), encoding="utf-8")
+
+        self.answers = self.workspace / "answers.txt"
+        self.answers.write_text("horse\nhorse\n", encoding="utf-8")
+
+    def start_server(self, cache):
+        socket_path = str(self.workspace / "daemon.sock")
+        server = DaemonServer(socket_path, cache)
+        thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05})
+        thread.start()
+
+        def stop():
+            server.shutdown()
+            thread.join()
+            server.server_close()
+
+        self.addCleanup(stop)
+        return socket_path
+
+    def run_session(self, socket_path, name):
+        output = self.workspace / name
+        with open(os.devnull) as stdin, open(output, "w") as stdout:
+            status = client.run(
+                ["--answers", str(self.answers), "-l", "3", str(self.csv_path)],
+                socket_path,
+                [stdin.fileno(), stdout.fileno(), stdout.fileno()],
+            )
+
+        records = [json.loads(line) for line in output.read_text().splitlines()]
+        return status, records
+
+    def test_sessions_reuse_cached_deck_until_csv_changes(self):
+        cache = DeckCache()
+        socket_path = self.start_server(cache)
+
+        status, records = self.run_session(socket_path, "first.jsonl")
+        self.assertEqual(status, 0)
+        self.assertEqual(records[-1]["type"], "summary")
+        self.assertEqual(records[-1]["answered"], 2)
+
+        status, records = self.run_session(socket_path, "second.jsonl")
+        self.assertEqual(status, 0)
+        self.assertEqual(records[-1]["correct"], 1)
+        self.assertEqual((cache.loads, cache.hits), (1, 1))
+
+        self.csv_path.write_text(
+            self.csv_path.read_text(encoding="utf-8") + "Dogs {{}}.,bark,,,dogs-1\n",
+            encoding="utf-8",
+        )
+        status, records = self.run_session(socket_path, "third.jsonl")
+        self.assertEqual(records[-1]["total"], 3)
+        self.assertEqual(cache.loads, 2)
+
+    def test_disk_store_sessions_open_their_own_deck(self):
+        cache = DeckCache()
+        socket_path = self.start_server(cache)
+
+        output = self.workspace / "disk.jsonl"
+        with open(os.devnull) as stdin, open(output, "w") as stdout:
+            status = client.run(
+                [
+                    "--deck-store",
+                    "disk",
+                    "--answers",
+                    str(self.answers),
+                    "-l",
+                    "3",
+                    str(self.csv_path),
+                ],
+                socket_path,
+                [stdin.fileno(), stdout.fileno(), stdout.fileno()],
+            )
+
+        self.assertEqual(status, 0)
+        self.assertEqual(cache.loads, 0)
+
+    def test_socket_directory_must_be_private(self):
+        shared = self.workspace / "shared"
+        shared.mkdir(mode=0o755)
+        shared.chmod(0o755)
+        socket_path = str(shared / "daemon.sock")
+
+        self.assertIsNone(client.run(["x.csv"], socket_path))
+        with self.assertRaises(SystemExit):
+            serve(socket_path, DeckCache())
+        self.assertFalse(os.path.exists(socket_path))
+
+    def test_unreachable_daemon_returns_none(self):
+        self.assertIsNone(client.run(["x.csv"], str(self.workspace / "missing.sock")))
+
+    def test_cache_evicts_least_recently_used_and_idle_decks(self):
+        other = self.workspace / "other.csv"
+        other.write_text(textwrap.dedent(STUDY_SET).lstrip(), encoding="utf-8")
+
+        cache = DeckCache(max_decks=1, idle_timeout=60)
+        cache.get(str(self.csv_path))
+        cache.get(str(other))
+        self.assertEqual(list(cache.decks), [(str(other), "memory")])
+
+        cache.idle_timeout = 0
+        time.sleep(0.01)
+        cache.evict_idle()
+        self.assertEqual(len(cache.decks), 0)
+
+        # Decks in use are kept past max_decks and the idle timeout.
+        in_use = (str(self.csv_path), "memory")
+        cache = DeckCache(max_decks=1, idle_timeout=0, in_use=in_use.__eq__)
+        cache.get(str(self.csv_path))
+        cache.get(str(other))
+        time.sleep(0.01)
+        cache.evict_idle()
+        self.assertEqual(list(cache.decks), [in_use])
+
+    def test_cache_keeps_one_deck_per_store(self):
+        cache = DeckCache()
+        memory_deck = cache.get(str(self.csv_path))
+        columns_deck = cache.get(str(self.csv_path), "columns")
+
+        self.assertIsNot(memory_deck, columns_deck)
+        self.assertIs(cache.get(str(self.csv_path), "memory"), memory_deck)
+        self.assertEqual((cache.loads, cache.hits), (2, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from memtrain.memtrain_common.database import RESPONSE_VALUES
+from memtrain.memtrain_common.deck import CSVError, Deck, get_deck_store, open_deck
+from memtrain.memtrain_common.diskdeck import DiskDeck, disk_path, write_disk_database
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.settings import SettingError
+
+STUDY_SET = """
+Animals
+Cue,Response,Synonym,Hint,Tag,Tag,MTag
+{{}} make milk.,Cows,cattle,Farm animal,Ungulates,Farm,mammals
+You can ride on a {{}}.,horse,pony;steed,,Ungulates,Farm,mammals
+"{{}} are smaller than lions, {{}}.",Cats,kitties,Pet,Felidae,Farm,mammals
+This is a large carnivore often seen in zoos.,Lion,,Big cat,Felidae,Wild,mammals
+{{}} lay eggs in the zoo.,Hens,chickens,,Birds,Farm,birds
+"""
+
+
+def item_tuples(items):
+    return [
+        (item.item_id, item.cue, item.response, item.cue_id, item.response_id, item.placement)
+        for item in items
+    ]
+
+
+class DiskDeckTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "animals.csv"
+        self.write(STUDY_SET)
+        self.deck = Deck(str(self.csv_path))
+        self.disk = open_deck(str(self.csv_path), store="disk")
+        self.addCleanup(self.disk.database.conn.close)
+
+    def write(self, text):
+        self.csv_path.write_text(textwrap.dedent(text).lstrip(), encoding="utf-8")
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_mtime_ns + 10**9, stat.st_mtime_ns + 10**9))
+
+    def test_deck_store_selection(self):
+        self.assertEqual(get_deck_store(), "memory")
+        self.assertEqual(get_deck_store("DISK"), "disk")
+        with mock.patch.dict(os.environ, {"MEMTRAIN_DECK_STORE": "disk"}):
+            self.assertEqual(get_deck_store(), "disk")
+            self.assertEqual(get_deck_store("memory"), "memory")
+        with self.assertRaises(SettingError):
+            get_deck_store("tape")
+
+    def test_items_and_lookups_match_the_csv(self):
+        self.assertIsInstance(self.disk, DiskDeck)
+        self.assertTrue(os.path.exists(disk_path(str(self.csv_path))))
+        self.assertEqual(item_tuples(self.disk.all_items), item_tuples(self.deck.all_items))
+        self.assertEqual(
+            item_tuples(self.disk.all_items[1:3]), item_tuples(self.deck.all_items[1:3])
+        )
+        self.assertEqual(self.disk.settings.settings, self.deck.settings.settings)
+
+        expected, actual = self.deck.database, self.disk.database
+        self.assertEqual(actual.get_all_responses(), expected.get_all_responses())
+        for item in self.deck.all_items:
+            for value in RESPONSE_VALUES:
+                self.assertEqual(
+                    actual.get_response_values(value, item.response_id),
+                    expected.get_response_values(value, item.response_id),
+                )
+        self.assertEqual(
+            actual.get_responses_by_mtag("mammals"), expected.get_responses_by_mtag("mammals")
+        )
+
+    def test_tags_and_search(self):
+        self.assertEqual(
+            item_tuples(self.disk.tag_index.select(self.disk.all_items, "Farm & !Ungulates")),
+            item_tuples(self.deck.tag_index.select(self.deck.all_items, "Farm & !Ungulates")),
+        )
+        self.assertEqual(
+            item_tuples(self.disk.search("zoo*")), item_tuples(self.deck.search("zoo*"))
+        )
+        self.assertEqual(self.disk.database.search_mode, self.deck.database.search_mode)
+
+    def test_database_file_is_read_only(self):
+        with self.assertRaises(sqlite3.DatabaseError):
+            self.disk.database.conn.execute("DELETE FROM cues")
+
+    def test_up_to_date_file_is_reused(self):
+        with mock.patch("memtrain.memtrain_common.diskdeck.write_disk_database") as write:
+            deck = open_deck(str(self.csv_path), store="disk")
+            self.addCleanup(deck.database.conn.close)
+        write.assert_not_called()
+        self.assertIsInstance(deck, DiskDeck)
+
+    def test_edited_csv_is_written_again(self):
+        self.write(STUDY_SET.replace("Cows", "Goats"))
+        self.assertTrue(self.disk.is_stale())
+
+        deck = open_deck(str(self.csv_path), store="disk")
+        self.addCleanup(deck.database.conn.close)
+        self.assertIn("Goats", [item.response for item in deck.all_items])
+
+        self.write(STUDY_SET.replace("Cows", "Sheep"))
+        self.assertTrue(self.disk.reload())
+        self.assertEqual(self.disk.version, 1)
+        self.assertIn("Sheep", [item.response for item in self.disk.all_items])
+
+    def test_unparsable_csv_keeps_the_database_file(self):
+        self.write("Settings: bogus\n" + textwrap.dedent(STUDY_SET).lstrip())
+        with self.assertRaises(CSVError):
+            self.disk.reload()
+        self.assertEqual(len(list(self.disk.all_items)), 5)
+
+    def test_unwritable_file_falls_back_to_memory(self):
+        path = disk_path(str(self.csv_path))
+        with mock.patch(
+            "memtrain.memtrain_common.diskdeck.write_disk_database", side_effect=OSError
+        ):
+            Path(path).write_bytes(b"not a database")
+            deck = open_deck(str(self.csv_path), store="disk")
+        self.assertNotIsInstance(deck, DiskDeck)
+
+        self.assertEqual(write_disk_database(deck), path)
+
+    def test_engine_sessions(self):
+        engine = Engine(str(self.csv_path), "1", None, "Felidae", None, deck_store="disk")
+        self.addCleanup(engine.close)
+        self.assertIsInstance(engine.deck, DiskDeck)
+        self.assertEqual(sorted(item.response for item in engine.session_items), ["Cats", "Lion"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.deck import Deck
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.session import StudySession
+
+STUDY_SET = """
+Organelles
+Cue,Response,Synonym
+The {{}} makes ATP.,mitochondrion,mitochondria
+The {{}} holds the DNA.,nucleus,
+Ribosomes line the rough {{}}.,endoplasmic reticulum,ER
+Proteins are packaged in the {{}}.,Golgi apparatus,
+Plants make sugar in the {{}}.,chloroplast,
+The {{}} digests waste.,lysosome,
+The {{}} breaks down fatty acids.,peroxisome,
+The {{}} assembles ribosomes.,nucleolus,
+The {{}} stores water in plants.,vacuole,
+The {{}} is a tiny organelle that makes protein.,ribosome,
+"""
+
+
+class DistractorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "organelles.csv"
+        self.write(STUDY_SET)
+
+    def write(self, text):
+        self.csv_path.write_text(textwrap.dedent(text).lstrip(), encoding="utf-8")
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_mtime_ns + 10**9, stat.st_mtime_ns + 10**9))
+
+    def test_most_similar_first(self):
+        deck = Deck(str(self.csv_path))
+        similar = deck.distractors.similar("lysosome")
+
+        self.assertEqual(similar, ["ribosome", "peroxisome"])
+        self.assertNotIn("lysosome", similar)
+        self.assertEqual(deck.distractors.similar("nucleus")[0], "nucleolus")
+        self.assertIs(deck.distractors.similar("lysosome"), similar)
+
+    def test_synonyms_are_not_distractors(self):
+        deck = Deck(str(self.csv_path))
+        self.assertNotIn("ER", deck.distractors.similar("endoplasmic reticulum", ["ER"]))
+        self.assertNotIn("nucleus", deck.distractors.similar("nucleolus", ["Nucleus"]))
+
+    def test_sessions_use_similar_distractors(self):
+        engine = Engine(str(self.csv_path), "1", None, None, None)
+        self.addCleanup(engine.close)
+        engine.settings.distractors = "similar"
+        session = StudySession(engine)
+
+        while not session.is_complete:
+            session.current()
+            question = session.question
+            choices = {choice.lower() for choice in question.mchoices.values()}
+            expected = question.distractors.similar(question.response, question.synonyms)[:3]
+
+            # Responses sharing no trigrams are filled in at random.
+            self.assertLessEqual({choice.lower() for choice in expected}, choices)
+            self.assertIs(question.distractors, engine.deck.distractors)
+            session.answer("a")
+
+    def test_reload_rebuilds_the_index(self):
+        deck = Deck(str(self.csv_path))
+        self.assertNotIn("lysosomes", deck.distractors.similar("lysosome"))
+
+        self.write(STUDY_SET + "Cells have many {{}}.,lysosomes,\n")
+        self.assertTrue(deck.reload())
+        self.assertEqual(deck.distractors.similar("lysosome")[0], "lysosomes")
+
+
+if __name__ == "__main__":
+    unittest.main()
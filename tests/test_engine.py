@@ -1,10 +1,13 @@
+import json
 import os
 import tempfile
 import textwrap
 import unittest
+from collections.abc import Sequence
 from pathlib import Path
 
 from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.question import Question
 
 
 class EngineTestCase(unittest.TestCase):
@@ -103,6 +106,94 @@ class EngineTestCase(unittest.TestCase):
         self.assertGreater(persisted_item.progress.mastery_score, 0.0)
         self.assertIsNotNone(persisted_item.progress.next_due_at)
 
+    def test_progress_is_kept_per_learner(self):
+        csv_path = self.write_csv(
+            "animals.csv",
+            """
+            Animals
+            Cue,Response,Hint,Tag
+            {{}} make milk.,Cows,Mooo,Ungulates
+            You can ride on a {{}}.,horse,Neigh,Ungulates
+            """,
+        )
+
+        engine = Engine(str(csv_path), None, None, None, None, learner_id="ana")
+        item = engine.session_items[0]
+        engine.record_result(item, True, 2.5)
+        engine.record_result(item, True, 2.0)
+
+        ana = Engine(str(csv_path), None, None, None, None, learner_id="ana")
+        ben = Engine(str(csv_path), None, None, None, None, learner_id="ben")
+
+        def stage(engine):
+            return next(i.current_stage for i in engine.session_items if i.item_id == item.item_id)
+
+        self.assertEqual(stage(ana), 1)
+        self.assertEqual(stage(ben), 0)
+
+    def test_adaptive_session_reads_only_the_items_it_uses(self):
+        rows = "".join("Cue {{}} {0}.,response-{0}\n".format(number) for number in range(500))
+        csv_path = self.write_csv("large.csv", "Large\nCue,Response\n" + rows)
+        engine = Engine(str(csv_path), None, 5, None, None, plan=False)
+
+        reads = []
+
+        class CountingItems(Sequence):
+            def __len__(self):
+                return len(engine.deck.all_items)
+
+            def __getitem__(self, index):
+                reads.append(index)
+                return engine.deck.all_items[index]
+
+        engine.all_items = CountingItems()
+        items = engine.build_session_items(engine.filter_items(engine.all_items))
+
+        self.assertEqual(len(items), 5)
+        self.assertLess(len(reads), 50)
+
+    def test_seeded_sessions_repeat(self):
+        csv_path = self.write_csv(
+            "animals.csv",
+            """
+            Animals
+            Cue,Response
+            {{}} make milk.,Cows
+            You can ride on a {{}}.,horse
+            {{}} are smaller than lions.,Cats
+            This is a large carnivore often seen in zoos.,Lion
+            {{}} swim in the ocean.,Fish
+            A {{}} is green and lives close to the water.,Frog
+            {{}} sing in the morning.,Birds
+            """,
+        )
+
+        def session(seed):
+            engine = Engine(str(csv_path), "1", 12, None, None, seed=seed)
+            question = Question(
+                engine.settings,
+                engine.database,
+                engine.deck.cue_templates,
+                engine.deck.distractors,
+                engine.rng,
+            )
+            layouts = []
+            for cue_id, response_id in engine.cr_id_pairs:
+                question.main_data_loop(cue_id, response_id, engine.mtstatistics)
+                layouts.append(question.generate_mchoices())
+            return engine, engine.cr_id_pairs, layouts
+
+        engine, pairs, layouts = session(5)
+        self.assertEqual((pairs, layouts), session(5)[1:])
+        self.assertNotEqual((pairs, layouts), session(6)[1:])
+
+        self.assertEqual(engine.seed, 5)
+        self.assertEqual(json.loads(engine.timings.format_json())["seed"], 5)
+        self.assertTrue(engine.timings.format_table().startswith("seed: 5\n"))
+
+        # Unseeded engines pick and report their own seed.
+        self.assertIsInstance(Engine(str(csv_path), "1", None, None, None).seed, int)
+
 
 if __name__ == "__main__":
     unittest.main()
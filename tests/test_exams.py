@@ -0,0 +1,141 @@
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_cli import exam
+from memtrain.memtrain_common.exams import CHUNK_SIZE, ExamGenerator
+from memtrain.memtrain_common.question import NoResponsesError, make_mchoices
+
+STUDY_SET = """
+Animals
+Cue,Response,Hint,MTag
+{{}} make milk.,Cows,Mooo,farm
+You can ride on a {{}}.,horse,Neigh,farm
+{{}} are smaller than lions.,Cats,Meow,
+This is a large carnivore often seen in zoos.,Lion,Roar,
+{{}} swim in the ocean.,Fish,Blub,
+A {{}} is green and lives close to the water.,Frog,Ribbet,
+"""
+
+
+class MakeMchoicesTestCase(unittest.TestCase):
+    def test_choices_are_distinct_and_include_the_response(self):
+        plural = ["Cows", "Cats", "Birds", "Fish"]
+        nonplural = ["horse", "Lion", "Frog"]
+        rng = random.Random(49)
+        for _ in range(200):
+            choices, answer = make_mchoices(
+                "horse", ["Cows", "Cows"], [], plural, nonplural, "abcd", rng
+            )
+            self.assertEqual(len(set(choices.values())), 4)
+            self.assertEqual(choices[answer], "Horse")
+            self.assertIn("Cows", choices.values())
+
+    def test_no_choice_differs_from_another_only_in_case(self):
+        plural = ["cows", "COWS", "Cats", "cats", "Birds"]
+        nonplural = ["horse", "Horse", "Lion"]
+        rng = random.Random(49)
+        for _ in range(200):
+            choices, answer = make_mchoices(
+                "Cows", ["cows"], ["Horse"], plural, nonplural, "abcd", rng
+            )
+            self.assertEqual(len({choice.lower() for choice in choices.values()}), 4)
+            self.assertEqual(choices[answer], "Cows")
+
+    def test_too_few_responses(self):
+        with self.assertRaises(NoResponsesError):
+            make_mchoices("horse", [], [], ["Cows"], ["horse", "Lion"], "abcd")
+
+
+class ExamGeneratorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = self.workspace / "animals.csv"
+        self.csv_path.write_text(textwrap.dedent(STUDY_SET).lstrip(), encoding="utf-8")
+
+    def generate(self, out_name, variants, seed, **kwargs):
+        generator = ExamGenerator(str(self.csv_path), **kwargs)
+        self.addCleanup(generator.close)
+        out_dir = self.workspace / out_name
+        return list(generator.generate(variants, seed, str(out_dir))), out_dir
+
+    def test_seeded_variants_are_reproducible_across_workers(self):
+        variants = CHUNK_SIZE * 2 + 1
+        keys, out_dir = self.generate("one", variants, 7, nquestions=4, workers=1)
+        pooled_keys, pooled_dir = self.generate("pool", variants, 7, nquestions=4, workers=2)
+
+        self.assertEqual(keys, pooled_keys)
+        self.assertEqual([key["variant"] for key in keys], list(range(1, variants + 1)))
+        for key in keys:
+            name = "exam-{:04d}".format(key["variant"])
+            self.assertEqual(
+                (out_dir / (name + ".md")).read_text(), (pooled_dir / (name + ".md")).read_text()
+            )
+
+        # Variants differ from each other, and from other seeds.
+        self.assertNotEqual(keys[0]["questions"], keys[1]["questions"])
+        other_keys, _ = self.generate("other", variants, 8, nquestions=4, workers=1)
+        self.assertNotEqual(keys, other_keys)
+
+    def test_answer_keys_match_the_choices(self):
+        generator = ExamGenerator(str(self.csv_path), nquestions=6, workers=1)
+        self.addCleanup(generator.close)
+        variant = generator.writer.build_exam(3, 1)
+
+        self.assertEqual(len(variant["questions"]), 6)
+        self.assertEqual(len({question["item_id"] for question in variant["questions"]}), 6)
+        for question in variant["questions"]:
+            self.assertEqual(
+                question["choices"][question["answer"]].lower(), question["response"].lower()
+            )
+
+    def test_free_recall_levels(self):
+        generator = ExamGenerator(str(self.csv_path), level="2", nquestions=2, workers=1)
+        self.addCleanup(generator.close)
+        question = generator.writer.build_exam(3, 1)["questions"][0]
+
+        self.assertNotIn("choices", question)
+        self.assertEqual(question["answer"], question["response"])
+        self.assertEqual(len(question["hints"]), 1)
+
+    def test_command_writes_exams_keys_and_formats(self):
+        out_dir = self.workspace / "exams"
+        for exam_format, extension in (("html", ".html"), ("text", ".txt")):
+            with contextlib.redirect_stdout(io.StringIO()):
+                exam.main(
+                    [
+                        "--variants",
+                        "2",
+                        "-n",
+                        "3",
+                        "--seed",
+                        "5",
+                        "--format",
+                        exam_format,
+                        "-o",
+                        str(out_dir),
+                        str(self.csv_path),
+                    ]
+                )
+            self.assertTrue((out_dir / ("exam-0002" + extension)).exists())
+            self.assertTrue((out_dir / ("exam-0002-key" + extension)).exists())
+
+        keys = [json.loads(line) for line in (out_dir / "keys.jsonl").read_text().splitlines()]
+        self.assertEqual([key["seed"] for key in keys], [5, 5])
+        self.assertEqual(len(keys[0]["questions"]), 3)
+        self.assertIn("<ol", (out_dir / "exam-0001.html").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.grading import EXACT, NEAR, AnswerKey, bounded_distance
+from memtrain.memtrain_common.session import StudySession
+
+
+def distance(a, b):
+    """The full optimal string alignment distance that bounded_distance() bounds."""
+    rows = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for row in range(len(a) + 1):
+        for column in range(len(b) + 1):
+            if not row or not column:
+                rows[row][column] = row + column
+                continue
+            cost = 0 if a[row - 1] == b[column - 1] else 1
+            value = min(
+                rows[row - 1][column] + 1,
+                rows[row][column - 1] + 1,
+                rows[row - 1][column - 1] + cost,
+            )
+            if (
+                row > 1
+                and column > 1
+                and a[row - 1] == b[column - 2]
+                and a[row - 2] == b[column - 1]
+            ):
+                value = min(value, rows[row - 2][column - 2] + 1)
+            rows[row][column] = value
+    return rows[len(a)][len(b)]
+
+
+class BoundedDistanceTestCase(unittest.TestCase):
+    def test_matches_the_full_distance(self):
+        generator = random.Random(46)
+        for _ in range(2000):
+            a = "".join(generator.choice("abc") for _ in range(generator.randint(0, 8)))
+            b = "".join(generator.choice("abc") for _ in range(generator.randint(0, 8)))
+            limit = generator.randint(0, 4)
+            expected = distance(a, b)
+            self.assertEqual(
+                bounded_distance(a, b, limit), expected if expected <= limit else limit + 1, (a, b)
+            )
+
+    def test_edits(self):
+        self.assertEqual(bounded_distance("mitochondria", "mitochondira", 2), 1)
+        self.assertEqual(bounded_distance("mitochondria", "mitocondria", 2), 1)
+        self.assertEqual(bounded_distance("mitochondria", "mitochondriaa", 2), 1)
+        self.assertEqual(bounded_distance("mitochondria", "nucleus", 2), 3)
+
+
+class AnswerKeyTestCase(unittest.TestCase):
+    def test_exact_and_near_matches(self):
+        key = AnswerKey("Photosynthesis", ["light reactions"], max_edits=2)
+
+        self.assertEqual(key.grade("photo-synthesis").match, EXACT)
+        self.assertEqual(key.grade("Photosynthesis").answer, "Photosynthesis")
+
+        grade = key.grade("photosynthsis")
+        self.assertEqual((grade.match, grade.answer, grade.distance), (NEAR, "Photosynthesis", 1))
+        self.assertEqual(key.grade("light raectoins").answer, "light reactions")
+        self.assertIsNone(key.grade("respiration").match)
+
+    def test_edits_scale_with_length(self):
+        key = AnswerKey("cat", ["Felis catus"], max_edits=3)
+        self.assertIsNone(key.grade("cot").match)
+        self.assertEqual(key.grade("felis catsu").match, NEAR)
+        # "feliscatus" has 10 characters, so it allows 2 edits.
+        self.assertIsNone(key.grade("fils cts u").match)
+
+    def test_exact_by_default(self):
+        key = AnswerKey("Photosynthesis")
+        self.assertIsNone(key.grade("photosynthsis").match)
+
+    def test_many_synonyms_stay_fast(self):
+        generator = random.Random(46)
+        synonyms = [
+            "".join(generator.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(length))
+            for length in [generator.randint(5, 25) for _ in range(500)]
+        ]
+        key = AnswerKey("Photosynthesis", synonyms, max_edits=3)
+        inputs = ["photosynthsis", "something else entirely", "x" + synonyms[300][1:]]
+
+        start = time.perf_counter()
+        for user_input in inputs * 20:
+            key.grade(user_input)
+        self.assertLess((time.perf_counter() - start) / 60, 0.001)
+        self.assertEqual(key.grade(inputs[2]).answer, synonyms[300])
+
+
+class FuzzySessionTestCase(unittest.TestCase):
+    def test_sessions_report_near_matches(self):
+        with tempfile.TemporaryDirectory() as workspace:
+            os.environ["MEMTRAIN_PROGRESS_DB"] = str(Path(workspace) / "progress.sqlite3")
+            self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+            csv_path = Path(workspace) / "cells.csv"
+            csv_path.write_text(
+                "settings: fuzzy=2\nCells\nCue,Response\n"
+                "The powerhouse of the cell is the {{}}.,mitochondria\n",
+                encoding="utf-8",
+            )
+
+            engine = Engine(str(csv_path), "3", None, None, None)
+            self.addCleanup(engine.close)
+            session = StudySession(engine)
+            session.current()
+
+            result = session.answer("mitochondira")
+            self.assertTrue(result["correct"])
+            self.assertEqual(result["match"], NEAR)
+            self.assertIn("typo", result["feedback"])
+            self.assertIn("mitochondria", result["feedback"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from memtrain.memtrain_common.deck import find_study_sets
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.models import ProgressRecord
+from memtrain.memtrain_common.multideck import MultiDeckEngine, MultiDeckSession
+
+ANIMALS = """
+Animals
+Cue,Response,Hint,Tag
+{{}} make milk.,Cows,Mooo,Ungulates
+You can ride on a {{}}.,horse,Neigh,Ungulates
+"{{}} are smaller than lions.",Cats,Meow,Felidae
+This is a large carnivore often seen in zoos.,Lion,Roar,Felidae
+"""
+
+CAPITALS = """
+Capitals
+Cue,Response,Hint,Tag
+The capital of France is {{}}.,Paris,,Europe
+The capital of Italy is {{}}.,Rome,,Europe
+The capital of Japan is {{}}.,Tokyo,,Asia
+The capital of Kenya is {{}}.,Nairobi,,Africa
+"""
+
+
+class MultiDeckTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.animals = self.write_csv("decks/animals.csv", ANIMALS)
+        self.capitals = self.write_csv("decks/more/capitals.csv", CAPITALS)
+
+    def write_csv(self, name, content):
+        csv_path = self.workspace / name
+        csv_path.parent.mkdir(parents=True, exist_ok=True)
+        csv_path.write_text(textwrap.dedent(content).lstrip(), encoding="utf-8")
+        return str(csv_path)
+
+    def open_engine(self, *args, **kwargs):
+        engine = MultiDeckEngine(*args, **kwargs)
+        self.addCleanup(engine.close)
+        return engine
+
+    def set_due(self, csvfile, response, hours_ago):
+        engine = Engine(csvfile, None, None, None, None, plan=False)
+        item = next(item for item in engine.filtered_items if item.response == response)
+        due = datetime.now(timezone.utc) - timedelta(hours=hours_ago)
+        progress = ProgressRecord(
+            current_stage=2,
+            mastery_score=0.8,
+            reviews=3,
+            last_seen_at=due.isoformat(),
+            next_due_at=due.isoformat(),
+        )
+        engine.progress_store.update_progress(engine.study_set_id, item.item_id, progress)
+        engine.close()
+
+    def test_directories_are_expanded(self):
+        self.assertEqual(
+            find_study_sets([str(self.workspace / "decks")]), [self.animals, self.capitals]
+        )
+
+    def test_decks_are_compiled_in_worker_processes(self):
+        engine = MultiDeckEngine([self.animals, self.capitals], nquestions=4, workers=2)
+        compiled_dir = engine.compiled_dir.name
+
+        self.assertEqual(
+            [type(study_set.deck).__name__ for study_set in engine.engines],
+            ["MappedDeck", "MappedDeck"],
+        )
+        self.assertEqual(len(engine.session_items), 4)
+        # Nothing is written next to the study sets.
+        self.assertEqual(sorted(os.listdir(self.workspace / "decks")), ["animals.csv", "more"])
+
+        engine.close()
+        self.assertFalse(os.path.exists(compiled_dir))
+
+    def test_due_items_are_merged_across_decks(self):
+        self.set_due(self.animals, "Cows", hours_ago=1)
+        self.set_due(self.capitals, "Rome", hours_ago=3)
+        self.set_due(self.capitals, "Tokyo", hours_ago=2)
+
+        engine = self.open_engine([self.animals, self.capitals], nquestions=5)
+        responses = sorted(item.response for item in engine.session_items)
+
+        self.assertEqual(len(responses), 5)
+        # Due items fill 60% of the session, so all three are included.
+        self.assertTrue({"Cows", "Rome", "Tokyo"} <= set(responses))
+        self.assertEqual(sum(item.is_due for item in engine.session_items), 3)
+
+    def test_most_overdue_items_are_taken_first(self):
+        self.set_due(self.animals, "Cows", hours_ago=1)
+        self.set_due(self.capitals, "Rome", hours_ago=3)
+
+        engine = self.open_engine([self.animals, self.capitals], nquestions=1)
+
+        self.assertEqual([item.response for item in engine.session_items], ["Rome"])
+
+    def test_manual_level_session_keeps_progress(self):
+        self.set_due(self.animals, "Cows", hours_ago=1)
+
+        engine = self.open_engine([self.animals, self.capitals], level="3", tags="Ungulates")
+        cows = next(item for item in engine.session_items if item.response == "Cows")
+        self.assertEqual((cows.progress.reviews, cows.current_stage, cows.level), (3, 2, "3"))
+
+        session = MultiDeckSession(engine)
+        question = session.current()
+        while not question["complete"]:
+            question = session.answer("Cows")["next"]
+
+        stored = Engine(self.animals, None, None, None, None, plan=False)
+        self.addCleanup(stored.close)
+        progress = stored.progress_store.get_progress_map(stored.study_set_id, [cows.item_id])
+        self.assertEqual(progress[cows.item_id].reviews, 4)
+        self.assertGreaterEqual(progress[cows.item_id].current_stage, 2)
+
+    def test_session_runs_across_decks(self):
+        engine = self.open_engine([self.animals, self.capitals], level="3", tags="Europe,Felidae")
+        session = MultiDeckSession(engine)
+
+        titles = set()
+        question = session.current()
+        while not question["complete"]:
+            titles.add(question["title"])
+            question = session.answer("wrong")["next"]
+
+        self.assertEqual(titles, {"Animals", "Capitals"})
+        self.assertEqual(question["summary"]["total"], 4)
+        self.assertEqual(question["summary"]["incorrect"], 4)
+
+        # A quarter of the next session reviews missed items; the rest is new.
+        follow_up = self.open_engine([self.animals, self.capitals], nquestions=4)
+        missed = [item for item in follow_up.session_items if item.progress.failure_count]
+        self.assertEqual(len(missed), 1)
+        self.assertEqual(sum(item.is_new for item in follow_up.session_items), 3)
+
+    def test_session_picks_up_edits_to_one_deck(self):
+        engine = self.open_engine([self.animals, self.capitals], level="3")
+        session = MultiDeckSession(engine)
+        question = session.current()
+
+        # Remove every capital still to come.
+        csv_path = Path(self.capitals)
+        csv_path.write_text("Capitals\nCue,Response\n", encoding="utf-8")
+        stat = csv_path.stat()
+        os.utime(csv_path, ns=(stat.st_mtime_ns + 10**9, stat.st_mtime_ns + 10**9))
+
+        first_is_capital = engine.current_engine.csvfile == self.capitals
+        question = session.answer("wrong")["next"]
+        while not question["complete"]:
+            self.assertEqual(question["title"], "Animals")
+            question = session.answer("wrong")["next"]
+
+        self.assertEqual(question["summary"]["total"], 5 if first_is_capital else 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+
+from memtrain.memtrain_common.perfsuite import (
+    BENCHMARKS,
+    STORES,
+    check_scaling,
+    compare,
+    compare_stores,
+    format_store_comparison,
+    run_suite,
+    scaling_exponent,
+)
+
+
+def make_suite(times, exponent=1.0, max_exponent=1.3):
+    return {
+        "sizes": [int(size) for size in times],
+        "repeat": 1,
+        "results": {
+            "populate": {"times": times, "exponent": exponent, "max_exponent": max_exponent}
+        },
+    }
+
+
+class PerfSuiteTestCase(unittest.TestCase):
+    def test_scaling_exponent_detects_quadratic_growth(self):
+        sizes = [500, 1000, 2000, 4000]
+
+        self.assertAlmostEqual(scaling_exponent(sizes, [s * 1e-6 for s in sizes]), 1.0)
+        self.assertAlmostEqual(scaling_exponent(sizes, [s * s * 1e-9 for s in sizes]), 2.0)
+
+    def test_check_scaling_flags_superlinear_benchmarks(self):
+        self.assertEqual(check_scaling(make_suite({"500": 1.0}, exponent=1.1)), [])
+        self.assertEqual(len(check_scaling(make_suite({"500": 1.0}, exponent=1.9))), 1)
+
+    def test_compare_flags_slowdowns_beyond_threshold(self):
+        baseline = make_suite({"500": 0.010, "1000": 0.020})
+        current = make_suite({"500": 0.011, "1000": 0.030})
+
+        problems = compare(baseline, current, threshold=0.25)
+
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("populate @ 1000"))
+
+    def test_run_suite_times_every_benchmark_and_size(self):
+        suite = run_suite([8, 16], repeat=1)
+
+        self.assertEqual(set(suite["results"]), set(BENCHMARKS))
+        for result in suite["results"].values():
+            self.assertEqual(set(result["times"]), {"8", "16"})
+            self.assertIn("exponent", result)
+
+    def test_compare_stores_measures_every_store_and_size(self):
+        comparison = compare_stores([8, 16], repeat=1)
+
+        self.assertEqual(set(comparison["stores"]), set(STORES))
+        for results in comparison["stores"].values():
+            self.assertEqual(set(results), {"8", "16"})
+            for result in results.values():
+                self.assertGreater(result["load"], 0)
+                self.assertGreater(result["lookup"], 0)
+                self.assertGreater(result["memory"], 0)
+        self.assertIn("columns", format_store_comparison(comparison))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import pstats
+import tempfile
+import textwrap
+import tracemalloc
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+
+from memtrain.memtrain_cli.__main__ import main
+from memtrain.memtrain_common.profiling import SessionProfiler, phase_path
+
+
+class SessionProfilerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+
+    def test_phase_path_inserts_phase_before_extension(self):
+        self.assertEqual(
+            phase_path("out/session.pstats", "load", ".pstats"), "out/session.load.pstats"
+        )
+        self.assertEqual(phase_path("session", "questions", ".txt"), "session.questions.txt")
+
+    def test_nested_phase_entries_accumulate(self):
+        profiler = SessionProfiler(
+            str(self.workspace / "cpu.pstats"), str(self.workspace / "mem.txt")
+        )
+
+        for _ in range(2):
+            with profiler.phase("questions"):
+                with profiler.phase("questions"):
+                    [str(n) for n in range(1000)]
+
+        self.assertEqual(profiler.depth["questions"], 0)
+        written = profiler.write()
+        self.assertFalse(tracemalloc.is_tracing())
+
+        self.assertEqual(
+            sorted(Path(path).name for path in written),
+            ["cpu.questions.pstats", "mem.questions.txt"],
+        )
+        report = (self.workspace / "mem.questions.txt").read_text(encoding="utf-8")
+        self.assertIn("Peak traced memory", report)
+
+    def test_disabled_profiler_writes_nothing(self):
+        profiler = SessionProfiler()
+
+        with profiler.phase("load"):
+            pass
+
+        self.assertEqual(profiler.write(), [])
+
+    def test_cli_writes_per_phase_profiles(self):
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        csv_path = self.workspace / "animals.csv"
+        csv_path.write_text(
+            textwrap.dedent(
+                """
+                Animals
+                Cue,Response,Tag
+                {{}} make milk.,Cows,Ungulates
+                You can ride on a {{}}.,horse,Ungulates
+                """
+            ).lstrip(),
+            encoding="utf-8",
+        )
+        answers = self.workspace / "answers.txt"
+        answers.write_text("cows\nhorse\n", encoding="utf-8")
+
+        with open(os.devnull, "w") as devnull:
+            with redirect_stdout(devnull), redirect_stderr(devnull):
+                main(
+                    [
+                        "--answers",
+                        str(answers),
+                        "--profile",
+                        str(self.workspace / "session.pstats"),
+                        "--memprofile",
+                        str(self.workspace / "session.txt"),
+                        "-l",
+                        "3",
+                        str(csv_path),
+                    ]
+                )
+
+        for phase in ("load", "questions"):
+            stats = pstats.Stats(str(self.workspace / "session.{}.pstats".format(phase)))
+            self.assertGreater(stats.total_calls, 0)
+            self.assertTrue((self.workspace / "session.{}.txt".format(phase)).exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from memtrain.memtrain_common.models import ProgressRecord
+from memtrain.memtrain_common.progress_store import (
+    DEFAULT_LEARNER,
+    IN_LIST_LIMIT,
+    SCHEMA_VERSION,
+    ProgressStore,
+)
+
+
+class ProgressStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        self.progress_db = self.workspace / "progress.sqlite3"
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.progress_db)
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+    def open_store(self):
+        store = ProgressStore(str(self.workspace / "animals.csv"))
+        self.addCleanup(store.close)
+        return store
+
+    def record(self, stage, due_in_hours=1):
+        due = datetime.now(timezone.utc) + timedelta(hours=due_in_hours)
+        return ProgressRecord(
+            current_stage=stage,
+            reviews=1,
+            last_seen_at=due.isoformat(),
+            next_due_at=due.isoformat(),
+        )
+
+    def query_plan(self, store, query, params):
+        rows = store.conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+        return " ".join(row["detail"] for row in rows)
+
+    def test_learners_have_separate_progress(self):
+        store = self.open_store()
+        store.update_progress("animals", "cows", self.record(2), "ana")
+        store.update_progress("animals", "cows", self.record(4), "ben")
+
+        ana = store.get_progress_map("animals", ["cows"], "ana")
+        ben = store.get_progress_map("animals", ["cows"], "ben")
+
+        self.assertEqual(ana["cows"].current_stage, 2)
+        self.assertEqual(ben["cows"].current_stage, 4)
+        self.assertEqual(store.get_progress_map("animals", ["cows"]), {})
+        self.assertEqual(store.get_learner_ids(), ["ana", "ben"])
+
+    def test_large_item_lists_are_matched(self):
+        store = self.open_store()
+        item_ids = ["item-{}".format(number) for number in range(IN_LIST_LIMIT * 2)]
+        for item_id in item_ids[::10]:
+            store.update_progress("animals", item_id, self.record(1))
+
+        progress_map = store.get_progress_map("animals", item_ids[: IN_LIST_LIMIT + 1])
+
+        self.assertEqual(sorted(progress_map), sorted(item_ids[: IN_LIST_LIMIT + 1 : 10]))
+
+    def test_due_item_ids_are_ordered_by_due_time(self):
+        store = self.open_store()
+        store.update_progress("animals", "later", self.record(1, due_in_hours=-1))
+        store.update_progress("animals", "sooner", self.record(1, due_in_hours=-2))
+        store.update_progress("animals", "not-due", self.record(1, due_in_hours=2))
+
+        self.assertEqual(store.get_due_item_ids("animals"), ["sooner", "later"])
+        self.assertEqual(store.get_due_item_ids("animals", limit=1), ["sooner"])
+        self.assertEqual(store.get_due_item_ids("animals", learner_id="ana"), [])
+
+    def test_learner_queries_use_indexes(self):
+        store = self.open_store()
+
+        progress_plan = self.query_plan(
+            store,
+            """SELECT * FROM item_progress
+               WHERE learner_id = ? AND study_set_id = ? AND item_id IN (?, ?)""",
+            ("ana", "animals", "a", "b"),
+        )
+        due_plan = self.query_plan(
+            store,
+            """SELECT item_id FROM item_progress
+               WHERE learner_id = ? AND study_set_id = ? AND next_due_at <= ?
+               ORDER BY next_due_at""",
+            ("ana", "animals", "2030-01-01"),
+        )
+
+        self.assertNotIn("SCAN", progress_plan)
+        self.assertNotIn("SCAN", due_plan)
+        self.assertNotIn("TEMP B-TREE", due_plan)
+        self.assertIn("item_progress_due", due_plan)
+
+    def test_export_and_delete_learner(self):
+        store = self.open_store()
+        store.update_progress("animals", "cows", self.record(1), "ana")
+        store.update_progress("animals", "horse", self.record(2), "ana")
+        store.update_progress("animals", "cows", self.record(3), "ben")
+
+        rows = list(store.export_learner("ana"))
+
+        self.assertEqual([row["item_id"] for row in rows], ["cows", "horse"])
+        self.assertEqual(rows[1]["current_stage"], 2)
+        self.assertEqual(store.delete_learner("ana"), 2)
+        self.assertEqual(store.get_learner_ids(), ["ben"])
+
+    def test_single_learner_progress_is_migrated(self):
+        conn = sqlite3.connect(self.progress_db)
+        conn.execute(
+            """CREATE TABLE item_progress (
+                   study_set_id TEXT,
+                   item_id TEXT,
+                   current_stage INTEGER NOT NULL DEFAULT 0,
+                   mastery_score REAL NOT NULL DEFAULT 0.0,
+                   success_streak INTEGER NOT NULL DEFAULT 0,
+                   failure_count INTEGER NOT NULL DEFAULT 0,
+                   lapse_count INTEGER NOT NULL DEFAULT 0,
+                   average_response_time REAL NOT NULL DEFAULT 0.0,
+                   reviews INTEGER NOT NULL DEFAULT 0,
+                   last_seen_at TEXT,
+                   next_due_at TEXT,
+                   PRIMARY KEY (study_set_id, item_id))"""
+        )
+        conn.execute(
+            "INSERT INTO item_progress (study_set_id, item_id, current_stage) VALUES (?, ?, ?)",
+            ("animals", "cows", 3),
+        )
+        conn.commit()
+        conn.close()
+
+        store = self.open_store()
+
+        self.assertEqual(store.get_learner_ids(), [DEFAULT_LEARNER])
+        self.assertEqual(store.get_progress_map("animals", ["cows"])["cows"].current_stage, 3)
+        self.assertEqual(store.conn.execute("PRAGMA user_version").fetchone()[0], SCHEMA_VERSION)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.database import RESPONSE_VALUES
+from memtrain.memtrain_common.deck import CSVError, Deck, DeckCache
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.session import StudySession
+
+STUDY_SET = """
+Animals
+Cue,Response,Synonym,Hint,Tag,Tag,MTag
+{{}} make milk.,Cows,cattle,Farm animal,Ungulates,Farm,mammals
+You can ride on a {{}}.,horse,pony,,Ungulates,Farm,mammals
+"{{}} are smaller than lions.",Cats,kitties,Pet,Felidae,Farm,mammals
+This is a large carnivore often seen in zoos.,Lion,,Big cat,Felidae,Wild,mammals
+{{}} lay eggs.,Hens,chickens,,Birds,Farm,birds
+"""
+
+
+def snapshot(database):
+    """The study-set database's contents by value, independent of row IDs."""
+    cur = database.conn.cursor()
+    out = {
+        "cues": sorted(row[0] for row in cur.execute("SELECT cue FROM cues")),
+        "responses": sorted(row[0] for row in cur.execute("SELECT response FROM responses")),
+        "pairs": sorted(
+            cur.execute(
+                """SELECT cue, response, placement FROM cues_to_responses
+                   JOIN cues USING (cue_id) JOIN responses USING (response_id)"""
+            )
+        ),
+    }
+    for value in RESPONSE_VALUES:
+        out[value] = sorted(
+            cur.execute(
+                """SELECT response, {0} FROM responses_to_{0}s
+                   JOIN responses USING (response_id) JOIN {0}s USING ({0}_id)""".format(
+                    value
+                )
+            )
+        )
+    return out
+
+
+def item_tuples(items):
+    return [(item.item_id, item.cue, item.response, item.placement) for item in items]
+
+
+class DeckReloadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "animals.csv"
+        self.mtime = 1_000_000_000_000_000_000
+        self.write(STUDY_SET)
+        self.deck = Deck(str(self.csv_path))
+
+    def write(self, text):
+        self.csv_path.write_text(textwrap.dedent(text).lstrip(), encoding="utf-8")
+        # Edits in quick succession must not share a modification time.
+        self.mtime += 1_000_000_000
+        os.utime(self.csv_path, ns=(self.mtime, self.mtime))
+
+    def edit(self, old, new):
+        self.write(STUDY_SET.replace(old, new))
+
+    def assert_matches_fresh_load(self):
+        fresh = Deck(str(self.csv_path))
+        self.assertEqual(snapshot(self.deck.database), snapshot(fresh.database))
+        self.assertEqual(item_tuples(self.deck.all_items), item_tuples(fresh.all_items))
+
+    def test_unchanged_file_is_not_reloaded(self):
+        self.assertFalse(self.deck.reload())
+        self.assertEqual(self.deck.version, 0)
+
+    def test_inserted_updated_and_deleted_rows(self):
+        unchanged = self.deck.all_items[1]
+        self.write(
+            STUDY_SET.replace("Pet,Felidae", "Pet;house cat,Felidae")
+            .replace("{{}} lay eggs.,Hens,chickens,,Birds,Farm,birds\n", "")
+            .replace("Lion,,", "Lion,king,")
+            + "{{}} bark.,Dogs,hounds,Pet,Canidae,Farm,mammals\n"
+        )
+
+        self.assertTrue(self.deck.reload())
+        self.assertEqual(self.deck.version, 1)
+        self.assert_matches_fresh_load()
+        # Items whose rows did not change are kept.
+        self.assertIs(self.deck.all_items[1], unchanged)
+        self.assertNotIn("Hens", self.deck.database.get_all_responses())
+
+    def test_edited_cue_and_repeated_cue_placement(self):
+        self.edit("You can ride on a {{}}.,horse", "{{}} make milk.,horse")
+        self.deck.reload()
+        self.assert_matches_fresh_load()
+
+        self.edit("{{}} make milk.,Cows", "{{}} moo.,Cows")
+        self.deck.reload()
+        self.assert_matches_fresh_load()
+
+    def test_tag_and_search_indexes_follow_edits(self):
+        self.assertEqual(len(self.deck.search("zoos")), 1)
+        self.assertEqual(len(self.deck.tag_index.select(self.deck.all_items, "Wild")), 1)
+
+        self.edit(
+            "often seen in zoos.,Lion,,Big cat,Felidae,Wild", "of the savanna.,Lion,,,Felidae,Farm"
+        )
+        self.deck.reload()
+
+        self.assertEqual(self.deck.search("zoos"), [])
+        self.assertEqual([item.response for item in self.deck.search("savanna")], ["Lion"])
+        self.assertEqual(list(self.deck.tag_index.select(self.deck.all_items, "Wild")), [])
+
+    def test_settings_change_rebuilds_the_deck(self):
+        database = self.deck.database
+        self.write("Settings: !level3\n" + textwrap.dedent(STUDY_SET).lstrip())
+        self.deck.reload()
+
+        self.assertIsNot(self.deck.database, database)
+        self.assertFalse(self.deck.settings.settings["level3"])
+        self.assert_matches_fresh_load()
+
+    def test_unparsable_file_keeps_the_loaded_deck(self):
+        items = item_tuples(self.deck.all_items)
+        self.write("Animals\nCue,Response\n{{}} make milk.,Cows\n{{}} make milk.,Cows\n")
+
+        with self.assertRaises(CSVError):
+            self.deck.reload()
+
+        self.assertEqual(item_tuples(self.deck.all_items), items)
+        # The broken file is not parsed again until it changes.
+        self.assertFalse(self.deck.is_stale())
+
+    def test_cache_reloads_decks_in_place(self):
+        cache = DeckCache()
+        deck = cache.get(str(self.csv_path))
+        self.edit("Cows", "Goats")
+
+        self.assertIs(cache.get(str(self.csv_path)), deck)
+        self.assertIn("Goats", [item.response for item in deck.all_items])
+        self.assertEqual(cache.loads, 2)
+
+
+class SessionReloadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "animals.csv"
+        self.rows = {
+            "cows": "{{}} make milk.,Cows",
+            "horse": "You can ride on a {{}}.,horse",
+            "cats": "{{}} are smaller than lions.,Cats",
+            "lion": "This is a large carnivore often seen in zoos.,Lion",
+        }
+        self.write()
+
+    def write(self):
+        lines = ["Animals", "Cue,Response,Id"]
+        lines += ["{},{}".format(row, item_id) for item_id, row in self.rows.items()]
+        self.csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        stat = os.stat(self.csv_path)
+        os.utime(self.csv_path, ns=(stat.st_mtime_ns + 10**9, stat.st_mtime_ns + 10**9))
+
+    def test_session_picks_up_edits_between_questions(self):
+        engine = Engine(str(self.csv_path), "3", None, None, None)
+        self.addCleanup(engine.close)
+        session = StudySession(engine)
+
+        first = session.current()
+        deleted, edited = [item.item_id for item in engine.session_items[1:3]]
+        del self.rows[deleted]
+        self.rows[edited] = "{{}} was edited.,Edited"
+        self.write()
+
+        result = session.answer("x")
+        self.assertEqual(first["total"], 4)
+        self.assertEqual(result["next"]["total"], 3)
+
+        item_ids = [item.item_id for item in engine.session_items]
+        self.assertNotIn(deleted, item_ids)
+        self.assertEqual(engine.session_items[1].response, "Edited")
+        self.assertEqual(result["next"]["cue"], "_________ was edited.")
+        self.assertEqual(
+            engine.cr_id_pairs[1],
+            (engine.session_items[1].cue_id, engine.session_items[1].response_id),
+        )
+
+        while not result["next"]["complete"]:
+            result = session.answer("x")
+        self.assertEqual(result["next"]["summary"]["total"], 3)
+
+    def test_session_completes_when_its_items_are_deleted(self):
+        engine = Engine(str(self.csv_path), "3", None, None, None)
+        self.addCleanup(engine.close)
+        session = StudySession(engine)
+
+        first_item = engine.session_items[0].item_id
+        session.current()
+        self.rows = {first_item: self.rows[first_item]}
+        self.write()
+
+        result = session.answer("x")
+        self.assertTrue(result["next"]["complete"])
+        self.assertEqual(result["next"]["summary"]["total"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
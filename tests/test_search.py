@@ -0,0 +1,96 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.database import search_terms
+from memtrain.memtrain_common.deck import Deck
+from memtrain.memtrain_common.engine import Engine, NoResponsesError
+
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "animals.csv"
+        self.csv_path.write_text(
+            textwrap.dedent(
+                """
+                Animals
+                Cue,Response,Tag
+                {{}} make milk and graze on grass.,Cows,Ungulates
+                You can ride on a {{}}; it eats grass.,horse,Ungulates
+                "{{}} are smaller than lions, and don't eat grass.",Cats,Felidae
+                This is a large carnivore of the grass savanna.,Lion,Felidae
+                A {{}} hunts in the savanna.,Cheetah,Felidae
+                """
+            ).lstrip(),
+            encoding="utf-8",
+        )
+        self.deck = Deck(str(self.csv_path))
+
+    def search(self, query, **kwargs):
+        return [item.response for item in self.deck.search(query, **kwargs)]
+
+    def test_search_terms(self):
+        self.assertEqual(search_terms('savan* "grass"'), [("savan", True), ("grass", False)])
+        self.assertEqual(search_terms("  "), [])
+        self.assertEqual(search_terms(None), [])
+
+    def test_every_word_must_match(self):
+        self.assertEqual(sorted(self.search("grass")), ["Cats", "Cows", "Lion", "horse"])
+        self.assertEqual(self.search("savanna grass"), ["Lion"])
+        self.assertEqual(sorted(self.search("SAVANNA")), ["Cheetah", "Lion"])
+        self.assertEqual(self.search("zebra"), [])
+        self.assertEqual(self.search(""), [])
+
+    def test_responses_and_prefixes_match(self):
+        self.assertEqual(self.search("cheetah"), ["Cheetah"])
+        self.assertEqual(self.search("carniv*"), ["Lion"])
+
+    def test_punctuation_is_not_query_syntax(self):
+        self.assertEqual(self.search("don't (eat) -grass"), ["Cats"])
+        self.assertEqual(self.search('lion OR "cheetah"'), [])
+
+    def test_better_matches_rank_first(self):
+        # Short texts that mention the word are ranked above longer ones.
+        self.assertEqual(self.search("savanna")[0], "Cheetah")
+        self.assertEqual(len(self.search("grass", limit=2)), 2)
+
+    def test_results_can_be_restricted_to_items(self):
+        felidae = [item for item in self.deck.all_items if item.response in ("Cats", "Lion")]
+        self.assertEqual(sorted(self.search("grass", items=felidae)), ["Cats", "Lion"])
+        self.assertEqual(len(self.search("grass", items=felidae, limit=1)), 1)
+
+    def test_index_is_built_once(self):
+        self.search("grass")
+        self.assertEqual(self.deck.database.search_mode, "fts5")
+        self.search("savanna")
+        self.assertEqual(self.deck.database.search_mode, "fts5")
+
+    def test_substring_fallback_without_fts5(self):
+        self.deck.database.search_mode = "like"
+        self.assertEqual(self.search("savanna grass"), ["Lion"])
+        self.assertEqual(sorted(self.search("chee")), ["Cheetah"])
+        self.assertEqual(self.search("100%"), [])
+
+    def test_engine_sessions_from_a_query(self):
+        engine = Engine(str(self.csv_path), None, None, "Felidae", None, query="grass")
+        self.addCleanup(engine.close)
+        self.assertEqual(sorted(item.response for item in engine.session_items), ["Cats", "Lion"])
+
+        engine = Engine(str(self.csv_path), "1", 1, None, None, query="savanna")
+        self.addCleanup(engine.close)
+        self.assertEqual([item.response for item in engine.session_items], ["Cheetah"])
+
+        with self.assertRaises(NoResponsesError):
+            Engine(str(self.csv_path), None, None, "Ungulates", None, query="savanna")
+
+
+if __name__ == "__main__":
+    unittest.main()
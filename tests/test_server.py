@@ -0,0 +1,135 @@
+import asyncio
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.loadgen import HTTPClient, LoadError, run_load
+from memtrain.memtrain_common.server import ServerThread, SessionServer
+
+
+class SessionServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(self.workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = self.workspace / "animals.csv"
+        self.csv_path.write_text(
+            textwrap.dedent(
+                """
+                Animals
+                Cue,Response,Synonym,Tag,Id
+                {{}} make milk.,Cows,Cattle,Ungulates,cows-1
+                You can ride on a {{}}.,horse,,Ungulates,horse-1
+                {{}} bark.,Dogs,,Pets,dogs-1
+                {{}} purr.,Cats,,Pets,cats-1
+                """
+            ).lstrip(),
+            encoding="utf-8",
+        )
+
+        self.server = SessionServer([str(self.csv_path)], workers=2)
+        self.thread = ServerThread(self.server)
+        self.port = self.thread.start()
+        self.addCleanup(self.thread.stop)
+
+    def test_session_round_trip(self):
+        async def scenario():
+            client = await HTTPClient.open("127.0.0.1", self.port)
+            try:
+                self.assertEqual(await client.request("GET", "/decks"), {"decks": ["animals"]})
+
+                created = await client.request(
+                    "POST", "/sessions", {"deck": "animals", "level": "3", "tags": "Ungulates"}
+                )
+                path = "/sessions/" + created["session_id"]
+                question = created["question"]
+                self.assertEqual((question["level"], question["total"]), ("3", 2))
+
+                answers = {"make milk": "cattle", "ride": "horse"}
+                while not question["complete"]:
+                    answer = next(a for key, a in answers.items() if key in question["cue"])
+                    reply = await client.request("POST", path + "/answer", {"answer": answer})
+                    self.assertTrue(reply["correct"])
+                    question = reply["next"]
+
+                self.assertEqual(question["summary"]["correct"], 2)
+
+                with self.assertRaises(LoadError):
+                    await client.request("POST", path + "/answer", {"answer": "horse"})
+
+                await client.request("DELETE", path)
+                with self.assertRaises(LoadError):
+                    await client.request("GET", path)
+                with self.assertRaises(LoadError):
+                    await client.request("POST", "/sessions", {"deck": "missing"})
+            finally:
+                await client.close()
+
+        asyncio.run(scenario())
+
+    def test_seeded_sessions_repeat(self):
+        async def scenario():
+            client = await HTTPClient.open("127.0.0.1", self.port)
+            try:
+                cues = []
+                for _ in range(2):
+                    created = await client.request(
+                        "POST", "/sessions", {"deck": "animals", "level": "1", "seed": 7}
+                    )
+                    self.assertEqual(created["seed"], 7)
+                    question = created["question"]
+                    cues.append((question["cue"], question["choices"]))
+                    await client.request("DELETE", "/sessions/" + created["session_id"])
+
+                self.assertEqual(cues[0], cues[1])
+                with self.assertRaises(LoadError):
+                    await client.request("POST", "/sessions", {"deck": "animals", "seed": "7"})
+            finally:
+                await client.close()
+
+        asyncio.run(scenario())
+
+    def test_concurrent_learners_share_one_deck(self):
+        result = asyncio.run(
+            run_load(
+                "127.0.0.1", self.port, "animals", learners=4, sessions=3, options={"level": "1"}
+            )
+        )
+
+        self.assertEqual(result.sessions, 12)
+        self.assertEqual(result.questions, 48)
+        self.assertEqual(self.server.cache.loads, 1)
+        self.assertEqual(self.server.sessions, {})
+
+    def test_decks_with_open_sessions_stay_loaded(self):
+        other_path = self.workspace / "other.csv"
+        other_path.write_text(self.csv_path.read_text(encoding="utf-8"), encoding="utf-8")
+        server = SessionServer([str(self.csv_path), str(other_path)], workers=1, max_decks=1)
+        self.addCleanup(server.executor.shutdown)
+
+        first = server.open_session("animals")
+        self.addCleanup(first.close)
+        second = server.open_session("other")
+        self.addCleanup(second.close)
+        server.cache.idle_timeout = 0
+        server.evict_idle_decks()
+        third = server.open_session("animals")
+        self.addCleanup(third.close)
+
+        self.assertIs(third.engine.deck, first.engine.deck)
+        self.assertEqual(server.cache.loads, 2)
+
+        # Once its sessions close, a deck can be evicted again.
+        for session in (first, second, third):
+            server.release_deck(session.engine.csvfile)
+        server.evict_idle_decks()
+        self.assertEqual(len(server.cache.decks), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
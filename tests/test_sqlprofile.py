@@ -0,0 +1,63 @@
+import sqlite3
+import unittest
+
+from memtrain.memtrain_common.sqlprofile import (
+    ProfiledConnection,
+    SQLProfiler,
+    normalize_statement,
+)
+
+
+class SQLProfileTestCase(unittest.TestCase):
+    def setUp(self):
+        self.profiler = SQLProfiler()
+        self.conn = sqlite3.connect(":memory:", factory=ProfiledConnection)
+        self.addCleanup(self.conn.close)
+        self.profiler.attach(self.conn, "deck")
+
+    def test_normalize_statement_replaces_literals(self):
+        self.assertEqual(
+            normalize_statement("SELECT *  FROM t\n WHERE a = 'it''s' AND b IN (1, 2, 3)"),
+            "SELECT * FROM t WHERE a = ? AND b IN (?, ...)",
+        )
+
+    def test_statements_are_aggregated_with_rows(self):
+        self.conn.execute("CREATE TABLE words (word TEXT)")
+        for word in ["cow", "horse", "cat"]:
+            self.conn.execute("INSERT INTO words(word) VALUES (?)", (word,))
+        self.conn.commit()
+
+        cursor = self.conn.cursor()
+        for word in ["cow", "cat"]:
+            cursor.execute("SELECT word FROM words WHERE word = (?)", (word,))
+            cursor.fetchall()
+
+        stats = {stats.statement: stats for stats in self.profiler.stats.values()}
+
+        insert = stats["INSERT INTO words(word) VALUES (?)"]
+        self.assertEqual(insert.count, 3)
+
+        select = stats["SELECT word FROM words WHERE word = (?)"]
+        self.assertEqual(select.count, 2)
+        self.assertEqual(select.rows, 2)
+        self.assertGreater(select.total_time, 0.0)
+
+        # The implicit transaction is seen only by the trace callback.
+        self.assertEqual(stats["COMMIT"].count, 1)
+
+    def test_explain_flags_table_scans(self):
+        self.conn.execute("CREATE TABLE words (word TEXT)")
+        self.conn.execute("SELECT word FROM words WHERE word = (?)", ("cow",)).fetchall()
+
+        self.profiler.detach()
+        self.profiler.explain_worst()
+
+        select = next(
+            stats for stats in self.profiler.stats.values() if stats.statement.startswith("SELECT")
+        )
+        self.assertTrue(select.is_table_scan)
+        self.assertIn("Table scan", self.profiler.format_report())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import subprocess
+import sys
+import unittest
+
+# Budget, in milliseconds, for the modules an entry point imports beyond those
+# a bare interpreter loads. Loading the engine and its dependencies eagerly
+# costs well over this.
+IMPORT_BUDGET_MS = 50
+
+# Modules that --help and --version must not import.
+HEAVY_MODULES = [
+    "_tkinter",
+    "memtrain.memtrain_common.engine",
+    "memtrain.memtrain_common.question",
+    "sqlite3",
+    "statistics",
+    "tkinter",
+]
+
+# Runs are repeated and the fastest kept, which filters out scheduler noise.
+RUNS = 3
+
+
+def import_times(args):
+    """Return a mapping of module name to self import time in microseconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime"] + args,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(self_us)
+
+    return times
+
+
+class StartupTestCase(unittest.TestCase):
+    def setUp(self):
+        self.baseline = set(import_times(["-c", "pass"]))
+
+    def check_startup(self, args):
+        best = None
+
+        for _ in range(RUNS):
+            times = import_times(args)
+            extra = sum(us for name, us in times.items() if name not in self.baseline)
+            best = extra if best is None else min(best, extra)
+
+        for module in HEAVY_MODULES:
+            self.assertNotIn(module, times, "{} imported by {}".format(module, args))
+
+        self.assertLess(
+            best / 1000,
+            IMPORT_BUDGET_MS,
+            "{} spent {:.1f} ms importing modules".format(args, best / 1000),
+        )
+
+    def test_cli_help(self):
+        self.check_startup(["-m", "memtrain", "--help"])
+
+    def test_cli_version(self):
+        self.check_startup(["-m", "memtrain", "--version"])
+
+    def test_gui_help(self):
+        self.check_startup(["-m", "memtrain.gui", "--help"])
+
+    def test_gui_version(self):
+        self.check_startup(["-m", "memtrain.gui", "--version"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.models import SessionItem
+from memtrain.memtrain_common.tags import TagIndex, TagQueryError
+
+
+def make_items(*response_ids):
+    return [
+        SessionItem(
+            item_id=str(number),
+            cue="cue",
+            response="response",
+            cue_id=1,
+            response_id=response_id,
+            placement=1,
+        )
+        for number, response_id in enumerate(response_ids)
+    ]
+
+
+class TagIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        # Items 0-3 have responses 1-4; item 4 shares response 1 with item 0.
+        self.items = make_items(1, 2, 3, 4, 1)
+        self.index = TagIndex(
+            self.items,
+            [(1, "a"), (2, "a"), (2, "b"), (3, "c"), (4, "Big cats")],
+        )
+
+    def select(self, tags=None, not_tags=None):
+        return [item.item_id for item in self.index.select(self.items, tags, not_tags)]
+
+    def test_boolean_queries(self):
+        self.assertEqual(self.select("a"), ["0", "1", "4"])
+        self.assertEqual(self.select("a & b"), ["1"])
+        self.assertEqual(self.select("a & !b"), ["0", "4"])
+        self.assertEqual(self.select("!(a | c)"), ["3"])
+        self.assertEqual(self.select("(a & !b) | c"), ["0", "2", "4"])
+        self.assertEqual(self.select("Big cats"), ["3"])
+
+    def test_comma_lists_mean_any(self):
+        self.assertEqual(self.select("b, c"), ["1", "2"])
+        self.assertEqual(self.select("b,,c,"), ["1", "2"])
+        self.assertEqual(self.select(not_tags="a,c"), ["3"])
+        self.assertEqual(self.select("a", "b"), ["0", "4"])
+
+    def test_unknown_tags_match_nothing(self):
+        self.assertEqual(self.select("nope"), [])
+        self.assertEqual(self.select(not_tags="nope"), ["0", "1", "2", "3", "4"])
+
+    def test_selection_keeps_positions_not_items(self):
+        self.assertIs(self.index.select(self.items), self.items)
+
+        selection = self.index.select(self.items, "a")
+        self.assertEqual(list(selection.positions), [0, 1, 4])
+        self.assertIs(selection[2], self.items[4])
+        self.assertEqual([item.item_id for item in selection[1:]], ["1", "4"])
+        self.assertEqual(
+            [selection.has_position(position) for position in range(5)],
+            [True, True, False, False, True],
+        )
+
+    def test_malformed_queries(self):
+        for query in ("a &", "(a | b", "a b)", "& a", "!"):
+            with self.subTest(query=query):
+                with self.assertRaises(TagQueryError):
+                    self.index.evaluate(query)
+
+
+class EngineTagQueryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        workspace = Path(self.temp_dir.name)
+        os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+        self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+        self.csv_path = workspace / "animals.csv"
+        self.csv_path.write_text(
+            textwrap.dedent(
+                """
+                Animals
+                Cue,Response,Tag,Tag
+                {{}} make milk.,Cows,Ungulates,Farm
+                You can ride on a {{}}.,horse,Ungulates,Farm
+                "{{}} are smaller than lions.",Cats,Felidae,Farm
+                This is a large carnivore often seen in zoos.,Lion,Felidae,Wild
+                """
+            ).lstrip(),
+            encoding="utf-8",
+        )
+
+    def responses(self, tags, not_tags=None):
+        engine = Engine(str(self.csv_path), None, 10, tags, not_tags)
+        self.addCleanup(engine.close)
+        return sorted(item.response for item in engine.session_items)
+
+    def test_engine_filters_with_tag_queries(self):
+        self.assertEqual(self.responses("Felidae | Ungulates & !Farm"), ["Cats", "Lion"])
+        self.assertEqual(self.responses("Farm & !Ungulates"), ["Cats"])
+        self.assertEqual(self.responses("Farm", "Felidae"), ["Cows", "horse"])
+
+
+if __name__ == "__main__":
+    unittest.main()
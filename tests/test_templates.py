@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.session import StudySession
+from memtrain.memtrain_common.templates import CueTemplate, CueTemplates
+
+
+def replace_chain(cue, placement):
+    """The cue rendering that templates replaced, for {{}} and {{1}} to {{3}}."""
+    out = cue.replace("{{}}", "_" * 9)
+    for number in (1, 2, 3):
+        blank = "___({})___".format(number) if placement == number else "_" * 9
+        out = out.replace("{{" + str(number) + "}}", blank)
+    return out
+
+
+class CueTemplateTestCase(unittest.TestCase):
+    def test_matches_the_replace_chain(self):
+        cues = [
+            "{{}} make milk.",
+            "No blanks here.",
+            "{{1}}, {{2}}, and {{3}} are primary colors.",
+            "{{2}} comes after {{1}}; {{}} is unrelated; {{2}} again.",
+            "Braces { and }} and {{x}} are literal.",
+        ]
+        for cue in cues:
+            for placement in (1, 2, 3, 4):
+                self.assertEqual(CueTemplate(cue).render(placement), replace_chain(cue, placement))
+
+    def test_any_number_of_numbered_blanks(self):
+        cue = "".join("{{" + str(number) + "}} " for number in range(1, 13)).strip()
+        rendered = CueTemplate(cue).render(11)
+
+        self.assertEqual(rendered.count("_" * 9), 11)
+        self.assertIn("___(11)___", rendered)
+        self.assertNotIn("{{", rendered)
+
+    def test_templates_are_compiled_once(self):
+        templates = CueTemplates()
+        template = templates["{{1}} and {{2}}"]
+
+        self.assertIs(templates["{{1}} and {{2}}"], template)
+        self.assertEqual(len(templates), 1)
+
+    def test_sessions_share_the_deck_templates(self):
+        with tempfile.TemporaryDirectory() as workspace:
+            os.environ["MEMTRAIN_PROGRESS_DB"] = str(Path(workspace) / "progress.sqlite3")
+            self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+            csv_path = Path(workspace) / "colors.csv"
+            csv_path.write_text(
+                "Colors\nCue,Response,Response,Response,Response\n"
+                '"{{1}}, {{2}}, {{3}}, and {{4}} are colors.",Red,Green,Blue,Cyan\n',
+                encoding="utf-8",
+            )
+
+            engine = Engine(str(csv_path), "3", None, None, None)
+            self.addCleanup(engine.close)
+            session = StudySession(engine)
+            question = session.current()
+
+            placement = session.current_item.placement
+            self.assertIn("___({})___".format(placement), question["cue"])
+            self.assertEqual(question["cue"].count("_" * 9), 3)
+            self.assertIs(session.question.templates, engine.deck.cue_templates)
+            self.assertEqual(len(engine.deck.cue_templates), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
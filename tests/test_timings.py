@@ -0,0 +1,74 @@
+import json
+import os
+import tempfile
+import textwrap
+import unittest
+from pathlib import Path
+
+from memtrain.memtrain_common.engine import Engine
+from memtrain.memtrain_common.timings import Timings, TimingsError, get_timings_format
+
+
+class TimingsTestCase(unittest.TestCase):
+    def test_spans_accumulate_per_phase(self):
+        timings = Timings()
+
+        with timings.span("render"):
+            pass
+        timings.add("render", 0.5)
+        timings.add("grade", 0.25)
+
+        summary = timings.summary()
+        self.assertEqual(list(summary), ["render", "grade"])
+        self.assertEqual(summary["render"]["count"], 2)
+        self.assertEqual(summary["render"]["max"], 0.5)
+        self.assertEqual(timings.last("grade"), 0.25)
+        self.assertIn("render", json.loads(timings.format_json())["timings"])
+
+    def test_timings_format_comes_from_flag_or_environment(self):
+        self.addCleanup(os.environ.pop, "MEMTRAIN_TIMINGS", None)
+        os.environ.pop("MEMTRAIN_TIMINGS", None)
+
+        self.assertIsNone(get_timings_format())
+        self.assertEqual(get_timings_format("json"), "json")
+
+        os.environ["MEMTRAIN_TIMINGS"] = "1"
+        self.assertEqual(get_timings_format(), "table")
+
+        os.environ["MEMTRAIN_TIMINGS"] = "xml"
+        with self.assertRaises(TimingsError):
+            get_timings_format()
+
+    def test_engine_records_loading_phases(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            workspace = Path(temp_dir)
+            os.environ["MEMTRAIN_PROGRESS_DB"] = str(workspace / "progress.sqlite3")
+            self.addCleanup(os.environ.pop, "MEMTRAIN_PROGRESS_DB", None)
+
+            csv_path = workspace / "animals.csv"
+            csv_path.write_text(
+                textwrap.dedent(
+                    """
+                    Animals
+                    Cue,Response,Hint,Tag
+                    {{}} make milk.,Cows,Mooo,Ungulates
+                    You can ride on a {{}}.,horse,Neigh,Ungulates
+                    """
+                ).lstrip(),
+                encoding="utf-8",
+            )
+
+            engine = Engine(str(csv_path), None, None, None, None)
+
+        for phase in [
+            "load",
+            "populate",
+            "build_item_records",
+            "get_progress_map",
+            "session_planning",
+        ]:
+            self.assertEqual(engine.timings.summary()[phase]["count"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()